@@ -0,0 +1,130 @@
+import ipaddress
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.admin.cache import ServerListCache, banlist_cache, record_list_change, whitelist_cache
+from app.minecraft.dispatch import Priority, get_command_scheduler
+from app.minecraft.rcon import RconError
+from app.settings import BULK_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_]{1,16}$")
+_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+@dataclass(frozen=True)
+class BulkAction:
+    label: str
+    command: str
+    cache: Optional[ServerListCache]
+    accepts_ip: bool = False
+    # Reply prefixes meaning the command worked / there was nothing to do
+    done: tuple = ()
+    unchanged: tuple = ("Nothing changed",)
+
+
+BULK_ACTIONS = {
+    "whitelist-add": BulkAction(
+        "Dodavanje na whitelist", "whitelist add {}", whitelist_cache,
+        done=("Added",), unchanged=("Player is already whitelisted",),
+    ),
+    "whitelist-remove": BulkAction(
+        "Uklanjanje sa whitelist-e", "whitelist remove {}", whitelist_cache,
+        done=("Removed",), unchanged=("Player is not whitelisted",),
+    ),
+    "ban": BulkAction("Ban", "ban {}", banlist_cache, done=("Banned",)),
+    "pardon": BulkAction("Unban", "pardon {}", banlist_cache, done=("Unbanned",)),
+    "ban-ip": BulkAction("Ban IP", "ban-ip {}", banlist_cache, accepts_ip=True, done=("Banned IP",)),
+    "pardon-ip": BulkAction("Unban IP", "pardon-ip {}", banlist_cache, accepts_ip=True, done=("Unbanned IP",)),
+    "kick": BulkAction("Kick", "kick {}", None, done=("Kicked",), unchanged=()),
+}
+
+
+@dataclass
+class BulkResult:
+    entry: str
+    outcome: str  # "done", "unchanged", "failed" or "invalid"
+    message: str
+
+
+def parse_entries(text: str) -> List[str]:
+    """Split a pasted or uploaded list on whitespace, commas and semicolons.
+
+    Duplicates (case-insensitive) are dropped, keeping the first spelling.
+    """
+    seen = set()
+    entries = []
+    for entry in _SEPARATORS.split(text):
+        if entry and entry.lower() not in seen:
+            seen.add(entry.lower())
+            entries.append(entry)
+    return entries
+
+
+def _is_valid(entry: str, action: BulkAction) -> bool:
+    if _NAME_PATTERN.match(entry):
+        return True
+    if action.accepts_ip:
+        try:
+            ipaddress.ip_address(entry)
+            return True
+        except ValueError:
+            pass
+    return False
+
+
+def _outcome(reply: str, action: BulkAction) -> str:
+    if reply.startswith(action.done):
+        return "done"
+    if action.unchanged and reply.startswith(action.unchanged):
+        return "unchanged"
+    return "failed"
+
+
+async def run_bulk_action(action_name: str, entries: List[str]) -> List[BulkResult]:
+    """Run one action for many players, pipelined over RCON.
+
+    The batch is queued at admin priority in chunks of up to RCON_BURST and
+    counts as one command per entry against the RCON rate limit.
+
+    Raises RconError when the server can't be reached at all; per-entry
+    failures are reported in the results.
+    """
+    action = BULK_ACTIONS[action_name]
+    results = [
+        BulkResult(entry, "pending", "")
+        if _is_valid(entry, action)
+        else BulkResult(entry, "invalid", "Neispravno ime ili IP adresa")
+        for entry in entries[:BULK_MAX_ENTRIES]
+    ]
+    results.extend(
+        BulkResult(entry, "invalid", f"Preko limita od {BULK_MAX_ENTRIES}")
+        for entry in entries[BULK_MAX_ENTRIES:]
+    )
+
+    to_send = [r for r in results if r.outcome == "pending"]
+    replies = (
+        await get_command_scheduler().pipeline(
+            [action.command.format(r.entry) for r in to_send], Priority.ADMIN
+        )
+        if to_send
+        else []
+    )
+    for result, reply in zip(to_send, replies):
+        if isinstance(reply, RconError):
+            result.outcome, result.message = "failed", f"Error: {reply}"
+            continue
+        result.outcome, result.message = _outcome(reply, action), reply
+        if action.cache is not None:
+            record_list_change(action.cache, reply)
+
+    logger.info(
+        "Bulk %s: %d entries, %d done",
+        action_name,
+        len(results),
+        sum(r.outcome == "done" for r in results),
+    )
+    return results
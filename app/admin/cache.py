@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Callable, Optional
+
+from app.admin.utils import parse_banlist_response, parse_whitelist_response
+from app.metrics import CACHE_LOOKUPS
+from app.minecraft.dispatch import Priority, rcon_command
+from app.settings import SERVER_LIST_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ServerListCache:
+    """A list read over RCON (whitelist, banlist), parsed and kept in memory.
+
+    Only the very first read waits for the server. After that, readers always
+    get the cached value immediately; once it is older than the TTL, a single
+    background refresh replaces it. Handlers that change the list on the
+    server apply the same change here with `update`, or `invalidate` when
+    the outcome is unclear; a read that was already in flight by then may
+    predate the change, so its result is dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        command: str,
+        parse: Callable[[str], Any],
+        ttl: float = SERVER_LIST_CACHE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.command = command
+        self.parse = parse
+        self.ttl = ttl
+        self.value: Any = None
+        self.fetched_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Bumped by every update and invalidate
+        self._version = 0
+
+    @property
+    def stale(self) -> bool:
+        return self.fetched_at is None or time.monotonic() - self.fetched_at >= self.ttl
+
+    async def get(self) -> Any:
+        """Return the list, loading it first if it was never read.
+
+        Raises when that first load fails; later failures keep the old value.
+        """
+        if self.value is None:
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            await self.refresh()
+        elif self.stale:
+            CACHE_LOOKUPS.inc(cache=self.name, result="stale")
+            self._refresh_in_background()
+        else:
+            CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+        return self.value
+
+    async def refresh(self) -> Any:
+        """Read the list from the server now; concurrent callers share one read."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        await asyncio.shield(self._refresh_task)
+        return self.value
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+            self._refresh_task.add_done_callback(self._log_failure)
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background %s refresh failed: %s", self.name, task.exception())
+
+    async def _fetch(self) -> None:
+        version = self._version
+        try:
+            value = self.parse(await rcon_command(self.command, Priority.ADMIN))
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        if version != self._version and self.value is not None:
+            # Left stale, so the next read fetches a list that includes the change
+            logger.debug("Dropped a %s read that started before a change", self.name)
+            return
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.last_error = None
+        logger.debug("Refreshed %s from the server", self.name)
+
+    def update(self, change: Callable[[Any], None]) -> None:
+        """Apply a change the server has confirmed to the cached value in place."""
+        if self.value is not None:
+            change(self.value)
+            self._version += 1
+
+    def invalidate(self) -> None:
+        """Mark the value stale so the next read refreshes it in the background."""
+        self.fetched_at = None
+        self._version += 1
+
+
+def _add_ban(kind: str, identifier: str) -> Callable[[dict], None]:
+    def change(details: dict) -> None:
+        entries = details[kind]
+        if not any(e["identifier"].lower() == identifier.lower() for e in entries):
+            entries.append(
+                {"identifier": identifier, "banned_by": "Rcon", "message": "Banned by an operator."}
+            )
+
+    return change
+
+
+def _remove_ban(kind: str, identifier: str) -> Callable[[dict], None]:
+    def change(details: dict) -> None:
+        details[kind] = [e for e in details[kind] if e["identifier"].lower() != identifier.lower()]
+
+    return change
+
+
+def _whitelist_add(name: str) -> Callable[[list], None]:
+    def change(players: list) -> None:
+        if name.lower() not in (p.lower() for p in players):
+            players.append(name)
+
+    return change
+
+
+def _whitelist_remove(name: str) -> Callable[[list], None]:
+    def change(players: list) -> None:
+        players[:] = [p for p in players if p.lower() != name.lower()]
+
+    return change
+
+
+# Server confirmations of list changes (vanilla wording), most specific first
+_LIST_CHANGES = [
+    (re.compile(r"^Banned IP (\S+?):"), lambda m: banlist_cache.update(_add_ban("ips", m[1]))),
+    (re.compile(r"^Banned (\S+?):"), lambda m: banlist_cache.update(_add_ban("users", m[1]))),
+    (re.compile(r"^Unbanned IP (\S+)"), lambda m: banlist_cache.update(_remove_ban("ips", m[1]))),
+    (re.compile(r"^Unbanned (\S+)"), lambda m: banlist_cache.update(_remove_ban("users", m[1]))),
+    (re.compile(r"^Added (\S+) to the whitelist"), lambda m: whitelist_cache.update(_whitelist_add(m[1]))),
+    (re.compile(r"^Removed (\S+) from the whitelist"), lambda m: whitelist_cache.update(_whitelist_remove(m[1]))),
+]
+
+
+def record_list_change(cache: "ServerListCache", response: str) -> None:
+    """Write a ban/pardon/whitelist command's outcome through to the cache.
+
+    The server's reply names the affected entry (e.g. the IP behind a
+    `ban-ip <player>`). "Nothing changed" replies leave the cache alone; any
+    other reply we can't interpret marks it stale instead.
+    """
+    for pattern, apply in _LIST_CHANGES:
+        match = pattern.match(response)
+        if match:
+            apply(match)
+            return
+    if not response.startswith("Nothing changed"):
+        cache.invalidate()
+
+
+def _parse_banlist(response: str) -> dict:
+    number, details = parse_banlist_response(response)
+    listed = sum(len(entries) for entries in details.values())
+    if number != listed:
+        logger.warning("Count mismatch: %s != %s", number, listed)
+    return details
+
+
+whitelist_cache = ServerListCache("whitelist", "whitelist list", parse_whitelist_response)
+banlist_cache = ServerListCache("banlist", "banlist", _parse_banlist)
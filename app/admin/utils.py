@@ -18,7 +18,7 @@ def parse_whitelist_response(whitelist_str: str) -> list[str]:
         players = []
         count = 0
         logger.warning("No matches while parsing whitelist response")
-        logger.debug(f"Whitelist response: {whitelist_str}")
+        logger.debug("Whitelist response: %s", whitelist_str)
 
     if len(players) != count:
         raise ValueError(f"Count mismatch: {count} != {len(players)}")
@@ -1,26 +1,41 @@
 import logging
-from datetime import datetime, timezone
+from dataclasses import asdict
+from datetime import date, datetime, time, timedelta, timezone
 from typing import Optional
+from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Form, HTTPException, Request, Response
+from fastapi import APIRouter, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from mcrcon import MCRcon
-from passlib.hash import bcrypt
 from pydantic import BaseModel
 from starlette import status
 
-from app.admin.utils import parse_banlist_response, parse_whitelist_response
-from app.minecraft.cache import get_server_status
+from app.admin.bulk import BULK_ACTIONS, parse_entries, run_bulk_action
+from app.admin.cache import banlist_cache, record_list_change, whitelist_cache
+from app.metrics import rcon_verb
+from app.minecraft.cache import bump_status_generation, get_server_status
+from app.minecraft.chat import search_chat
+from app.minecraft.dispatch import get_command_scheduler, rcon_command
+from app.minecraft.logtail import log_tailer_stats
+from app.minecraft.playerdata import get_player_data, scan_player_data
+from app.minecraft.scheduler import poll_scheduler
+from app.minecraft.servers import DEFAULT_SERVER, SERVERS, all_servers
+from app.minecraft.sessions import players_between, playtime_per_day
 from app.models import GamePlayer, ServerSnapshot, User
-from app.settings import RCON_HOST, RCON_PASSWORD, RCON_PORT
+from app.passwords import hash_password
+from app.settings import CHAT_SEARCH_PAGE_SIZE, TIMEZONE
 from app.user.auth import admin_required
+from app.user.cache import user_cache
 from app.utils import flash, redirect_back, render_template
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+# Days of playtime shown on a player's detail page
+PLAYTIME_DAYS = 14
+
 
 @router.get("/", name="admin_dashboard")
 @admin_required
@@ -66,6 +81,7 @@ async def approve_user(request: Request, user_id: int):
     if user:
         user.is_approved = True
         await user.save()
+        user_cache.invalidate(user.id)
     users_url = request.url_for("admin_user_list")
     flash(
         request,
@@ -82,6 +98,7 @@ async def promote_user(request: Request, user_id: int):
     if user:
         user.is_admin = True
         await user.save()
+        user_cache.invalidate(user.id)
     users_url = request.url_for("admin_user_list")
     flash(
         request,
@@ -97,6 +114,7 @@ async def delete_user(request: Request, user_id: int):
     user_to_delete = await User.get_or_none(id=user_id)
     if user_to_delete:
         await user_to_delete.delete()
+        user_cache.invalidate(user_id)
     users_url = request.url_for("admin_user_list")
     flash(
         request,
@@ -113,6 +131,7 @@ async def toggle_user_flag(request: Request, user_id: int, field: str):
     if user and field in {"is_admin", "is_approved"}:
         setattr(user, field, not getattr(user, field))
         await user.save()
+        user_cache.invalidate(user.id)
     flash(request, f'Korisnik "{user.username}" ažuriran.', "success")
     return Response(status_code=204)
 
@@ -141,7 +160,7 @@ async def admin_create_user_submit(
             status_code=status.HTTP_302_FOUND,
         )
 
-    hash_pw = bcrypt.hash(password)
+    hash_pw = await hash_password(password)
 
     await User.create(
         username=username,
@@ -178,6 +197,7 @@ async def update_user_game_player(request: Request, user_id: int):
         user.game_player = None
 
     await user.save()
+    user_cache.invalidate(user.id)
     flash(request, f'Korisnik "{user}" ažuriran!', "success")
     return RedirectResponse(
         url=request.url_for("admin_user_list"), status_code=status.HTTP_302_FOUND
@@ -188,8 +208,18 @@ async def update_user_game_player(request: Request, user_id: int):
 @admin_required
 async def gameplayer_list(request: Request):
     players = await GamePlayer.all().prefetch_related("linked_users")
+    # Saved state from the world files, one directory scan per server
+    by_server = {}
+    for p in players:
+        by_server.setdefault(p.server, []).append(p)
+    saved = {}
+    for server, server_players in by_server.items():
+        if server not in SERVERS:
+            continue
+        found = await scan_player_data([p.name for p in server_players], server)
+        saved.update({p.id: found[p.name] for p in server_players if p.name in found})
     return render_template(
-        "admin/admin_gameplayers.html", request, {"players": players}
+        "admin/admin_gameplayers.html", request, {"players": players, "saved": saved}
     )
 
 
@@ -202,7 +232,7 @@ async def create_gameplayer_form(request: Request):
 @router.post("/gameplayers/create", name="admin_create_gameplayer")
 @admin_required
 async def create_gameplayer(request: Request, name: str = Form(...)):
-    existing = await GamePlayer.get_or_none(name=name)
+    existing = await GamePlayer.get_or_none(server=DEFAULT_SERVER, name=name)
 
     if existing:
         flash(request, f"Greška! Igrač sa imenom '{name}' već postoji!", "error")
@@ -211,7 +241,7 @@ async def create_gameplayer(request: Request, name: str = Form(...)):
             status_code=status.HTTP_302_FOUND,
         )
 
-    await GamePlayer.create(name=name)
+    await GamePlayer.create(server=DEFAULT_SERVER, name=name)
     flash(request, f"Igrač {name} kreiran", "success")
     return RedirectResponse(
         request.url_for("admin_gameplayer_list"), status_code=status.HTTP_302_FOUND
@@ -224,6 +254,8 @@ async def delete_gameplayer(request: Request, player_id: int):
     player = await GamePlayer.get_or_none(id=player_id)
     if player:
         await player.delete()
+        user_cache.invalidate_game_player(player_id)
+        bump_status_generation()
         flash(request, f"Igrač {player.name} obrisan", "success")
     else:
         flash(request, f"Igrač {player_id} ne postoji ili je već obrisan", "error")
@@ -251,6 +283,7 @@ async def update_coords(
         if home_dimension:
             player.home_dimension = home_dimension
         await player.save()
+        user_cache.invalidate_game_player(player.id)
     flash(request, f'Nove koordinate za igrača "{player}" sačuvane.', "success")
     return redirect_back(request, request.url_for("admin_gameplayer_list"))
 
@@ -261,7 +294,27 @@ async def gameplayer_detail(request: Request, player_id: int):
     player = await GamePlayer.get_or_none(id=player_id).prefetch_related("linked_users")
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
-    return render_template("admin/gameplayer_detail.html", request, {"player": player})
+
+    today = datetime.now(ZoneInfo(TIMEZONE)).date()
+    since = today - timedelta(days=PLAYTIME_DAYS - 1)
+    playtime = (await playtime_per_day(since, today, player_id=player.id)).get(player.id, {})
+    days = [since + timedelta(days=i) for i in range(PLAYTIME_DAYS)]
+    return render_template(
+        "admin/gameplayer_detail.html",
+        request,
+        {
+            "player": player,
+            "saved": (
+                await get_player_data(player.name, player.server)
+                if player.server in SERVERS
+                else None
+            ),
+            "playtime_minutes": [
+                (day, int(playtime.get(day, timedelta()).total_seconds()) // 60)
+                for day in reversed(days)
+            ],
+        },
+    )
 
 
 @router.post("/set-password", name="admin_set_password")
@@ -286,6 +339,7 @@ async def set_password_for_user(
         )
 
     await user.set_password(password)
+    user_cache.invalidate(user.id)
     flash(
         request,
         f'Nova šifra za korisnika "{user.username}" uspešno postavljena!',
@@ -304,30 +358,26 @@ class BanAction(BaseModel):
 @admin_required
 async def banlist_dashboard(request: Request):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            banlist = rcon.command("banlist")
-            number, details = parse_banlist_response(banlist)
-            if number != len(details.get("users", [])) + len(
-                details.get("uuids", [])
-            ) + len(details.get("ips", [])):
-                logger.warning(f"Count mismatch: {number} != {len(details)}")
-
+        details = await banlist_cache.get()
     except Exception as e:
         msg = f"Failed to fetch banlist: {e}"
         logger.error(msg)
-        number, details = 0, {"users": [], "uuids": [], "ips": []}
+        details = {"users": [], "uuids": [], "ips": []}
+    number = sum(len(entries) for entries in details.values())
 
     status = get_server_status()
 
     now = datetime.now(timezone.utc)
     start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    players_today = await GamePlayer.filter(last_seen__gte=start_of_day).order_by(
-        "last_seen"
-    )
+    players_today = await players_between(start_of_day, now, DEFAULT_SERVER)
 
     online_usernames = status.get("player_names", [])
-    online_players = await GamePlayer.filter(name__in=online_usernames) if online_usernames else []
+    online_players = (
+        await GamePlayer.filter(server=DEFAULT_SERVER, name__in=online_usernames)
+        if online_usernames
+        else []
+    )
 
 
     return render_template(
@@ -346,11 +396,11 @@ async def banlist_dashboard(request: Request):
 @admin_required
 async def ban_player(request: Request, player: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(f"ban {player}")
-            flash(request, f"Banlist updated: {output}", "success")
+        output = await rcon_command(f"ban {player}")
+        record_list_change(banlist_cache, output)
+        flash(request, f"Banlist updated: {output}", "success")
     except Exception as e:
-        logger.error(f"Failed to ban {player}: {e}")
+        logger.error("Failed to ban %s: %s", player, e)
         output = f"Error: {e}"
         flash(request, output, "error")
 
@@ -361,11 +411,11 @@ async def ban_player(request: Request, player: str = Form(...)):
 @admin_required
 async def unban_player(request: Request, player: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(f"pardon {player}")
-            flash(request, f"Banlist updated: {output}", "success")
+        output = await rcon_command(f"pardon {player}")
+        record_list_change(banlist_cache, output)
+        flash(request, f"Banlist updated: {output}", "success")
     except Exception as e:
-        logger.error(f"Failed to pardon {player}: {e}")
+        logger.error("Failed to pardon %s: %s", player, e)
         output = f"Error: {e}"
         flash(request, output, "error")
 
@@ -373,13 +423,14 @@ async def unban_player(request: Request, player: str = Form(...)):
 
 
 @router.post("/banlist/add-ip", name="admin_ban_ip")
+@admin_required
 async def ban_ip(request: Request, ip: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(f"ban-ip {ip}")
-            flash(request, f"Banlist updated: {output}", "success")
+        output = await rcon_command(f"ban-ip {ip}")
+        record_list_change(banlist_cache, output)
+        flash(request, f"Banlist updated: {output}", "success")
     except Exception as e:
-        logger.error(f"Failed to ban IP {ip}: {e}")
+        logger.error("Failed to ban IP %s: %s", ip, e)
         output = f"Error: {e}"
         flash(request, output, "error")
 
@@ -387,13 +438,14 @@ async def ban_ip(request: Request, ip: str = Form(...)):
 
 
 @router.post("/banlist/remove-ip", name="admin_unban_ip")
+@admin_required
 async def unban_ip(request: Request, ip: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(f"pardon-ip {ip}")
-            flash(request, f"Banlist updated: {output}", "success")
+        output = await rcon_command(f"pardon-ip {ip}")
+        record_list_change(banlist_cache, output)
+        flash(request, f"Banlist updated: {output}", "success")
     except Exception as e:
-        logger.error(f"Failed to pardon {ip}: {e}")
+        logger.error("Failed to pardon %s: %s", ip, e)
         output = f"Error: {e}"
         flash(request, output, "error")
 
@@ -404,11 +456,10 @@ async def unban_ip(request: Request, ip: str = Form(...)):
 @admin_required
 async def kick_player(request: Request, player: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(f"kick {player}")
-            flash(request, f"Player {player} kicked: {output}", "success")
+        output = await rcon_command(f"kick {player}")
+        flash(request, f"Player {player} kicked: {output}", "success")
     except Exception as e:
-        logger.error(f"Failed to kick {player}: {e}")
+        logger.error("Failed to kick %s: %s", player, e)
         output = f"Error: {e}"
         flash(request, output, "error")
 
@@ -423,9 +474,7 @@ class PlayerAction(BaseModel):
 @admin_required
 async def whitelist_dashboard(request: Request):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            whitelist_response = rcon.command("whitelist list")
-            whitelist = parse_whitelist_response(whitelist_response)
+        whitelist = await whitelist_cache.get()
     except Exception as e:
         msg = f"Failed to fetch whitelist: {e}"
         logger.error(msg)
@@ -446,11 +495,11 @@ async def whitelist_dashboard(request: Request):
 @admin_required
 async def whitelist_add_form(request: Request, player: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            result = rcon.command(f"whitelist add {player}")
+        result = await rcon_command(f"whitelist add {player}")
+        record_list_change(whitelist_cache, result)
         flash(request, f"Whitelist updated: {result}", "success")
     except Exception as e:
-        logger.error(f"Failed to add {player} to whitelist: {e}")
+        logger.error("Failed to add %s to whitelist: %s", player, e)
         result = f"Error: {e}"
         flash(request, result, "error")
 
@@ -464,20 +513,67 @@ async def whitelist_add_form(request: Request, player: str = Form(...)):
 @admin_required
 async def whitelist_remove_form(request: Request, player: str = Form(...)):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            result = rcon.command(f"whitelist remove {player}")
+        result = await rcon_command(f"whitelist remove {player}")
+        record_list_change(whitelist_cache, result)
         flash(request, f"Whitelist updated: {result}", "success")
     except Exception as e:
-        logger.error(f"Failed to remove {player} from whitelist: {e}")
+        logger.error("Failed to remove %s from whitelist: %s", player, e)
         result = f"Error: {e}"
         flash(request, result, "error")
 
-    return redirect_back(
+    return RedirectResponse(
         request.url_for("admin_whitelist"),
         status_code=status.HTTP_302_FOUND,
     )
 
 
+@router.post("/bulk", name="admin_bulk_action")
+@admin_required
+async def bulk_action(
+    request: Request,
+    action: str = Form(...),
+    entries: str = Form(""),
+    file: Optional[UploadFile] = File(None),
+):
+    """Whitelist, ban, pardon or kick many players at once."""
+    if action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail="Unknown action")
+
+    text = entries
+    if file is not None and file.filename:
+        text += "\n" + (await file.read()).decode("utf-8", errors="replace")
+    names = parse_entries(text)
+    if not names:
+        flash(request, "Lista igrača je prazna.", "warning")
+        return redirect_back(request, request.url_for("admin_dashboard"))
+
+    try:
+        results = await run_bulk_action(action, names)
+    except Exception as e:
+        logger.error("Bulk %s failed: %s", action, e)
+        flash(request, f"Error: {e}", "error")
+        return redirect_back(request, request.url_for("admin_dashboard"))
+
+    summary = {
+        outcome: sum(r.outcome == outcome for r in results)
+        for outcome in ("done", "unchanged", "failed", "invalid")
+    }
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse(
+            {"action": action, "summary": summary, "results": jsonable_encoder(results)}
+        )
+    return render_template(
+        "admin/bulk_result.html",
+        request,
+        {
+            "action": BULK_ACTIONS[action],
+            "results": results,
+            "summary": summary,
+            "back_url": request.headers.get("referer") or request.url_for("admin_dashboard"),
+        },
+    )
+
+
 class RconCommand(BaseModel):
     command: str
 
@@ -486,8 +582,12 @@ class RconCommand(BaseModel):
 @admin_required
 async def send_rcon_command(request: Request, payload: RconCommand):
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            output = rcon.command(payload.command)
+        output = await rcon_command(payload.command)
+        verb = rcon_verb(payload.command)
+        if verb in ("ban", "pardon", "ban-ip", "pardon-ip"):
+            record_list_change(banlist_cache, output)
+        elif verb == "whitelist":
+            record_list_change(whitelist_cache, output)
         return JSONResponse({"output": output})
     except Exception as e:
         return JSONResponse({"output": f"Error: {str(e)}"})
@@ -501,3 +601,116 @@ async def rcon_dashboard(request: Request):
         request,
         {},
     )
+
+
+def _day_start(value: str, days: int = 0) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Neispravan datum: {value}")
+    return datetime.combine(day + timedelta(days=days), time.min, ZoneInfo(TIMEZONE))
+
+
+async def _chat_page(
+    q: str, server: str, player: str, since: str, until: str, before: Optional[int]
+):
+    """One page of chat search results and the cursor of the next (None if last)."""
+    server = server or DEFAULT_SERVER
+    if server not in SERVERS:
+        raise HTTPException(status_code=404, detail="Nepoznat server")
+    player_id = None
+    if player:
+        game_player = await GamePlayer.get_or_none(server=server, name=player)
+        if game_player is None:
+            return [], None
+        player_id = game_player.id
+
+    messages = await search_chat(
+        q,
+        server=server,
+        player_id=player_id,
+        since=_day_start(since),
+        until=_day_start(until, days=1),
+        before=before,
+        limit=CHAT_SEARCH_PAGE_SIZE + 1,
+    )
+    if len(messages) > CHAT_SEARCH_PAGE_SIZE:
+        messages = messages[:CHAT_SEARCH_PAGE_SIZE]
+        return messages, messages[-1].id
+    return messages, None
+
+
+@router.get("/chat", name="admin_chat_search")
+@admin_required
+async def chat_search(
+    request: Request,
+    q: str = "",
+    server: str = "",
+    player: str = "",
+    since: str = "",
+    until: str = "",
+    before: Optional[int] = None,
+):
+    messages, next_before = await _chat_page(q, server, player, since, until, before)
+    server = server or DEFAULT_SERVER
+    return render_template(
+        "admin/chat_search.html",
+        request,
+        {
+            "messages": messages,
+            "next_url": (
+                request.url.include_query_params(before=next_before)
+                if next_before is not None
+                else None
+            ),
+            "q": q,
+            "server": server,
+            "servers": all_servers(),
+            "player": player,
+            "since": since,
+            "until": until,
+            "player_names": await GamePlayer.filter(server=server)
+            .order_by("name")
+            .values_list("name", flat=True),
+            "tz": ZoneInfo(TIMEZONE),
+        },
+    )
+
+
+@router.get("/chat/search", name="admin_chat_api")
+@admin_required
+async def chat_search_api(
+    request: Request,
+    q: str = "",
+    server: str = "",
+    player: str = "",
+    since: str = "",
+    until: str = "",
+    before: Optional[int] = None,
+):
+    messages, next_before = await _chat_page(q, server, player, since, until, before)
+    return JSONResponse(
+        jsonable_encoder(
+            {"messages": [asdict(m) for m in messages], "next_before": next_before}
+        )
+    )
+
+
+@router.get("/poller", name="admin_poller_stats")
+@admin_required
+async def poller_stats(request: Request):
+    return JSONResponse(jsonable_encoder(poll_scheduler.stats()))
+
+
+@router.get("/rcon/stats", name="admin_rcon_stats")
+@admin_required
+async def rcon_stats(request: Request):
+    return JSONResponse(get_command_scheduler().stats())
+
+
+@router.get("/logtail", name="admin_logtail_stats")
+@admin_required
+async def logtail_stats(request: Request):
+    return JSONResponse(log_tailer_stats())
@@ -1,13 +1,161 @@
+import atexit
+import json
 import logging.config
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LocalQueueHandler(QueueHandler):
+    """A QueueHandler that leaves formatting to the listener's thread.
+
+    The stock prepare() formats the record on the calling thread and drops
+    its exc_info so it can be pickled. The queue here never leaves the
+    process, so the record is passed on untouched.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `burst` records per message per `period` seconds.
+
+    Records are grouped by call site and unformatted message, so a hot-loop
+    message logged for every player is capped no matter its arguments.
+    ERROR and above are never dropped. The next record let through after a
+    quiet period reports how many were suppressed; windows idle for longer
+    than a period are forgotten.
+    """
+
+    def __init__(self, burst: int = 10, period: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows = {}
+        self._pruned = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+
+        key = (
+            record.pathname,
+            record.lineno,
+            record.msg if isinstance(record.msg, str) else id(record.msg),
+        )
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned >= self.period:
+                self._prune(now)
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.period:
+                started, count = now, 0
+            if count >= self.burst:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def _prune(self, now: float) -> None:
+        self._windows = {
+            key: window for key, window in self._windows.items() if now - window[0] < self.period
+        }
+        self._pruned = now
+
+
+class SuppressedCountFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" [{suppressed} similar messages suppressed]"
+        return message
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # Flushes whatever is still queued
+        _listener = None
+
 
 def configure_logging():
-    # from app import settings  # Avoid circular import
+    from app import settings  # Imported late to avoid a circular import
+
+    global _listener
+
+    production = os.environ.get("MC_DASH_ENV", "development") == "production"
+    app_level = os.environ.get("MC_DASH_LOG_LEVEL", "INFO" if production else "DEBUG")
 
     log_dir = Path("logs")
     log_dir.mkdir(parents=True, exist_ok=True)
 
+    handlers = {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "default",
+            "level": app_level,
+        },
+        "file_debug": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": str(log_dir / "debug.log"),
+            "maxBytes": 1024 * 1024 * 5,
+            "backupCount": 3,
+            "formatter": "file",
+            "level": app_level,
+        },
+        "file_error": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": str(log_dir / "error.log"),
+            "maxBytes": 1024 * 1024 * 5,
+            "backupCount": 3,
+            "formatter": "file",
+            "level": "ERROR",
+        },
+    }
+    if production or os.environ.get("MC_DASH_LOG_JSON"):
+        handlers["file_json"] = {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": str(log_dir / "app.jsonl"),
+            "maxBytes": 1024 * 1024 * 20,
+            "backupCount": 5,
+            "formatter": "json",
+            "level": app_level,
+        }
+
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -24,66 +172,44 @@ def configure_logging():
                 },
             },
             "file": {
+                "()": SuppressedCountFormatter,
                 "format": "[%(levelname)s] %(asctime)s - %(name)s - %(message)s",
             },
-        },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-                "level": "DEBUG",
-            },
-            "file_debug": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "filename": str(log_dir / "debug.log"),
-                "maxBytes": 1024 * 1024 * 5,
-                "backupCount": 3,
-                "formatter": "file",
-                "level": "DEBUG",
+            "json": {
+                "()": JsonFormatter,
             },
-            "file_error": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "filename": str(log_dir / "error.log"),
-                "maxBytes": 1024 * 1024 * 5,
-                "backupCount": 3,
-                "formatter": "file",
-                "level": "ERROR",
-            },
-        },
-        "root": {
-            "level": "DEBUG",
-            "handlers": ["console", "file_debug", "file_error"],
         },
+        "handlers": handlers,
+        # Loggers are configured as if they wrote straight to these handlers;
+        # they are moved behind a queue below.
+        "root": {"level": "DEBUG", "handlers": list(handlers)},
         "loggers": {
-            "": {  # Root logger
-                "level": "DEBUG",
-                "handlers": ["console", "file_debug", "file_error"],
-            },
             "tortoise": {"level": "WARNING"},
             "aiosqlite": {"level": "WARNING"},
             "uvicorn": {"level": "INFO", "propagate": False},
-            "uvicorn.error": {
-                "level": "DEBUG",
-                "handlers": ["console", "file_debug", "file_error"],
-                "propagate": False,
-            },
+            "uvicorn.error": {"level": "DEBUG", "propagate": False},
             "uvicorn.access": {"level": "WARNING", "propagate": False},
-            "starlette": {
-                "level": "WARNING",
-                "handlers": ["console", "file_debug", "file_error"],
-                "propagate": False,
-            },
-            "jinja2": {
-                "level": "ERROR",
-                "handlers": ["console", "file_debug", "file_error"],
-                "propagate": False,
-            },
-            "app": {
-                "level": "DEBUG",
-                "handlers": ["console", "file_debug", "file_error"],
-                "propagate": False,
-            },
+            "starlette": {"level": "WARNING", "propagate": False},
+            "jinja2": {"level": "ERROR", "propagate": False},
+            "app": {"level": app_level, "propagate": False},
         },
     }
 
+    _stop_listener()
     logging.config.dictConfig(logging_config)
+
+    # 🧵 Formatting and disk I/O happen on a background thread; the event
+    # loop only pays for the filter and a queue put.
+    log_queue = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    burst, period = settings.LOG_RATE_LIMIT
+    queue_handler.addFilter(RateLimitFilter(burst=burst, period=period))
+
+    targets = logging.getLogger().handlers
+    for name in ("", "uvicorn.error", "starlette", "jinja2", "app"):
+        logging.getLogger(name).handlers = [queue_handler]
+
+    _listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    _listener.start()
+    atexit.unregister(_stop_listener)
+    atexit.register(_stop_listener)
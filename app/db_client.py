@@ -0,0 +1,71 @@
+"""Tortoise engine module: the stock SQLite client with query instrumentation.
+
+Selected with `"engine": "app.db_client"` in settings.TORTOISE_ORM.
+"""
+
+import time
+
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.sqlite import client as sqlite_client
+
+from app.metrics import record_db_query
+
+_TransactionWrapper = getattr(
+    sqlite_client, "SqliteTransactionWrapper", None
+) or getattr(sqlite_client, "TransactionWrapper")
+_SqliteTransactionContext = getattr(sqlite_client, "SqliteTransactionContext", None)
+
+
+class _QueryTimingMixin:
+    """Times every statement and records it against the current request."""
+
+    async def execute_insert(self, query, values):
+        started = time.perf_counter()
+        try:
+            return await super().execute_insert(query, values)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    async def execute_many(self, query, values):
+        started = time.perf_counter()
+        try:
+            return await super().execute_many(query, values)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    async def execute_query(self, query, values=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute_query(query, values)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    async def execute_query_dict(self, query, values=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute_query_dict(query, values)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    async def execute_script(self, query):
+        started = time.perf_counter()
+        try:
+            return await super().execute_script(query)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+
+class InstrumentedTransactionWrapper(_QueryTimingMixin, _TransactionWrapper):
+    pass
+
+
+class InstrumentedSqliteClient(_QueryTimingMixin, sqlite_client.SqliteClient):
+    def _in_transaction(self) -> TransactionContext:
+        wrapper = InstrumentedTransactionWrapper(self)
+        if _SqliteTransactionContext is not None:
+            # Newer Tortoise serializes SQLite transactions with a client lock
+            return _SqliteTransactionContext(wrapper, self._lock)
+        return TransactionContext(wrapper)
+
+
+client_class = InstrumentedSqliteClient
@@ -1,23 +1,58 @@
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from tortoise.contrib.fastapi import register_tortoise
+from tortoise.contrib.fastapi import RegisterTortoise
 
 from app import settings
 from app.admin import admin_routes
 from app.configure_logging import configure_logging
+from app.metrics import MetricsMiddleware, monitor_event_loop_lag, render_metrics
 from app.minecraft import minecraft_routes
-from app.minecraft.cache import poll_server_status_loop
+from app.minecraft.chat import ensure_chat_index
+from app.minecraft.dispatch import close_command_schedulers
+from app.minecraft.logtail import start_log_tailers, stop_log_tailers
+from app.minecraft.rcon import close_rcon_pools
+from app.minecraft.scheduler import poll_scheduler
+from app.minecraft.trails import flush_trails
 from app.user import user_routes
 from app.views import router
 
 configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Register Tortoise ORM
+    async with RegisterTortoise(
+        app,
+        config=settings.TORTOISE_ORM,
+        generate_schemas=True,
+        add_exception_handlers=True,
+    ):
+        # Full-text index of the chat archive (not something Tortoise can generate)
+        await ensure_chat_index()
+        # Background polling loop
+        poll_scheduler.start()
+        # Real-time joins, leaves, deaths and chat from server logs
+        start_log_tailers()
+        loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+        yield
+        logger.info("Stopping background polling loop.")
+        loop_lag_task.cancel()
+        await poll_scheduler.stop()
+        await stop_log_tailers()
+        await flush_trails()
+        await close_command_schedulers()
+        await close_rcon_pools()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # 🔐 Add session middleware (required for login sessions)
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
@@ -35,19 +70,12 @@ app.mount("/admin", admin_routes)
 app.mount("/user", user_routes)
 app.mount("/mc", minecraft_routes)
 
-
-# Register Tortoise ORM
-register_tortoise(
-    app,
-    db_url="sqlite://db.sqlite3",
-    modules={"models": ["app.models"]},
-    generate_schemas=True,
-    add_exception_handlers=True,
-)
+# 📈 Per-route latency and DB query counts (outermost, so it sees everything)
+app.add_middleware(MetricsMiddleware)
 
 
-# Background polling loop
-@app.on_event("startup")
-async def start_polling():
-    logger.info("Starting background polling loop.")
-    asyncio.create_task(poll_server_status_loop(interval_seconds=120))
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
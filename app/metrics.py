@@ -0,0 +1,326 @@
+"""Prometheus text-format metrics.
+
+A deliberately small registry: counters, gauges and histograms with labels,
+stored in plain dicts and rendered on demand by the /metrics route.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.settings import SERVER_TIMING_HEADER, SLOW_REQUEST_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}_total{self._format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = self._format_labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics ---
+
+POLL_DURATION = Histogram("mc_dash_poll_duration_seconds", "Duration of one status poll cycle over all servers.")
+POLL_RUNS = Counter("mc_dash_poll_runs", "Status poll cycles by resulting server status.", ["status"])
+SERVER_POLL_DURATION = Histogram(
+    "mc_dash_server_poll_duration_seconds", "Duration of polling one server.", ["server", "status"]
+)
+SERVER_PROBE_LATENCY = Histogram(
+    "mc_dash_server_probe_latency_seconds", "Status probe round trip by protocol.", ["server", "protocol"]
+)
+SERVER_PROBE_FAILURES = Counter(
+    "mc_dash_server_probe_failures", "Unanswered status probes by protocol.", ["server", "protocol"]
+)
+LOG_TAIL_BYTES = Counter("mc_dash_log_tail_bytes", "Bytes read from server logs.", ["server"])
+LOG_TAIL_EVENTS = Counter(
+    "mc_dash_log_tail_events", "Events picked up from server logs, by kind.", ["server", "kind"]
+)
+
+RCON_COMMAND_DURATION = Histogram(
+    "mc_dash_rcon_command_duration_seconds", "RCON round-trip latency by command verb.", ["verb"]
+)
+RCON_FAILURES = Counter("mc_dash_rcon_failures", "Failed RCON commands by reason.", ["reason"])
+RCON_CONNECTIONS = Counter("mc_dash_rcon_connections_opened", "RCON connections opened.")
+RCON_QUEUE_WAIT = Histogram(
+    "mc_dash_rcon_queue_wait_seconds", "Time RCON commands waited in the scheduler queue.", ["server", "priority"]
+)
+RCON_QUEUE_DEPTH = Gauge(
+    "mc_dash_rcon_queue_depth", "RCON commands waiting in the scheduler queue.", ["server", "priority"]
+)
+RCON_QUEUE_TIMEOUTS = Counter(
+    "mc_dash_rcon_queue_timeouts", "RCON callers that gave up waiting, by priority.", ["server", "priority"]
+)
+RCON_COALESCED = Counter(
+    "mc_dash_rcon_coalesced", "Read-only RCON commands answered by an identical one in flight.", ["server"]
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "mc_dash_http_request_duration_seconds", "HTTP request latency by route.", ["route", "method", "status"]
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "mc_dash_http_request_db_queries", "DB queries issued per HTTP request.", ["route"], buckets=COUNT_BUCKETS
+)
+
+DB_QUERY_DURATION = Histogram("mc_dash_db_query_duration_seconds", "Duration of DB statements.")
+
+EVENT_LOOP_LAG = Gauge("mc_dash_event_loop_lag_seconds", "Most recent event-loop scheduling lag.")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram("mc_dash_event_loop_lag_distribution_seconds", "Event-loop scheduling lag.")
+
+CACHE_LOOKUPS = Counter("mc_dash_cache_lookups", "In-memory cache lookups by cache and result.", ["cache", "result"])
+
+
+# --- Per-request accounting ---
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_time: float = 0.0
+    rcon_commands: int = 0
+    rcon_time: float = 0.0
+    render_time: float = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries", '
+            f'rcon;dur={self.rcon_time * 1000:.1f};desc="{self.rcon_commands} commands", '
+            f"render;dur={self.render_time * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def record_db_query(duration: float) -> None:
+    DB_QUERY_DURATION.observe(duration)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += duration
+
+
+def record_rcon_command(duration: float) -> None:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.rcon_commands += 1
+        stats.rcon_time += duration
+
+
+def record_render(duration: float) -> None:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.render_time += duration
+
+
+def rcon_verb(command: str) -> str:
+    """Label for an RCON command: its first word, or 'other' for odd input."""
+    verb = command.lstrip("/").split(" ", 1)[0].lower()
+    return verb if verb.replace("-", "").isalnum() and len(verb) <= 32 else "other"
+
+
+def route_label(scope) -> str:
+    """Name of the view that handled a request, unique across sub-apps."""
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__name__", None)
+    if name is None:
+        return "unmatched"
+    return f"{endpoint.__module__}.{name}"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and DB queries per route.
+
+    Requests slower than SLOW_REQUEST_THRESHOLD_MS are logged with a
+    breakdown of DB, RCON and template time; with SERVER_TIMING_HEADER the
+    same breakdown is sent to the browser as a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        streaming = False
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                if SERVER_TIMING_HEADER:
+                    timing = stats.server_timing(time.perf_counter() - started)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", timing.encode("latin-1")),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = route_label(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, route=route, method=scope["method"], status=status_code)
+            HTTP_REQUEST_DB_QUERIES.observe(stats.db_queries, route=route)
+            # Event streams stay open by design, so they are never "slow"
+            if (
+                SLOW_REQUEST_THRESHOLD_MS is not None
+                and not streaming
+                and elapsed * 1000 >= SLOW_REQUEST_THRESHOLD_MS
+            ):
+                _log_slow_request(scope, route, status_code, elapsed, stats)
+
+
+def _log_slow_request(scope, route: str, status_code: int, elapsed: float, stats: RequestStats) -> None:
+    profile = {
+        "method": scope["method"],
+        "path": scope.get("root_path", "") + scope["path"],
+        "route": route,
+        "status": status_code,
+        "total_ms": round(elapsed * 1000, 1),
+        "db_queries": stats.db_queries,
+        "db_ms": round(stats.db_time * 1000, 1),
+        "rcon_commands": stats.rcon_commands,
+        "rcon_ms": round(stats.rcon_time * 1000, 1),
+        "render_ms": round(stats.render_time * 1000, 1),
+    }
+    logger.warning(
+        "Slow request %(method)s %(path)s (%(route)s) -> %(status)s: %(total_ms)s ms total, "
+        "%(db_queries)s queries in %(db_ms)s ms, %(rcon_commands)s RCON commands in %(rcon_ms)s ms, "
+        "render %(render_ms)s ms",
+        profile,
+        extra={"request_profile": profile},
+    )
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late the loop wakes a sleeping task; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
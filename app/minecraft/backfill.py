@@ -0,0 +1,275 @@
+"""Play sessions and chat backfilled from a server's rotated logs (logs/YYYY-MM-DD-N.log.gz).
+
+Files are decompressed and parsed in a process pool, one file per task, and
+loaded in batches of files per transaction. Each file is recorded in
+ImportedLog in the same transaction as its sessions, so a run can be stopped
+at any point and started again: imported files are skipped.
+
+Every file is read on its own. The log also rotates at midnight, so a player
+online across it gets a session up to the last line of one file and another
+from the first line of the next. Sessions and chat from the time the
+dashboard started recording the server are cut off there, since the poller
+and log tailer have those; see recording_start.
+"""
+
+import asyncio
+import gzip
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from tortoise.transactions import in_transaction
+
+from app.minecraft.cache import get_or_create_players
+from app.minecraft.serverlog import CHAT, JOIN, LEAVE, parse_message, split_line
+from app.minecraft.servers import get_server
+from app.minecraft.sessions import split_session
+from app.models import ChatMessage, GamePlayer, ImportedLog, PlaySession, ServerSnapshot
+from app.settings import BACKFILL_BATCH_FILES, TIMEZONE
+from app.utils import as_utc
+
+_FILE_NAME = re.compile(r"^(?P<day>\d{4}-\d{2}-\d{2})-(?P<index>\d+)\.log\.gz$")
+# A clock this far behind the previous line means midnight passed
+_DAY_ROLLOVER_SECONDS = 12 * 60 * 60
+
+
+@dataclass
+class ParsedLog:
+    name: str
+    size: int
+    lines: int
+    # (player, started_at, ended_at)
+    sessions: List[Tuple[str, datetime, datetime]] = field(default_factory=list)
+    # (player, sent_at, text)
+    chat: List[Tuple[str, datetime, str]] = field(default_factory=list)
+
+
+def _seconds(clock) -> int:
+    return clock.hour * 3600 + clock.minute * 60 + clock.second
+
+
+def parse_log_file(path: str, tz_name: str = TIMEZONE) -> ParsedLog:
+    """Play sessions and chat in one rotated log; runs in a worker process.
+
+    The file name gives the date of its first line. A player still online at
+    the end of the file is taken to have left at its last line, and one who
+    leaves, chats or dies without having joined in it, to have been online
+    since its first line.
+    """
+    name = os.path.basename(path)
+    day = date.fromisoformat(_FILE_NAME.match(name)["day"])
+    tz = ZoneInfo(tz_name)
+    parsed = ParsedLog(name=name, size=os.path.getsize(path), lines=0)
+
+    online: Dict[str, datetime] = {}
+    first = last = None
+    previous = None
+    with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parsed.lines += 1
+            split = split_line(line)
+            if split is None:
+                continue
+            clock, message = split
+            seconds = _seconds(clock)
+            if previous is not None and previous - seconds > _DAY_ROLLOVER_SECONDS:
+                day += timedelta(days=1)
+            previous = seconds
+            moment = datetime.combine(day, clock, tz)
+            first = first or moment
+            last = moment
+
+            event = parse_message(clock, message)
+            if event is None:
+                continue
+            if event.kind == CHAT:
+                parsed.chat.append((event.player, moment, event.text))
+            if event.kind == LEAVE:
+                parsed.sessions.append((event.player, online.pop(event.player, first), moment))
+            elif event.player not in online:
+                online[event.player] = moment if event.kind == JOIN else first
+
+    for player, started_at in online.items():
+        parsed.sessions.append((player, started_at, last))
+    return parsed
+
+
+def log_files(directory: str) -> List[str]:
+    """Rotated logs in a directory, oldest first."""
+    found = []
+    for name in os.listdir(directory):
+        match = _FILE_NAME.match(name)
+        if match:
+            found.append((match["day"], int(match["index"]), os.path.join(directory, name)))
+    return [path for _, _, path in sorted(found)]
+
+
+async def recording_start(server: str) -> datetime:
+    """When the dashboard started recording a server; backfill stops there.
+
+    Fixed by the first backfill run and stored with every file it imports,
+    because raw snapshots are pruned and later runs would otherwise cut off
+    later and later. The first run takes the earliest raw snapshot or play
+    session the dashboard has, or its own start if there are none: logs
+    written from then on are left to the poller and log tailer.
+    """
+    stored = (
+        await ImportedLog.filter(server=server, cutoff__isnull=False)
+        .order_by("cutoff")
+        .first()
+    )
+    if stored is not None:
+        return as_utc(stored.cutoff)
+
+    recorded = []
+    snapshot = await ServerSnapshot.filter(server=server).order_by("timestamp").first()
+    if snapshot is not None:
+        recorded.append(as_utc(snapshot.timestamp))
+    # Sessions are never pruned, but files imported before cutoffs were
+    # stored may have added some; those only make the cutoff earlier
+    session = (
+        await PlaySession.filter(player__server=server).order_by("started_at").first()
+    )
+    if session is not None:
+        recorded.append(as_utc(session.started_at))
+    return min(recorded, default=datetime.now(timezone.utc))
+
+
+async def _load(server: str, logs: List[ParsedLog], cutoff: datetime) -> Tuple[int, int]:
+    """Store the sessions and chat of parsed logs and mark them imported, in one transaction."""
+    sessions = []
+    chat = []
+    counts = {}
+    for log in logs:
+        counts[log.name] = 0
+        for player, started_at, ended_at in log.sessions:
+            if started_at >= cutoff:
+                continue
+            for piece in split_session(started_at, min(ended_at, cutoff)):
+                sessions.append((player, *piece))
+            counts[log.name] += 1
+        chat.extend(message for message in log.chat if message[1] < cutoff)
+
+    spans: Dict[str, List[datetime]] = {}
+    for player, started_at, ended_at in sessions:
+        span = spans.setdefault(player, [started_at, ended_at])
+        span[0] = min(span[0], started_at)
+        span[1] = max(span[1], ended_at)
+
+    async with in_transaction() as conn:
+        players = await get_or_create_players(conn, server, sorted(spans))
+        await PlaySession.bulk_create(
+            [
+                PlaySession(
+                    player_id=players[player].id,
+                    started_at=started_at,
+                    ended_at=ended_at,
+                    is_open=False,
+                )
+                for player, started_at, ended_at in sessions
+            ],
+            using_db=conn,
+        )
+        # Chatting implies a session, so every sender is among the players
+        await ChatMessage.bulk_create(
+            [
+                ChatMessage(player_id=players[player].id, sent_at=sent_at, text=text)
+                for player, sent_at, text in chat
+            ],
+            ignore_conflicts=True,
+            using_db=conn,
+        )
+
+        changed = []
+        for player, (first_seen, last_seen) in spans.items():
+            game_player = players[player]
+            updated = False
+            if game_player.first_seen is None or as_utc(game_player.first_seen) > first_seen:
+                game_player.first_seen = first_seen
+                updated = True
+            if game_player.last_seen is None or as_utc(game_player.last_seen) < last_seen:
+                game_player.last_seen = last_seen
+                updated = True
+            if updated:
+                changed.append(game_player)
+        if changed:
+            await GamePlayer.bulk_update(
+                changed, fields=["first_seen", "last_seen"], using_db=conn
+            )
+
+        await ImportedLog.bulk_create(
+            [
+                ImportedLog(server=server, name=name, sessions=count, cutoff=cutoff)
+                for name, count in counts.items()
+            ],
+            using_db=conn,
+        )
+    return len(sessions), len(chat)
+
+
+async def backfill_logs(
+    directory: str,
+    server: Optional[str] = None,
+    jobs: Optional[int] = None,
+    batch_files: int = BACKFILL_BATCH_FILES,
+    progress: Callable[[str], None] = print,
+) -> dict:
+    """Import the play sessions and chat in a directory of rotated logs into a server's history.
+
+    jobs is the number of worker processes (default: one per CPU). Files
+    that fail to parse are reported and left for the next run.
+    """
+    config = get_server(server)
+    files = log_files(directory)
+    imported = set(
+        await ImportedLog.filter(server=config.key).values_list("name", flat=True)
+    )
+    pending = [path for path in files if os.path.basename(path) not in imported]
+    cutoff = await recording_start(config.key)
+    progress(
+        f"{len(files)} log files in {directory}, {len(files) - len(pending)} already imported"
+    )
+    since = cutoff.astimezone(ZoneInfo(TIMEZONE))
+    progress(f"Recorded history starts {since:%Y-%m-%d %H:%M}; later sessions are skipped")
+
+    totals = {"files": 0, "failed": 0, "bytes": 0, "lines": 0, "sessions": 0, "messages": 0}
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+
+    async def parse(pool: ProcessPoolExecutor, path: str) -> Optional[ParsedLog]:
+        try:
+            return await loop.run_in_executor(pool, parse_log_file, path, TIMEZONE)
+        except Exception as e:
+            totals["failed"] += 1
+            progress(f"  ❌ {os.path.basename(path)}: {e}")
+            return None
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        tasks = [parse(pool, path) for path in pending]
+        batch: List[ParsedLog] = []
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            parsed = await task
+            if parsed is not None:
+                batch.append(parsed)
+            if batch and (len(batch) >= batch_files or done == len(tasks)):
+                sessions, messages = await _load(config.key, batch, cutoff)
+                totals["sessions"] += sessions
+                totals["messages"] += messages
+                totals["files"] += len(batch)
+                totals["bytes"] += sum(log.size for log in batch)
+                totals["lines"] += sum(log.lines for log in batch)
+                batch = []
+                elapsed = time.monotonic() - started
+                progress(
+                    f"  {done}/{len(pending)} files, {totals['bytes'] / 2**20:.0f} MiB,"
+                    f" {totals['sessions']} sessions, {totals['messages']} chat messages"
+                    f" ({done / elapsed:.1f} files/s)"
+                )
+
+    totals["seconds"] = round(time.monotonic() - started, 1)
+    return totals
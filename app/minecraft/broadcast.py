@@ -0,0 +1,59 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBroadcaster:
+    """In-memory fan-out of status events to connected dashboards.
+
+    Each event is JSON-encoded once on publish and the same string is handed
+    to every subscriber, so the cost per client is a queue put. Slow clients
+    only ever miss intermediate events: when a queue is full the oldest event
+    is dropped.
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue_size = queue_size
+        self.latest: Optional[str] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: dict) -> None:
+        encoded = json.dumps(event, default=str)
+        self.latest = encoded
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(encoded)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Yield a queue of encoded events, starting with the latest one."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.add(queue)
+        logger.debug("Status subscriber added (%d total)", len(self._subscribers))
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+            logger.debug("Status subscriber removed (%d left)", len(self._subscribers))
+
+
+_broadcasters: Dict[str, StatusBroadcaster] = {}
+
+
+def get_status_broadcaster(server: str) -> StatusBroadcaster:
+    """Return the broadcaster for one server's status events."""
+    broadcaster = _broadcasters.get(server)
+    if broadcaster is None:
+        broadcaster = _broadcasters[server] = StatusBroadcaster()
+    return broadcaster
@@ -1,150 +1,442 @@
 import asyncio
 import logging
+import re
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-from mcrcon import MCRcon
+from tortoise.transactions import in_transaction
 
-from app.models import GamePlayer, ServerSnapshot, User
-from app.settings import RCON_HOST, RCON_PASSWORD, RCON_PORT, TIMEZONE
+from app.metrics import SERVER_POLL_DURATION, SERVER_PROBE_FAILURES, SERVER_PROBE_LATENCY
+from app.minecraft.broadcast import get_status_broadcaster
+from app.minecraft.dispatch import Priority, rcon_command
+from app.minecraft.history import record_presence_change, record_status
+from app.minecraft.mc_utils import get_coordinates, get_online_positions
+from app.minecraft.probe import ProbeError, ServerStatus, ping_server, query_server
+from app.minecraft.serverlog import CHAT, LEAVE, LogEvent, recent_event_time
+from app.minecraft.servers import ServerConfig, all_servers, get_server
+from app.minecraft.sessions import apply_presence_changes, update_sessions
+from app.minecraft.trails import record_positions
+from app.models import ChatMessage, GamePlayer, User
+from app.settings import (
+    POLL_BULK_POSITIONS,
+    POLL_PROBE_TIMEOUT,
+    POLL_STATUS_PROBE,
+    TIMEZONE,
+)
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache for live status
-_server_status_cache = {
-    "status": "Unknown",
-    "players_online": 0,
-    "max_players": 0,
-    "player_names": [],
-    "timestamp": datetime.now(ZoneInfo(TIMEZONE)),
+_PLAYER_NAME = re.compile(r"^[A-Za-z0-9_]{1,16}$")
+
+
+def _unknown_status(server: str) -> dict:
+    return {
+        "server": server,
+        "status": "Unknown",
+        "players_online": 0,
+        "max_players": 0,
+        "player_names": [],
+        "timestamp": datetime.now(ZoneInfo(TIMEZONE)),
+    }
+
+
+# In-memory cache for live status, per server
+_server_status_caches: Dict[str, dict] = {
+    server.key: _unknown_status(server.key) for server in all_servers()
 }
 
 
-def get_server_status():
-    """Returns the most recent cached server status."""
-    return _server_status_cache
+# Bumped whenever the cached status or player data changes
+_status_generation = 0
+
+
+def get_server_status(server: Optional[str] = None) -> dict:
+    """Returns the most recent cached status of a server (the default one if None)."""
+    return _server_status_caches[get_server(server).key]
+
+
+def get_status_generation() -> int:
+    """Returns a counter that changes every time the status data is refreshed."""
+    return _status_generation
+
+
+def bump_status_generation() -> None:
+    global _status_generation
+    _status_generation += 1
+
+
+async def get_or_create_players(
+    conn, server: str, names, first_seen: Optional[datetime] = None
+) -> Dict[str, GamePlayer]:
+    """A server's GamePlayers by name, creating and auto-linking missing ones."""
+    players = {
+        p.name: p
+        for p in await GamePlayer.filter(server=server, name__in=names).using_db(conn)
+    }
+
+    new_names = [name for name in names if name not in players]
+    if new_names:
+        logger.debug("New players created: %s", new_names)
+        await GamePlayer.bulk_create(
+            [
+                GamePlayer(server=server, name=name, first_seen=first_seen)
+                for name in new_names
+            ],
+            using_db=conn,
+        )
+        # bulk_create does not return primary keys on SQLite
+        for p in await GamePlayer.filter(
+            server=server, name__in=new_names
+        ).using_db(conn):
+            players[p.name] = p
+
+        # Link users who registered with one of the new game names
+        matching_users = await User.filter(
+            game_player_id=None, game_name__in=new_names
+        ).using_db(conn)
+        for user in matching_users:
+            user.game_player_id = players[user.game_name].id
+        if matching_users:
+            await User.bulk_update(
+                matching_users, fields=["game_player_id"], using_db=conn
+            )
+    return players
+
+
+async def _upsert_online_players(
+    server: str,
+    player_names: List[str],
+    positions: Dict[str, Tuple[float, float, float]],
+    dimensions: Dict[str, str],
+) -> Dict[str, GamePlayer]:
+    """Create, update and auto-link a server's GamePlayers for one poll in one transaction.
+
+    The number of queries is constant regardless of how many players are online.
+    Returns the updated players keyed by name.
+    """
+    now = datetime.now(ZoneInfo(TIMEZONE))
+
+    async with in_transaction() as conn:
+        players = await get_or_create_players(conn, server, player_names, now)
+
+        update_fields = {"last_seen"}
+        for name in player_names:
+            player = players[name]
+            player.last_seen = now
+            if name in positions:
+                x, y, z = positions[name]
+                player.last_seen_x, player.last_seen_y, player.last_seen_z = x, y, z
+                update_fields.update(("last_seen_x", "last_seen_y", "last_seen_z"))
+            else:
+                logger.warning("Failed to get position for %s", name)
+
+            if name in dimensions:
+                player.last_seen_dimension = dimensions[name]
+                update_fields.add("last_seen_dimension")
+            else:
+                logger.warning("Failed to get dimension for %s", name)
+
+        await GamePlayer.bulk_update(
+            [players[name] for name in player_names],
+            fields=sorted(update_fields),
+            using_db=conn,
+        )
+    logger.debug("Saved %d online players to DB.", len(player_names))
+    return players
+
+
+def _publish_status(
+    status_data: dict, players: Dict[str, GamePlayer], previous_names: set
+):
+    """Push the new status and join/leave deltas to the server's live dashboards."""
+    names = status_data["player_names"]
+    get_status_broadcaster(status_data["server"]).publish(
+        {
+            **status_data,
+            "players": [
+                {"name": name, "coords": players[name].last_seen_coords()}
+                if name in players
+                else {"name": name, "coords": "—"}
+                for name in names
+            ],
+            "joined": [name for name in names if name not in previous_names],
+            "left": sorted(previous_names.difference(names)),
+        }
+    )
+
+
+def parse_list_response(response: str) -> Tuple[int, int, List[str]]:
+    """Players online, max players and online names from an RCON `list` reply."""
+    # Defensive parsing
+    if not response or "players online" not in response:
+        raise ValueError(f"[RCON] Unexpected response format: {response}")
+
+    # Try to extract counts safely
+    try:
+        parts = response.split()
+        players_online = int(parts[2])
+        max_players = int(parts[7])
+    except (IndexError, ValueError) as e:
+        raise ValueError(
+            f"[Parse error] Failed to parse player counts: {response}"
+        ) from e
+
+    # Extract player names
+    if ":" in response:
+        player_str = response.split(":", 1)[1].strip()
+        player_names = [
+            name.strip() for name in player_str.split(",") if name.strip()
+        ]
+    else:
+        player_names = []
+    return players_online, max_players, player_names
+
+
+async def probe_server(config: ServerConfig) -> ServerStatus:
+    """Status of a server from Query when it is enabled, else Server List Ping.
 
+    Raises ProbeError when the server answers neither.
+    """
+    probes = [("ping", ping_server, config.port)]
+    if config.query_port:
+        probes.insert(0, ("query", query_server, config.query_port))
 
-async def poll_server_status_loop(interval_seconds: int = 60):
-    """Background polling loop that updates server status and stores snapshots."""
-    while True:
-        await poll_and_cache()
-        await asyncio.sleep(interval_seconds)
+    for protocol, probe, port in probes:
+        try:
+            status = await probe(config.rcon_host, port, POLL_PROBE_TIMEOUT)
+        except ProbeError as e:
+            SERVER_PROBE_FAILURES.inc(server=config.key, protocol=protocol)
+            error = e
+            logger.debug("%s probe of %s failed: %s", protocol, config.key, e)
+            continue
+        SERVER_PROBE_LATENCY.observe(status.latency_ms / 1000, server=config.key, protocol=protocol)
+        return status
+    raise error
+
+
+async def _online_players(config: ServerConfig) -> Tuple[dict, Optional[List[str]]]:
+    """Status fields and online player names, probing first when enabled.
+
+    RCON `list` is only sent when the probe is off or did not name everyone
+    (Server List Ping samples at most 12, and may hide names). If that fails
+    after a successful probe, the server is still up but who is on it is not
+    known, and the names are None.
+    """
+    if POLL_STATUS_PROBE:
+        probe = await probe_server(config)
+        fields = {
+            "players_online": probe.players_online,
+            "max_players": probe.max_players,
+            "motd": probe.motd,
+            "version": probe.version,
+            "latency_ms": round(probe.latency_ms, 1),
+        }
+        if not probe.players_online:
+            return fields, []
+        if probe.complete_player_list and all(
+            _PLAYER_NAME.match(name) for name in probe.player_names
+        ):
+            return fields, probe.player_names
+        try:
+            response = await rcon_command("list", Priority.POLL, server=config.key)
+            return fields, parse_list_response(response)[2]
+        except Exception as e:
+            logger.warning("Listing players on %s failed: %s", config.key, e)
+            return fields, None
 
+    response = await rcon_command("list", Priority.POLL, server=config.key)
+    players_online, max_players, player_names = parse_list_response(response)
+    return {"players_online": players_online, "max_players": max_players}, player_names
 
-async def poll_and_cache():
-    global _server_status_cache
+
+async def poll_and_cache(server: Optional[str] = None) -> dict:
+    """Poll one server (the default one if None) and store what it reports."""
+    config = get_server(server)
+    server = config.key
+
+    status_cache = _server_status_caches[server]
+    roster_known = True
 
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, RCON_PORT) as rcon:
-            response = rcon.command("list")
-
-            # Defensive parsing
-            if not response or "players online" not in response:
-                raise ValueError(f"[RCON] Unexpected response format: {response}")
-
-            # Try to extract counts safely
-            try:
-                parts = response.split()
-                players_online = int(parts[2])
-                max_players = int(parts[7])
-            except (IndexError, ValueError) as e:
-                raise ValueError(
-                    f"[Parse error] Failed to parse player counts: {response}"
-                ) from e
-
-            # Extract player names
-            if ":" in response:
-                player_str = response.split(":", 1)[1].strip()
-                player_names = [
-                    name.strip() for name in player_str.split(",") if name.strip()
-                ]
+        fields, player_names = await _online_players(config)
+        if player_names is None:
+            # Only a sample of the names is known; keep the last full list
+            # and leave sessions and trails alone until RCON answers again
+            roster_known = False
+            player_names = list(status_cache["player_names"])
+        located = player_names if roster_known else []
+
+        # 📍 Positions and dimensions of everyone online, in one round trip
+        positions, dimensions = {}, {}
+        try:
+            if located and POLL_BULK_POSITIONS:
+                positions, dimensions = await get_online_positions(located, server)
             else:
-                player_names = []
-
-            # ✅ Ensure all players exist as GamePlayer
-            for name in player_names:
-                player, created = await GamePlayer.get_or_create(name=name)
-
-                # Link user if needed
-                if created:
-                    logger.debug(f"New player created: {name}")
-                    matching_user = await User.get_or_none(
-                        game_player=None, game_name=name
-                    )
-                    if matching_user:
-                        matching_user.game_player = player
-                        await matching_user.save()
-                else:
-                    logger.debug(f"Player found: {name}")
-
-                # ⏱️ Update last_seen timestamp
-                player.last_seen = datetime.now(ZoneInfo(TIMEZONE))
-                logger.debug(f"Player {name} last seen updated.")
-
-                # 📍 Try to get position
-                try:
-                    pos_response = rcon.command(f"data get entity {name} Pos")
-                    # Example: 'Pos: [123.0d, 64.0d, -321.5d]'
-                    coords = pos_response.split("[")[1].split("]")[0].split(",")
-                    x, y, z = [float(c.strip().replace("d", "")) for c in coords]
-                    player.last_seen_x, player.last_seen_y, player.last_seen_z = x, y, z
-                    logger.debug(
-                        f"Player {name} last seen at coordinates: ({x}, {y}, {z})"
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to get position for {name}: {e}")
-
-
-                # 📍 Try to get dimension
-                try:
-                    dim_response = rcon.command(f"data get entity {name} Dimension")
-                    logger.debug(f"Dimension response for {name}: {dim_response}")
-                    # Example: 'Vukvuk has the following entity data: "minecraft:overworld"'
-                    if "minecraft:" not in dim_response:
-                        raise ValueError(f"Invalid dimension format: {dim_response}")
-                    dimension = dim_response.split("\"")[1].strip().replace('"', "")
-                    logger.debug(
-                        f"Parsed dimension for {name}: {dimension}"
-                    )
-                    player.last_seen_dimension = dimension
-                    logger.debug(f"Player {name} is in dimension: {dimension}")
-                except Exception as e:
-                    logger.warning(f"Failed to get dimension for {name}: {e}")
-
-                await player.save()
-                logger.debug(f"Player {name} saved to DB.")
-
-            status_data = {
-                "status": "Online",
-                "players_online": players_online,
-                "max_players": max_players,
-                "player_names": player_names,
-                "timestamp": datetime.now(ZoneInfo(TIMEZONE)),
-            }
+                for name in located:
+                    coords = await get_coordinates(name, Priority.POLL, server)
+                    if coords:
+                        dimension, x, y, z = coords
+                        positions[name] = (x, y, z)
+                        dimensions[name] = dimension
+        except Exception as e:
+            if not POLL_STATUS_PROBE:
+                raise
+            # The probe says the server is up; only positions are missing
+            logger.warning("Fetching positions on %s failed: %s", server, e)
+
+        # ✅ Ensure all players exist as GamePlayer and record where they are
+        players = {}
+        if located:
+            players = await _upsert_online_players(
+                server, located, positions, dimensions
+            )
+
+        status_data = {
+            "server": server,
+            "status": "Online",
+            **fields,
+            "player_names": player_names,
+            "timestamp": datetime.now(ZoneInfo(TIMEZONE)),
+        }
 
     except Exception as e:
-        logger.error(f"[RCON GREŠKA]: {e}")
+        logger.error("[RCON GREŠKA] %s: %s", server, e)
+        players, positions, dimensions = {}, {}, {}
         status_data = {
+            "server": server,
             "status": "Offline",
             "players_online": 0,
             "max_players": 0,
             "player_names": [],
-            "de": datetime.now(ZoneInfo(TIMEZONE)),
+            "latency_ms": None,
+            "timestamp": datetime.now(ZoneInfo(TIMEZONE)),
         }
 
-    _server_status_cache.update(status_data)
+    previous_names = set(status_cache["player_names"])
+    status_cache.update(status_data)
+    _publish_status(status_data, players, previous_names)
+
+    # 💾 Store in DB (raw sample on change, rollups, retention, sessions, trails)
+    await record_status(status_data)
+    if roster_known:
+        await update_sessions(server, players, status_data["timestamp"])
+        await record_positions(server, players, positions, dimensions, status_data["timestamp"])
+    bump_status_generation()
+
+    return status_data
+
+
+async def apply_log_events(server: str, events: List[LogEvent]) -> None:
+    """Bring a server's cached status up to date with events read from its log.
+
+    Joins and leaves change who is online right away, and open or close
+    sessions at the time of their line; everyone who joined, left, died or
+    chatted has `last_seen` moved to that line, and chat goes to the archive.
+    Positions are left to the next poll.
+
+    The cached status is only changed once everything is stored, storing
+    chat again is a no-op and sessions are updated all at once, so a batch
+    that fails part way can be replayed.
+    """
+    if not events:
+        return
+    now = datetime.now(ZoneInfo(TIMEZONE))
+    status_cache = _server_status_caches[server]
+    previous_names = list(status_cache["player_names"])
+    names = list(previous_names)
+    # Who is online after each join or leave, and when
+    rosters: List[Tuple[datetime, List[str]]] = []
+    seen: Dict[str, datetime] = {}
+    chat: List[Tuple[str, datetime, str]] = []
+    for event in events:
+        moment = recent_event_time(event.clock, now)
+        if event.kind == LEAVE:
+            if event.player in names:
+                names.remove(event.player)
+                rosters.append((moment, list(names)))
+        elif event.player not in names:
+            # Dying or chatting means being online too
+            names.append(event.player)
+            rosters.append((moment, list(names)))
+        if event.kind == CHAT:
+            chat.append((event.player, moment, event.text))
+        seen[event.player] = moment
+
+    async with in_transaction() as conn:
+        players = await get_or_create_players(
+            conn, server, sorted({*names, *seen}), min(seen.values())
+        )
+        for name, moment in seen.items():
+            players[name].last_seen = moment
+        await GamePlayer.bulk_update(
+            [players[name] for name in seen], fields=["last_seen"], using_db=conn
+        )
+        if chat:
+            await ChatMessage.bulk_create(
+                [
+                    ChatMessage(player_id=players[name].id, sent_at=moment, text=text)
+                    for name, moment, text in chat
+                ],
+                ignore_conflicts=True,
+                using_db=conn,
+            )
+
+    status_data = None
+    if names != previous_names:
+        status_data = {
+            **status_cache,
+            "status": "Online",
+            "players_online": len(names),
+            "player_names": names,
+            "timestamp": rosters[-1][0],
+        }
+        await record_presence_change(status_data)
+    if rosters:
+        await apply_presence_changes(
+            server,
+            [(moment, {name: players[name] for name in roster}) for moment, roster in rosters],
+        )
+    if status_data is not None:
+        status_cache.update(status_data)
+        _publish_status(status_data, players, set(previous_names))
+    bump_status_generation()
+
+
+async def _timed_poll(server: str) -> dict:
+    started = time.monotonic()
+    status = {"server": server, "status": "Error"}
+    try:
+        status = await poll_and_cache(server)
+        return status
+    finally:
+        SERVER_POLL_DURATION.observe(
+            time.monotonic() - started, server=server, status=status["status"]
+        )
+
+
+async def poll_all_servers() -> dict:
+    """Poll every registered server concurrently.
 
-    # 💾 Store in DB
-    await ServerSnapshot.create(
-        status=status_data["status"],
-        players_online=status_data["players_online"],
-        max_players=status_data["max_players"],
-        player_names=status_data["player_names"],
+    A tick takes as long as the slowest server, not the sum of all of them.
+    Returns a summary for the poll scheduler: "Online" when any server is,
+    with the players online across all servers.
+    """
+    results = await asyncio.gather(
+        *(_timed_poll(server.key) for server in all_servers()),
+        return_exceptions=True,
     )
+    statuses = {}
+    for server, result in zip(all_servers(), results):
+        if isinstance(result, Exception):
+            logger.error("Polling %s failed: %s", server.key, result)
+            result = {"status": "Error", "players_online": 0}
+        statuses[server.key] = result
 
-    # 🧹 Keep only the latest 20 entries
-    snapshots = await ServerSnapshot.all().order_by("-timestamp")
-    if len(snapshots) > 20:
-        for old in snapshots[20:]:
-            await old.delete()
+    online = [s for s in statuses.values() if s.get("status") == "Online"]
+    return {
+        "status": "Online" if online else "Offline",
+        "players_online": sum(s.get("players_online", 0) for s in online),
+        "servers": {key: s.get("status") for key, s in statuses.items()},
+    }
@@ -0,0 +1,150 @@
+"""Chat archive: every chat line from the server logs, searchable with SQLite FTS5.
+
+Messages are stored in ChatMessage and indexed in the `chatmessage_fts`
+external-content table, which triggers keep in sync, so writers only insert
+ChatMessage rows (in bulk, in the same transaction as the rest of a batch of
+log events).
+
+Results are newest first and paged with a keyset cursor: the id of the last
+message shown. A page costs the same no matter how deep it is.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from tortoise import Tortoise
+
+# The FTS table and its sync triggers; Tortoise can't declare these, so they
+# are created at startup as well as by the migration.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS "chatmessage_fts" USING fts5(
+    "text", content="chatmessage", content_rowid="id",
+    tokenize="unicode61 remove_diacritics 2"
+);
+CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_insert" AFTER INSERT ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("rowid", "text") VALUES (new."id", new."text");
+END;
+CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_delete" AFTER DELETE ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("chatmessage_fts", "rowid", "text") VALUES ('delete', old."id", old."text");
+END;
+CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_update" AFTER UPDATE OF "text" ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("chatmessage_fts", "rowid", "text") VALUES ('delete', old."id", old."text");
+    INSERT INTO "chatmessage_fts" ("rowid", "text") VALUES (new."id", new."text");
+END;
+"""
+
+# A quoted phrase, or a word (with * at the end for a prefix)
+_QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+@dataclass
+class ChatHit:
+    id: int
+    sent_at: datetime
+    player_id: int
+    player: str
+    text: str
+
+
+async def ensure_chat_index() -> None:
+    """Create the FTS table if missing, indexing messages stored before it existed."""
+    conn = Tortoise.get_connection("default")
+    rows = await conn.execute_query_dict(
+        "SELECT 1 FROM sqlite_master WHERE name = 'chatmessage_fts'"
+    )
+    await conn.execute_script(FTS_SCHEMA)
+    if not rows:
+        await conn.execute_script(
+            "INSERT INTO \"chatmessage_fts\" (\"chatmessage_fts\") VALUES ('rebuild');"
+        )
+
+
+def fts_query(query: str) -> Optional[str]:
+    """Turn what an admin typed into a safe FTS5 query.
+
+    Words must all appear; "quoted words" must appear as a phrase, and a word
+    ending in * matches any word starting with it. Everything else is taken
+    literally, so the input can't be an FTS syntax error. None when there is
+    nothing to search for.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM.findall(query):
+        if phrase:
+            terms.append('"' + phrase + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.replace('"', "").rstrip("*")
+            if word:
+                terms.append('"' + word + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def _db_time(moment: datetime) -> str:
+    # Tortoise converts DatetimeFields to UTC and stores them as text, so
+    # bounds must be written the same way for the comparisons to hold
+    return str(moment.astimezone(timezone.utc))
+
+
+async def search_chat(
+    query: Optional[str] = None,
+    server: Optional[str] = None,
+    player_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[int] = None,
+    limit: int = 50,
+) -> List[ChatHit]:
+    """Chat messages matching a search, newest first.
+
+    before is the id of the last message of the previous page. Every filter
+    is optional; without a query this lists the latest messages.
+    """
+    if query is not None:
+        query = fts_query(query)
+    where, values = [], []
+    if query is not None:
+        source = (
+            'FROM "chatmessage_fts" f JOIN "chatmessage" m ON m."id" = f."rowid"'
+        )
+        where.append('f."chatmessage_fts" MATCH ?')
+        values.append(query)
+    else:
+        source = 'FROM "chatmessage" m'
+    if server is not None:
+        where.append('p."server" = ?')
+        values.append(server)
+    if player_id is not None:
+        where.append('m."player_id" = ?')
+        values.append(player_id)
+    if since is not None:
+        where.append('m."sent_at" >= ?')
+        values.append(_db_time(since))
+    if until is not None:
+        where.append('m."sent_at" < ?')
+        values.append(_db_time(until))
+    if before is not None:
+        where.append(
+            '(m."sent_at", m."id") < (SELECT "sent_at", "id" FROM "chatmessage" WHERE "id" = ?)'
+        )
+        values.append(before)
+
+    sql = (
+        f'SELECT m."id", m."sent_at", m."player_id", p."name", m."text" {source}'
+        ' JOIN "gameplayer" p ON p."id" = m."player_id"'
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + ' ORDER BY m."sent_at" DESC, m."id" DESC LIMIT ?'
+    )
+    values.append(limit)
+    rows = await Tortoise.get_connection("default").execute_query_dict(sql, values)
+    return [
+        ChatHit(
+            id=row["id"],
+            sent_at=datetime.fromisoformat(row["sent_at"]),
+            player_id=row["player_id"],
+            player=row["name"],
+            text=row["text"],
+        )
+        for row in rows
+    ]
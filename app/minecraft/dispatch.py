@@ -0,0 +1,321 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from app.metrics import (
+    RCON_COALESCED,
+    RCON_QUEUE_DEPTH,
+    RCON_QUEUE_TIMEOUTS,
+    RCON_QUEUE_WAIT,
+)
+from app.minecraft.rcon import RconError, RconPool, get_rcon_pool
+from app.minecraft.servers import DEFAULT_SERVER, get_server
+from app.settings import (
+    RCON_BURST,
+    RCON_COMMANDS_PER_SECOND,
+    RCON_MAX_IN_FLIGHT,
+    RCON_PRIORITY_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Commands that only read server state; identical ones in flight share a reply
+_READ_ONLY_COMMANDS = ("list", "banlist", "whitelist list")
+_READ_ONLY_PREFIXES = ("data get ", "execute as @a run data get ")
+
+
+class Priority(IntEnum):
+    """Who is waiting on a command; lower values are sent first."""
+
+    ADMIN = 0
+    USER = 1
+    POLL = 2
+
+
+def is_read_only(command: str) -> bool:
+    command = command.lstrip("/")
+    return command in _READ_ONLY_COMMANDS or command.startswith(_READ_ONLY_PREFIXES)
+
+
+class _Job:
+    def __init__(self, key: Optional[str], cost: int, run: Callable[[], Awaitable], priority: Priority):
+        self.key = key
+        self.cost = cost
+        self.run = run
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.context = contextvars.copy_context()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+        self.started = False
+
+
+class CommandScheduler:
+    """Single queue in front of an RCON pool that every caller goes through.
+
+    Commands are sent in priority order (admin, then user, then poll) under a
+    token-bucket rate limit and a cap on commands in flight, so a slow poll
+    can't hold up a kick and bursts don't swamp the server's RCON thread.
+    Identical read-only commands that are already queued or running share one
+    reply. A caller's timeout covers both queueing and the round trip; a
+    queued command whose callers all gave up is never sent.
+    """
+
+    def __init__(
+        self,
+        pool: RconPool,
+        server: str = DEFAULT_SERVER,
+        rate: float = RCON_COMMANDS_PER_SECOND,
+        burst: int = RCON_BURST,
+        max_in_flight: int = RCON_MAX_IN_FLIGHT,
+        timeouts: Dict[str, float] = RCON_PRIORITY_TIMEOUTS,
+    ):
+        self.pool = pool
+        self.server = server
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.timeouts = {priority: timeouts[priority.name.lower()] for priority in Priority}
+
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._in_flight: Dict[str, _Job] = {}
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+        self.submitted = {priority: 0 for priority in Priority}
+        self.coalesced = 0
+        self.timeouts_hit = 0
+        self.dropped = 0
+        self.running = 0
+        # per priority: (commands sent, total wait, longest wait)
+        self._waits = {priority: [0, 0.0, 0.0] for priority in Priority}
+
+    async def command(
+        self, command: str, priority: Priority = Priority.ADMIN, timeout: Optional[float] = None
+    ) -> str:
+        """Queue a command and return its reply.
+
+        Raises RconError when it fails or is not answered within the timeout.
+        """
+        self.submitted[priority] += 1
+        key = command.lstrip("/") if is_read_only(command) else None
+        job = self._in_flight.get(key) if key is not None else None
+        if job is not None:
+            self.coalesced += 1
+            RCON_COALESCED.inc(server=self.server)
+            if priority < job.priority and not job.started:
+                # Re-queue at the more urgent class; the old heap entry is skipped
+                job.priority = priority
+                self._push(job)
+        else:
+            job = _Job(key, 1, lambda: self.pool.command(command), priority)
+            if key is not None:
+                self._in_flight[key] = job
+            self._push(job)
+        return await self._wait(job, command, priority, timeout)
+
+    async def pipeline(
+        self,
+        commands: List[str],
+        priority: Priority = Priority.ADMIN,
+        timeout: Optional[float] = None,
+    ) -> List[Union[str, RconError]]:
+        """Send a batch through `RconPool.pipeline`, at most `burst` commands at a time.
+
+        Each chunk is queued like any other command once the one before it is
+        answered, costs one token per command and has its own timeout, so
+        commands queued meanwhile are not held up behind the whole batch.
+        Raises RconError only when nothing could be sent; once part of the
+        batch has gone out, the rest reports the error per command.
+        """
+        results: List[Union[str, RconError]] = []
+        for start in range(0, len(commands), self.burst):
+            chunk = commands[start : start + self.burst]
+            self.submitted[priority] += len(chunk)
+            job = _Job(None, len(chunk), lambda chunk=chunk: self.pool.pipeline(chunk), priority)
+            self._push(job)
+            try:
+                results.extend(
+                    await self._wait(job, f"{len(chunk)} pipelined commands", priority, timeout)
+                )
+            except RconError as e:
+                if not results:
+                    raise
+                results.extend([e] * (len(commands) - len(results)))
+                break
+        return results
+
+    def _push(self, job: _Job) -> None:
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+        self._update_depth()
+        self._wakeup.set()
+        if self._dispatch_task is None or self._dispatch_task.done():
+            self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+
+    async def _wait(self, job: _Job, label: str, priority: Priority, timeout: Optional[float]):
+        timeout = self.timeouts[priority] if timeout is None else timeout
+        job.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts_hit += 1
+            RCON_QUEUE_TIMEOUTS.inc(server=self.server, priority=priority.name.lower())
+            raise RconError(f"RCON command not answered within {timeout:g}s: {label}")
+        finally:
+            job.waiters -= 1
+
+    def _update_depth(self) -> None:
+        depth = self.queue_depth()
+        for priority in Priority:
+            RCON_QUEUE_DEPTH.set(
+                depth[priority.name.lower()], server=self.server, priority=priority.name.lower()
+            )
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for entry_priority, _, job in self._heap:
+            if not job.started and entry_priority == job.priority:
+                depth[job.priority.name.lower()] += 1
+        return depth
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def _next_job(self) -> _Job:
+        while True:
+            while self._heap:
+                entry_priority, _, job = heapq.heappop(self._heap)
+                if job.started or entry_priority != job.priority:
+                    continue  # already sent, or re-queued at a higher priority
+                if job.waiters == 0:
+                    self._drop(job)
+                    continue
+                return job
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _drop(self, job: _Job) -> None:
+        # Every caller timed out or was cancelled while this sat in the queue
+        self.dropped += 1
+        if job.key is not None and self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+        job.future.cancel()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._slots.acquire()
+            try:
+                await self._take_token()
+                job = await self._next_job()
+            except BaseException:
+                self._slots.release()
+                raise
+            job.started = True
+            # Payment may go negative for a batch, which paces what follows
+            self._tokens -= job.cost
+            self.running += 1
+            self._update_depth()
+
+            waited = time.monotonic() - job.enqueued
+            RCON_QUEUE_WAIT.observe(waited, server=self.server, priority=job.priority.name.lower())
+            stats = self._waits[job.priority]
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+
+            # Run in the first caller's context so per-request RCON accounting works
+            job.context.run(asyncio.create_task, self._run(job))
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            result = await job.run()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e if isinstance(e, RconError) else RconError(str(e) or type(e).__name__))
+                # Nobody may be left to await it
+                job.future.exception()
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            if job.key is not None and self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth(),
+            "running": self.running,
+            "submitted": {priority.name.lower(): count for priority, count in self.submitted.items()},
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts_hit,
+            "dropped": self.dropped,
+            "wait_seconds": {
+                priority.name.lower(): {
+                    "sent": sent,
+                    "mean": total / sent if sent else None,
+                    "max": longest,
+                }
+                for priority, (sent, total, longest) in self._waits.items()
+            },
+        }
+
+    async def close(self) -> None:
+        if self._dispatch_task is not None:
+            self._dispatch_task.cancel()
+            try:
+                await self._dispatch_task
+            except asyncio.CancelledError:
+                pass
+            self._dispatch_task = None
+        for _, _, job in self._heap:
+            if not job.future.done():
+                job.future.set_exception(RconError("RCON scheduler closed"))
+                job.future.exception()
+        self._heap.clear()
+        self._in_flight.clear()
+        self._update_depth()
+
+
+_schedulers: Dict[str, CommandScheduler] = {}
+
+
+def get_command_scheduler(server: Optional[str] = None) -> CommandScheduler:
+    """Return the scheduler in front of a registered server's shared pool."""
+    config = get_server(server)
+    scheduler = _schedulers.get(config.key)
+    if scheduler is None:
+        pool = get_rcon_pool(config.rcon_host, config.rcon_port, config.rcon_password)
+        scheduler = _schedulers[config.key] = CommandScheduler(pool, config.key)
+    return scheduler
+
+
+async def rcon_command(
+    command: str,
+    priority: Priority = Priority.ADMIN,
+    timeout: Optional[float] = None,
+    server: Optional[str] = None,
+) -> str:
+    """Send a command to a server (the default one if None) through its scheduler."""
+    return await get_command_scheduler(server).command(command, priority, timeout)
+
+
+async def close_command_schedulers() -> None:
+    for scheduler in list(_schedulers.values()):
+        await scheduler.close()
+    _schedulers.clear()
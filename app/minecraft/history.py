@@ -0,0 +1,189 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.minecraft.servers import get_server
+from app.models import PlayerTrailBlock, ServerSnapshot, ServerStatsRollup
+from app.settings import (
+    POLL_OFFLINE_MAX_INTERVAL_SECONDS,
+    SNAPSHOT_HEARTBEAT_SECONDS,
+    SNAPSHOT_RETENTION,
+)
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ("minute", "hour", "day")
+
+# Key of the last raw sample written, and when it was written, per server
+_last_samples: Dict[str, Tuple[tuple, datetime]] = {}
+
+# Rollup row currently being filled, per server and resolution
+_open_rollups: Dict[Tuple[str, str], ServerStatsRollup] = {}
+
+# Time, online and player count of the last poll, per server
+_last_polls: Dict[str, Tuple[datetime, bool, int]] = {}
+
+# A longer gap between two polls means the dashboard wasn't running; only
+# this much of it is credited to the earlier poll
+MAX_POLL_GAP = timedelta(seconds=2 * POLL_OFFLINE_MAX_INTERVAL_SECONDS)
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket."""
+    if resolution == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
+def _bucket_end(start: datetime, resolution: str) -> datetime:
+    if resolution == "minute":
+        return start + timedelta(minutes=1)
+    if resolution == "hour":
+        return start + timedelta(hours=1)
+    return start + timedelta(days=1)
+
+
+async def record_status(status_data: dict) -> None:
+    """Store one server's poll result: a raw sample when something changed, plus rollups."""
+    timestamp = status_data["timestamp"]
+
+    await _write_sample_if_changed(status_data, timestamp)
+
+    hour_rolled_over = await _update_rollups(status_data, timestamp)
+    if hour_rolled_over:
+        await prune_history(timestamp)
+
+
+async def record_presence_change(status_data: dict) -> None:
+    """Store a change in who is online seen between polls, as a raw sample only.
+
+    Rollups are credited with the time between polls, so they are left to
+    the next one.
+    """
+    await _write_sample_if_changed(status_data, status_data["timestamp"])
+
+
+async def _write_sample_if_changed(status_data: dict, timestamp: datetime) -> None:
+    server = status_data["server"]
+    key = (
+        status_data["status"],
+        status_data["max_players"],
+        frozenset(status_data["player_names"]),
+    )
+    if server in _last_samples:
+        last_key, last_written = _last_samples[server]
+        heartbeat_due = timestamp - last_written >= timedelta(
+            seconds=SNAPSHOT_HEARTBEAT_SECONDS
+        )
+        if key == last_key and not heartbeat_due:
+            return
+
+    await ServerSnapshot.create(
+        server=server,
+        timestamp=timestamp,
+        status=status_data["status"],
+        players_online=status_data["players_online"],
+        max_players=status_data["max_players"],
+        player_names=status_data["player_names"],
+    )
+    _last_samples[server] = (key, timestamp)
+
+
+async def _update_rollups(status_data: dict, timestamp: datetime) -> bool:
+    """Credit the time since a server's previous poll to what that poll saw.
+
+    The poll interval ranges from seconds while players are online to half
+    an hour while the server is down, so counting polls would weigh states
+    by how often they are polled. The elapsed time is split over the
+    minute/hour/day buckets it falls in. Returns True when a new hour bucket
+    was opened.
+    """
+    server = status_data["server"]
+    previous = _last_polls.get(server)
+    _last_polls[server] = (
+        timestamp,
+        status_data["status"] == "Online",
+        status_data["players_online"],
+    )
+    if previous is None:
+        return False
+    since, online, players = previous
+    since = max(since, timestamp - MAX_POLL_GAP)
+    hour_rolled_over = False
+
+    for resolution in RESOLUTIONS:
+        start = since
+        while start < timestamp:
+            bucket = bucket_start(start, resolution)
+            end = min(_bucket_end(bucket, resolution), timestamp)
+            rollup = _open_rollups.get((server, resolution))
+            if rollup is None or rollup.bucket_start != bucket:
+                rollup, _ = await ServerStatsRollup.get_or_create(
+                    server=server, resolution=resolution, bucket_start=bucket
+                )
+                _open_rollups[server, resolution] = rollup
+                hour_rolled_over |= resolution == "hour"
+
+            seconds = round((end - start).total_seconds())
+            rollup.seconds += seconds
+            rollup.online_seconds += seconds if online else 0
+            rollup.player_seconds += seconds * players
+            rollup.players_min = (
+                players if rollup.players_min is None else min(rollup.players_min, players)
+            )
+            rollup.players_max = (
+                players if rollup.players_max is None else max(rollup.players_max, players)
+            )
+            await rollup.save(
+                update_fields=[
+                    "seconds",
+                    "online_seconds",
+                    "player_seconds",
+                    "players_min",
+                    "players_max",
+                ]
+            )
+            start = end
+
+    return hour_rolled_over
+
+
+async def prune_history(now: datetime) -> None:
+    """Drop raw samples, rollups and trails older than their configured retention."""
+    retention = SNAPSHOT_RETENTION.get("raw")
+    if retention is not None:
+        deleted = await ServerSnapshot.filter(timestamp__lt=now - retention).delete()
+        logger.debug("Pruned %s raw snapshots", deleted)
+
+    for resolution in RESOLUTIONS:
+        retention = SNAPSHOT_RETENTION.get(resolution)
+        if retention is None:
+            continue
+        deleted = await ServerStatsRollup.filter(
+            resolution=resolution, bucket_start__lt=now - retention
+        ).delete()
+        logger.debug("Pruned %s %s rollups", deleted, resolution)
+
+    retention = SNAPSHOT_RETENTION.get("trail")
+    if retention is not None:
+        deleted = await PlayerTrailBlock.filter(ended_at__lt=now - retention).delete()
+        logger.debug("Pruned %s trail blocks", deleted)
+
+
+async def get_rollups(
+    resolution: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    server: Optional[str] = None,
+) -> List[ServerStatsRollup]:
+    """Return a server's rollups of a resolution in a time range, oldest first."""
+    query = ServerStatsRollup.filter(
+        server=get_server(server).key, resolution=resolution, bucket_start__gte=since
+    )
+    if until is not None:
+        query = query.filter(bucket_start__lt=until)
+    return await query.order_by("bucket_start")
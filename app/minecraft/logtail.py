@@ -0,0 +1,232 @@
+"""Real-time events from each server's logs/latest.log.
+
+A tailer per server with a log path reads whatever was appended since its
+last check, in chunks of up to LOG_TAIL_READ_BYTES off the event loop, and
+hands the parsed events to the status cache. How far it got is stored in
+LogCursor, so a restart picks up where it stopped.
+
+When the server rotates the log (on restart, latest.log is compressed away
+and a new one started) the rest of the old file is still read through the
+open handle before switching. A file that shrank was truncated and is read
+from the start again. Without a stored cursor, reading starts at the end of
+the file; older logs are for the backfill.
+"""
+
+import asyncio
+import logging
+import os
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from app.metrics import LOG_TAIL_BYTES, LOG_TAIL_EVENTS
+from app.minecraft.cache import apply_log_events
+from app.minecraft.serverlog import parse_lines
+from app.minecraft.servers import all_servers
+from app.models import LogCursor
+from app.settings import LOG_TAIL_INTERVAL_SECONDS, LOG_TAIL_READ_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class LogTailer:
+    def __init__(
+        self,
+        server: str,
+        path: str,
+        interval: float = LOG_TAIL_INTERVAL_SECONDS,
+        read_bytes: int = LOG_TAIL_READ_BYTES,
+    ):
+        self.server = server
+        self.path = path
+        self.interval = interval
+        self.read_bytes = read_bytes
+
+        self._file: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        # Bytes of the open file handled so far, up to the last complete line
+        self.offset = 0
+        self._partial = b""
+        self._cursor: Optional[LogCursor] = None
+        # Inode and offset up to which lines were applied and saved; a failed
+        # tick reads again from here
+        self._applied: Optional[Tuple[int, int]] = None
+        self._started = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.bytes_read = 0
+        self.events = 0
+        self.rotations = 0
+        self.truncations = 0
+        self.rewinds = 0
+
+    def _open(self, resume_at: Optional[int]) -> None:
+        """Open the log at an offset; None means at its end."""
+        self._file = open(self.path, "rb")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        if resume_at is None:
+            self.offset = self._file.seek(0, os.SEEK_END)
+        else:
+            self.offset = self._file.seek(resume_at)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
+
+    def _drain(self, final: bool = False) -> List[bytes]:
+        """Complete lines appended since the last call; final also returns a trailing partial line."""
+        lines = []
+        while True:
+            chunk = self._file.read(self.read_bytes)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            LOG_TAIL_BYTES.inc(len(chunk), server=self.server)
+            *complete, self._partial = (self._partial + chunk).split(b"\n")
+            lines.extend(complete)
+        if final and self._partial:
+            lines.append(self._partial)
+            self._partial = b""
+        self.offset = self._file.tell() - len(self._partial)
+        return lines
+
+    def _resume_offset(self, st: os.stat_result) -> Optional[int]:
+        """Where to start in the log found at startup or after a failed tick."""
+        if self._applied is None:
+            return None
+        inode, offset = self._applied
+        if inode == st.st_ino and offset <= st.st_size:
+            return offset
+        # Rotated or truncated meanwhile; the new file is all unread
+        return 0
+
+    def _read(self) -> List[bytes]:
+        """New lines since the last call, following rotation and truncation."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+
+        lines = []
+        if self._file is not None and (st is None or st.st_ino != self._inode):
+            # The old file was moved away; finish it through the open handle
+            lines += self._drain(final=True)
+            self._close()
+            self.rotations += 1
+            logger.info("Log of %s rotated", self.server)
+        if st is None:
+            return lines
+
+        if self._file is None:
+            self._open(0 if self._started else self._resume_offset(st))
+            self._started = True
+            if self._applied is None:
+                self._applied = (self._inode, self.offset)
+        elif st.st_size < self.offset:
+            logger.info("Log of %s was truncated, reading it from the start", self.server)
+            self.truncations += 1
+            self.offset = self._file.seek(0)
+            self._partial = b""
+        return lines + self._drain()
+
+    async def _save_cursor(self) -> None:
+        if self._inode is None:
+            return
+        if self._cursor is None:
+            self._cursor = await LogCursor.create(
+                server=self.server, inode=self._inode, offset=self.offset
+            )
+        elif (self._cursor.inode, self._cursor.offset) != (self._inode, self.offset):
+            self._cursor.inode, self._cursor.offset = self._inode, self.offset
+            await self._cursor.save(update_fields=["inode", "offset", "updated_at"])
+        self._applied = (self._inode, self.offset)
+
+    def _rewind(self) -> None:
+        """Go back to the last applied position, as a restart would."""
+        self._close()
+        self._partial = b""
+        self._started = False
+        self.rewinds += 1
+
+    async def _tick(self) -> None:
+        lines = await asyncio.to_thread(self._read)
+        events = list(
+            parse_lines(line.decode("utf-8", errors="replace") for line in lines)
+        )
+        try:
+            if events:
+                await apply_log_events(self.server, events)
+            # Only after the events are applied, so a crash replays rather than loses them
+            await self._save_cursor()
+        except Exception:
+            # Likewise read these lines again next time
+            self._rewind()
+            raise
+        for event in events:
+            LOG_TAIL_EVENTS.inc(server=self.server, kind=event.kind)
+        self.events += len(events)
+        if events:
+            logger.debug("%d events from the log of %s", len(events), self.server)
+
+    async def run(self) -> None:
+        try:
+            self._cursor = await LogCursor.get_or_none(server=self.server)
+            if self._cursor is not None:
+                self._applied = (self._cursor.inode, self._cursor.offset)
+            while True:
+                try:
+                    await self._tick()
+                except Exception:
+                    logger.exception("Tailing the log of %s failed", self.server)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._close()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            logger.info("Tailing %s for %s.", self.path, self.server)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "running": self._task is not None and not self._task.done(),
+            "offset": self.offset,
+            "bytes_read": self.bytes_read,
+            "events": self.events,
+            "rotations": self.rotations,
+            "truncations": self.truncations,
+            "rewinds": self.rewinds,
+        }
+
+
+_tailers: Dict[str, LogTailer] = {}
+
+
+def start_log_tailers() -> None:
+    """Start tailing the log of every server that has a log path."""
+    for server in all_servers():
+        if not server.log_path:
+            continue
+        if server.key not in _tailers:
+            _tailers[server.key] = LogTailer(server.key, server.log_path)
+        _tailers[server.key].start()
+
+
+async def stop_log_tailers() -> None:
+    for tailer in _tailers.values():
+        await tailer.stop()
+
+
+def log_tailer_stats() -> Dict[str, dict]:
+    return {key: tailer.stats() for key, tailer in _tailers.items()}
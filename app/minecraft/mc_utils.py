@@ -1,69 +1,135 @@
+import asyncio
 import logging
+import re
 from typing import Dict, List, Optional, Tuple
 
-from mcrcon import MCRcon
-
+from app.minecraft.dispatch import Priority, rcon_command
+from app.minecraft.servers import get_server
 from app.models import GamePlayer
-from app.settings import RCON_HOST, RCON_PASSWORD, RCON_PORT
 
 logger = logging.getLogger(__name__)
 
+# Example: 'Vukvuk has the following entity data: [123.0d, 64.0d, -321.5d]'
+_POS_PATTERN = re.compile(
+    r"(\w+) has the following entity data: "
+    r"\[(-?[\d.E-]+)d, (-?[\d.E-]+)d, (-?[\d.E-]+)d\]"
+)
+# Example: 'Vukvuk has the following entity data: "minecraft:overworld"'
+_DIM_PATTERN = re.compile(r'(\w+) has the following entity data: "([^"]+)"')
+
 
-def _send_rcon_command(cmd: str) -> str:
+async def _send_rcon_command(
+    cmd: str, priority: Priority = Priority.USER, server: Optional[str] = None
+) -> str:
     logger.debug("Sending RCON command: %s", cmd)
     try:
-        with MCRcon(RCON_HOST, RCON_PASSWORD, port=RCON_PORT) as rcon:
-            return rcon.command(cmd)
+        return await rcon_command(cmd, priority, server=server)
     except Exception as e:
         logger.error("RCON error: %s", e)
         raise
 
 
+def parse_positions(response: str) -> Dict[str, Tuple[float, float, float]]:
+    """Parse one or more `data get entity ... Pos` replies, keyed by player."""
+    return {
+        name: (float(x), float(y), float(z))
+        for name, x, y, z in _POS_PATTERN.findall(response or "")
+    }
+
+
+def parse_dimensions(response: str) -> Dict[str, str]:
+    """Parse one or more `data get entity ... Dimension` replies, keyed by player."""
+    return dict(_DIM_PATTERN.findall(response or ""))
+
+
 # 📍 Get player coordinates and dimension
-def get_coordinates(
+async def get_coordinates(
     player_name: str,
+    priority: Priority = Priority.USER,
+    server: Optional[str] = None,
 ) -> Optional[Tuple[str, float, float, float]]:
-    # Step 1: Get position
-    pos_response = _send_rcon_command(f"data get entity {player_name} Pos")
-    try:
-        coords_str = pos_response.split("[")[1].split("]")[0]
-        x, y, z = [float(c.strip().replace("d", "")) for c in coords_str.split(",")]
-    except Exception as e:
-        logger.warning("Failed to parse coordinates for %s: %s", player_name, e)
+    pos_response, dim_response = await asyncio.gather(
+        _send_rcon_command(f"data get entity {player_name} Pos", priority, server),
+        _send_rcon_command(f"data get entity {player_name} Dimension", priority, server),
+    )
+
+    positions = parse_positions(pos_response)
+    if player_name not in positions:
+        logger.warning("Failed to parse coordinates for %s: %s", player_name, pos_response)
         return None
 
-    # Step 2: Get dimension
-    dim_response = _send_rcon_command(f"data get entity {player_name} Dimension")
-    try:
-        # Should be like: Dimension: "minecraft:overworld"
-        dimension = dim_response.split(":", 1)[1].strip().replace('"', "")
-    except Exception as e:
-        logger.warning("Failed to parse dimension for %s: %s", player_name, e)
+    dimensions = parse_dimensions(dim_response)
+    if player_name not in dimensions:
+        logger.warning("Failed to parse dimension for %s: %s", player_name, dim_response)
         return None
 
-    return dimension, x, y, z
+    x, y, z = positions[player_name]
+    return dimensions[player_name], x, y, z
+
+
+async def get_online_positions(
+    player_names: List[str],
+    server: Optional[str] = None,
+) -> Tuple[Dict[str, Tuple[float, float, float]], Dict[str, str]]:
+    """Fetch positions and dimensions of all online players in two commands.
+
+    Players missing from the batched output (e.g. unparseable replies) are
+    queried one by one, concurrently. Everything is sent at poll priority.
+    """
+    pos_response, dim_response = await asyncio.gather(
+        _send_rcon_command("execute as @a run data get entity @s Pos", Priority.POLL, server),
+        _send_rcon_command("execute as @a run data get entity @s Dimension", Priority.POLL, server),
+    )
+    positions = parse_positions(pos_response)
+    dimensions = parse_dimensions(dim_response)
+
+    missing_pos = [name for name in player_names if name not in positions]
+    missing_dim = [name for name in player_names if name not in dimensions]
+    if missing_pos or missing_dim:
+        logger.debug(
+            "Bulk fetch incomplete, falling back for %s",
+            sorted(set(missing_pos) | set(missing_dim)),
+        )
+        replies = await asyncio.gather(
+            *(_send_rcon_command(f"data get entity {n} Pos", Priority.POLL, server) for n in missing_pos),
+            *(_send_rcon_command(f"data get entity {n} Dimension", Priority.POLL, server) for n in missing_dim),
+            return_exceptions=True,
+        )
+        for reply in replies[: len(missing_pos)]:
+            if isinstance(reply, str):
+                positions.update(parse_positions(reply))
+        for reply in replies[len(missing_pos) :]:
+            if isinstance(reply, str):
+                dimensions.update(parse_dimensions(reply))
+
+    return positions, dimensions
 
 
 # 🚀 Teleport player to specific coordinates in a dimension
-def teleport_to_coords(
+async def teleport_to_coords(
     player_name: str,
     x: float,
     y: float,
     z: float,
     dimension: str = "minecraft:overworld",
+    priority: Priority = Priority.USER,
+    server: Optional[str] = None,
 ) -> str:
     cmd = f"/execute in {dimension} run tp {player_name} {x} {y} {z}"
-    return _send_rcon_command(cmd)
+    return await _send_rcon_command(cmd, priority, server)
 
 
 # 🔁 Teleport player to another player
-def teleport_to_player(source_player: str, target_player: str) -> str:
+async def teleport_to_player(
+    source_player: str, target_player: str, server: Optional[str] = None
+) -> str:
     cmd = f"/tp {source_player} {target_player}"
-    return _send_rcon_command(cmd)
+    return await _send_rcon_command(cmd, server=server)
 
 
-async def set_home_from_current_position(playername: str) -> str:
-    result = get_coordinates(playername)
+async def set_home_from_current_position(playername: str, server: Optional[str] = None) -> str:
+    server = get_server(server).key
+    result = await get_coordinates(playername, server=server)
 
     if not result:
         raise Exception("⚠️ Nije moguće dobiti koordinate i dimenziju igrača.")
@@ -75,7 +141,7 @@ async def set_home_from_current_position(playername: str) -> str:
             f"❌ Dimenzija '{dimension}' nije podržana! Možete postaviti kuću samo u 'minecraft:overworld'."
         )
 
-    player, _ = await GamePlayer.get_or_create(name=playername)
+    player, _ = await GamePlayer.get_or_create(server=server, name=playername)
     player.home_x = x
     player.home_y = y
     player.home_z = z
@@ -84,8 +150,9 @@ async def set_home_from_current_position(playername: str) -> str:
     return f"✅ Kuća je postavljena na ({x:.1f}, {y:.1f}, {z:.1f}) u {dimension}"
 
 
-async def teleport_home(player_name: str) -> str:
-    player = await GamePlayer.get_or_none(name=player_name)
+async def teleport_home(player_name: str, server: Optional[str] = None) -> str:
+    server = get_server(server).key
+    player = await GamePlayer.get_or_none(server=server, name=player_name)
     if not player:
         raise Exception(f'❌ Igrač "{player_name}" nije pronađen!')
 
@@ -93,20 +160,28 @@ async def teleport_home(player_name: str) -> str:
         raise Exception(f'❌ Igrač "{player_name}" postavljene koordinate kuće!')
 
     logger.debug(
-        f"Teleporting {player_name} to home at ({player.home_x}, {player.home_y}, {player.home_z}) in {player.home_dimension}"
+        "Teleporting %s to home at (%s, %s, %s) in %s",
+        player_name,
+        player.home_x,
+        player.home_y,
+        player.home_z,
+        player.home_dimension,
     )
-    logger.debug(f"Home coords: {player.home_coords()}")
+    logger.debug("Home coords: %s", player.home_coords())
 
-    return teleport_to_coords(
+    return await teleport_to_coords(
         player_name,
         x=player.home_x,
         y=player.home_y,
         z=player.home_z,
         dimension=player.home_dimension,
+        server=server,
     )
 
 
-async def get_players_by_names(names: List[str]) -> Dict[str, GamePlayer]:
-    """Fetch GamePlayer instances by their names. Returns dict[name] = GamePlayer."""
-    players = await GamePlayer.filter(name__in=names)
+async def get_players_by_names(
+    names: List[str], server: Optional[str] = None
+) -> Dict[str, GamePlayer]:
+    """Fetch a server's GamePlayer instances by their names. Returns dict[name] = GamePlayer."""
+    players = await GamePlayer.filter(server=get_server(server).key, name__in=names)
     return {player.name: player for player in players}
@@ -0,0 +1,338 @@
+"""Player state read straight from the world's playerdata/<uuid>.dat files.
+
+The server saves every player there on logout and at each autosave, so this
+knows where offline players are without any RCON. The files are gzipped
+NBT. Only a handful of root tags are decoded; everything else (inventories,
+ender chests, recipe books, ...) is skipped by size without building
+objects. Parsed files are cached by modification time, so scanning the whole
+directory again only reads what the server rewrote since.
+
+Names map to UUIDs through the server's usercache.json (next to the world
+folder), or, for offline-mode servers, the name-based UUID the server
+derives.
+
+https://minecraft.wiki/w/NBT_format
+https://minecraft.wiki/w/Player.dat_format
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.minecraft.servers import get_server
+from app.models import GamePlayer
+from app.settings import TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+_END, _BYTE, _SHORT, _INT, _LONG, _FLOAT, _DOUBLE = 0, 1, 2, 3, 4, 5, 6
+_BYTE_ARRAY, _STRING, _LIST, _COMPOUND, _INT_ARRAY, _LONG_ARRAY = 7, 8, 9, 10, 11, 12
+
+_FIXED_SIZES = {_END: 0, _BYTE: 1, _SHORT: 2, _INT: 4, _LONG: 8, _FLOAT: 4, _DOUBLE: 8}
+_ARRAY_ITEM_SIZES = {_BYTE_ARRAY: 1, _INT_ARRAY: 4, _LONG_ARRAY: 8}
+_SCALAR_FORMATS = {_BYTE: ">b", _SHORT: ">h", _INT: ">i", _LONG: ">q", _FLOAT: ">f", _DOUBLE: ">d"}
+_ARRAY_FORMATS = {_BYTE_ARRAY: "b", _INT_ARRAY: "i", _LONG_ARRAY: "q"}
+
+# Root tags that are decoded; "respawn" holds the spawn point since 1.21.5
+_WANTED = frozenset(
+    (
+        "Pos", "Dimension", "Health", "XpLevel", "XpP", "XpTotal",
+        "SpawnX", "SpawnY", "SpawnZ", "SpawnDimension", "respawn",
+    )
+)
+# Dimension ids from before 1.16
+_LEGACY_DIMENSIONS = {-1: "minecraft:the_nether", 0: "minecraft:overworld", 1: "minecraft:the_end"}
+
+
+class NBTError(Exception):
+    """Raised for a file that is not (complete) NBT."""
+
+
+def _skip(data: bytes, pos: int, tag: int) -> int:
+    """Position just past a payload of the given type."""
+    size = _FIXED_SIZES.get(tag)
+    if size is not None:
+        return pos + size
+    if tag in _ARRAY_ITEM_SIZES:
+        (length,) = struct.unpack_from(">i", data, pos)
+        return pos + 4 + length * _ARRAY_ITEM_SIZES[tag]
+    if tag == _STRING:
+        (length,) = struct.unpack_from(">H", data, pos)
+        return pos + 2 + length
+    if tag == _LIST:
+        item, length = struct.unpack_from(">bi", data, pos)
+        pos += 5
+        size = _FIXED_SIZES.get(item)
+        if size is not None:
+            return pos + length * size
+        for _ in range(length):
+            pos = _skip(data, pos, item)
+        return pos
+    if tag == _COMPOUND:
+        while True:
+            child = data[pos]
+            pos += 1
+            if child == _END:
+                return pos
+            (length,) = struct.unpack_from(">H", data, pos)
+            pos = _skip(data, pos + 2 + length, child)
+    raise NBTError(f"Unknown tag type {tag}")
+
+
+def _read(data: bytes, pos: int, tag: int):
+    """Decode a payload; returns (value, position after it)."""
+    if tag in _SCALAR_FORMATS:
+        return struct.unpack_from(_SCALAR_FORMATS[tag], data, pos)[0], pos + _FIXED_SIZES[tag]
+    if tag == _STRING:
+        (length,) = struct.unpack_from(">H", data, pos)
+        return data[pos + 2 : pos + 2 + length].decode("utf-8", errors="replace"), pos + 2 + length
+    if tag in _ARRAY_FORMATS:
+        (length,) = struct.unpack_from(">i", data, pos)
+        values = struct.unpack_from(f">{length}{_ARRAY_FORMATS[tag]}", data, pos + 4)
+        return list(values), pos + 4 + length * _ARRAY_ITEM_SIZES[tag]
+    if tag == _LIST:
+        item, length = struct.unpack_from(">bi", data, pos)
+        pos += 5
+        values = []
+        for _ in range(length):
+            value, pos = _read(data, pos, item)
+            values.append(value)
+        return values, pos
+    if tag == _COMPOUND:
+        return _read_compound(data, pos)
+    raise NBTError(f"Unknown tag type {tag}")
+
+
+def _read_compound(data: bytes, pos: int, wanted: Optional[frozenset] = None):
+    """Decode a compound's children (only the wanted ones, if given)."""
+    values = {}
+    while True:
+        tag = data[pos]
+        pos += 1
+        if tag == _END:
+            return values, pos
+        (length,) = struct.unpack_from(">H", data, pos)
+        name = data[pos + 2 : pos + 2 + length].decode("utf-8", errors="replace")
+        pos += 2 + length
+        if wanted is None or name in wanted:
+            values[name], pos = _read(data, pos, tag)
+        else:
+            pos = _skip(data, pos, tag)
+
+
+def read_root_tags(data: bytes, wanted: frozenset = _WANTED) -> dict:
+    """The wanted tags of an uncompressed NBT file's root compound."""
+    try:
+        if data[0] != _COMPOUND:
+            raise NBTError("Root tag is not a compound")
+        (length,) = struct.unpack_from(">H", data, 1)
+        values, _ = _read_compound(data, 3 + length, wanted)
+        return values
+    except (IndexError, struct.error) as e:
+        raise NBTError(f"Truncated NBT: {e}") from e
+
+
+@dataclass(frozen=True)
+class PlayerData:
+    uuid: str
+    saved_at: datetime  # when the server last wrote the file
+    x: Optional[float] = None
+    y: Optional[float] = None
+    z: Optional[float] = None
+    dimension: Optional[str] = None
+    spawn: Optional[Tuple[int, int, int]] = None
+    spawn_dimension: Optional[str] = None
+    health: Optional[float] = None
+    xp_level: Optional[int] = None
+    xp_progress: Optional[float] = None  # towards the next level, 0..1
+    xp_total: Optional[int] = None
+
+    def coords(self) -> str:
+        if self.x is None:
+            return "—"
+        dim = GamePlayer._friendly_dimension_name(self.dimension)
+        return f"({self.x:.1f}, {self.y:.1f}, {self.z:.1f}) u {dim}"
+
+    def spawn_coords(self) -> str:
+        if self.spawn is None:
+            return "—"
+        x, y, z = self.spawn
+        dim = GamePlayer._friendly_dimension_name(self.spawn_dimension or "minecraft:overworld")
+        return f"({x}, {y}, {z}) u {dim}"
+
+
+def _dimension(value) -> Optional[str]:
+    if isinstance(value, int):
+        return _LEGACY_DIMENSIONS.get(value, str(value))
+    return value
+
+
+def parse_player_file(path: str) -> PlayerData:
+    """Read one playerdata file. Raises NBTError or OSError."""
+    with open(path, "rb") as f:
+        raw = f.read()
+        saved_at = datetime.fromtimestamp(os.fstat(f.fileno()).st_mtime, ZoneInfo(TIMEZONE))
+    try:
+        data = gzip.decompress(raw)
+    except (OSError, EOFError) as e:
+        raise NBTError(f"Not a gzipped NBT file: {e}") from e
+    tags = read_root_tags(data)
+
+    fields = {}
+    pos = tags.get("Pos")
+    if isinstance(pos, list) and len(pos) == 3:
+        fields["x"], fields["y"], fields["z"] = pos
+    fields["dimension"] = _dimension(tags.get("Dimension"))
+    respawn = tags.get("respawn")
+    if isinstance(respawn, dict) and len(respawn.get("pos") or []) == 3:
+        fields["spawn"] = tuple(respawn["pos"])
+        fields["spawn_dimension"] = respawn.get("dimension")
+    elif all(key in tags for key in ("SpawnX", "SpawnY", "SpawnZ")):
+        fields["spawn"] = (tags["SpawnX"], tags["SpawnY"], tags["SpawnZ"])
+        fields["spawn_dimension"] = _dimension(tags.get("SpawnDimension"))
+    fields["health"] = tags.get("Health")
+    fields["xp_level"] = tags.get("XpLevel")
+    fields["xp_progress"] = tags.get("XpP")
+    fields["xp_total"] = tags.get("XpTotal")
+
+    player_uuid = os.path.basename(path)[: -len(".dat")]
+    return PlayerData(uuid=player_uuid, saved_at=saved_at, **fields)
+
+
+def offline_uuid(name: str) -> str:
+    """The UUID an offline-mode server gives a name (Java's UUID.nameUUIDFromBytes)."""
+    digest = bytearray(hashlib.md5(f"OfflinePlayer:{name}".encode("utf-8")).digest())
+    digest[6] = (digest[6] & 0x0F) | 0x30
+    digest[8] = (digest[8] & 0x3F) | 0x80
+    return str(uuid.UUID(bytes=bytes(digest)))
+
+
+class PlayerDataReader:
+    """Reads and caches a world's playerdata directory; safe to share between threads."""
+
+    def __init__(self, world_path: str):
+        self.directory = os.path.join(world_path, "playerdata")
+        self.usercache_path = os.path.join(os.path.dirname(os.path.abspath(world_path)), "usercache.json")
+        # path -> (mtime_ns, size, parsed)
+        self._files: Dict[str, Tuple[int, int, PlayerData]] = {}
+        self._usercache: Tuple[int, Dict[str, str]] = (0, {})
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.failures = 0
+
+    def _read_file(self, path: str, stat: os.stat_result) -> Optional[PlayerData]:
+        cached = self._files.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        try:
+            data = parse_player_file(path)
+        except (NBTError, OSError) as e:
+            # Possibly caught mid-write; the next read tries again
+            self.failures += 1
+            logger.warning("Reading %s failed: %s", path, e)
+            return cached[2] if cached is not None else None
+        self.parsed += 1
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+    def read(self, player_uuid: str) -> Optional[PlayerData]:
+        path = os.path.join(self.directory, f"{player_uuid}.dat")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            return self._read_file(path, stat)
+
+    def scan(self) -> Dict[str, PlayerData]:
+        """Every player's data by UUID; only files changed since the last scan are parsed."""
+        found = {}
+        seen = set()
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return found
+        with self._lock:
+            for entry in entries:
+                if not entry.name.endswith(".dat") or not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                data = self._read_file(entry.path, entry.stat())
+                if data is not None:
+                    found[data.uuid] = data
+            for path in set(self._files) - seen:
+                del self._files[path]
+        return found
+
+    def uuids(self) -> Dict[str, str]:
+        """Lowercased player name -> UUID from usercache.json, reloaded when it changes."""
+        try:
+            mtime = os.stat(self.usercache_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._usercache[0]:
+            try:
+                with open(self.usercache_path, encoding="utf-8") as f:
+                    entries = json.load(f)
+                self._usercache = (
+                    mtime,
+                    {e["name"].lower(): e["uuid"] for e in entries if "name" in e and "uuid" in e},
+                )
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                logger.warning("Reading %s failed: %s", self.usercache_path, e)
+        return self._usercache[1]
+
+    def uuid_for(self, name: str) -> str:
+        return self.uuids().get(name.lower()) or offline_uuid(name)
+
+
+_readers: Dict[str, PlayerDataReader] = {}
+
+
+def get_player_data_reader(server: Optional[str] = None) -> Optional[PlayerDataReader]:
+    """The reader for a server's world, or None when its world path isn't set."""
+    config = get_server(server)
+    if not config.world_path:
+        return None
+    reader = _readers.get(config.key)
+    if reader is None:
+        reader = _readers[config.key] = PlayerDataReader(config.world_path)
+    return reader
+
+
+async def get_player_data(name: str, server: Optional[str] = None) -> Optional[PlayerData]:
+    """Saved state of one player, or None if unknown or the world isn't readable."""
+    reader = get_player_data_reader(server)
+    if reader is None:
+        return None
+    return await asyncio.to_thread(lambda: reader.read(reader.uuid_for(name)))
+
+
+async def scan_player_data(
+    names: Iterable[str], server: Optional[str] = None
+) -> Dict[str, PlayerData]:
+    """Saved state of many players of a server at once, by name (those with a file)."""
+    reader = get_player_data_reader(server)
+    if reader is None:
+        return {}
+
+    def scan() -> Dict[str, PlayerData]:
+        by_uuid = reader.scan()
+        found = {}
+        for name in names:
+            data = by_uuid.get(reader.uuid_for(name))
+            if data is not None:
+                found[name] = data
+        return found
+
+    return await asyncio.to_thread(scan)
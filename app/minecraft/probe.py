@@ -0,0 +1,250 @@
+"""Unauthenticated status probes: Server List Ping (TCP) and Query (UDP).
+
+Both are what the multiplayer screen and server lists use, so they are
+cheap for the server and need no RCON password. Server List Ping is always
+available but only returns a sample of up to 12 player names; Query lists
+everyone but has to be turned on with `enable-query=true` in
+server.properties.
+
+https://minecraft.wiki/w/Java_Edition_protocol/Server_List_Ping
+https://minecraft.wiki/w/Query
+"""
+
+import asyncio
+import json
+import random
+import re
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Protocol version sent in the handshake; -1 asks for the server's own
+_HANDSHAKE_PROTOCOL = -1
+_MAX_STATUS_LENGTH = 1 << 21
+
+_QUERY_MAGIC = b"\xfe\xfd"
+_QUERY_HANDSHAKE = 9
+_QUERY_STAT = 0
+# Fixed padding around the full-stat sections
+_QUERY_KV_HEADER = b"splitnum\x00\x80\x00"
+_QUERY_PLAYERS_HEADER = b"\x01player_\x00\x00"
+
+_FORMATTING_CODES = re.compile("§.")
+
+
+class ProbeError(Exception):
+    """Raised when a server does not answer a status probe, or answers garbage."""
+
+
+@dataclass
+class ServerStatus:
+    players_online: int
+    max_players: int
+    motd: str
+    version: str
+    latency_ms: float
+    protocol: str  # "ping" or "query"
+    # Everyone online for Query; at most a sample (possibly anonymized) for ping
+    player_names: List[str] = field(default_factory=list)
+
+    @property
+    def complete_player_list(self) -> bool:
+        return len(self.player_names) == self.players_online
+
+
+def _plain_text(component) -> str:
+    """Flatten a chat component (or legacy string) to text without formatting."""
+    if isinstance(component, str):
+        text = component
+    elif isinstance(component, list):
+        text = "".join(_plain_text(part) for part in component)
+    elif isinstance(component, dict):
+        text = _plain_text(component.get("text", "")) + "".join(
+            _plain_text(part) for part in component.get("extra", [])
+        )
+    else:
+        text = ""
+    return _FORMATTING_CODES.sub("", text)
+
+
+# --- Server List Ping ---
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    value &= 0xFFFFFFFF
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ProbeError("VarInt too long")
+
+
+def _packet(packet_id: int, payload: bytes = b"") -> bytes:
+    body = _varint(packet_id) + payload
+    return _varint(len(body)) + body
+
+
+async def _read_packet(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    length = await _read_varint(reader)
+    if not 0 < length <= _MAX_STATUS_LENGTH:
+        raise ProbeError(f"Bad packet length {length}")
+    data = await reader.readexactly(length)
+    return data[0], data[1:]
+
+
+async def _ping(host: str, port: int) -> Tuple[dict, float]:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        address = host.encode("utf-8")
+        handshake = (
+            _varint(_HANDSHAKE_PROTOCOL)
+            + _varint(len(address))
+            + address
+            + struct.pack(">H", port)
+            + _varint(1)  # next state: status
+        )
+        writer.write(_packet(0x00, handshake) + _packet(0x00))
+        await writer.drain()
+
+        packet_id, payload = await _read_packet(reader)
+        if packet_id != 0x00:
+            raise ProbeError(f"Unexpected status packet {packet_id:#x}")
+        # The JSON string is prefixed by its VarInt length
+        json_start = 1
+        while payload[json_start - 1] & 0x80:
+            json_start += 1
+        status = json.loads(payload[json_start:].decode("utf-8"))
+
+        token = random.getrandbits(63)
+        started = time.perf_counter()
+        writer.write(_packet(0x01, struct.pack(">q", token)))
+        await writer.drain()
+        packet_id, payload = await _read_packet(reader)
+        latency = time.perf_counter() - started
+        if packet_id != 0x01 or payload != struct.pack(">q", token):
+            raise ProbeError("Bad pong")
+        return status, latency
+    finally:
+        writer.close()
+
+
+async def ping_server(host: str, port: int, timeout: float = 5.0) -> ServerStatus:
+    """Ask a server for its status over Server List Ping.
+
+    Latency is the ping/pong round trip on the open connection, like the
+    multiplayer screen shows. Raises ProbeError if the server can't be reached.
+    """
+    try:
+        status, latency = await asyncio.wait_for(_ping(host, port), timeout)
+        players = status.get("players", {})
+        return ServerStatus(
+            players_online=int(players.get("online", 0)),
+            max_players=int(players.get("max", 0)),
+            motd=_plain_text(status.get("description", "")),
+            version=str(status.get("version", {}).get("name", "")),
+            latency_ms=latency * 1000,
+            protocol="ping",
+            player_names=[p["name"] for p in players.get("sample") or [] if "name" in p],
+        )
+    except ProbeError:
+        raise
+    except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError) as e:
+        raise ProbeError(f"Server List Ping to {host}:{port} failed: {str(e) or type(e).__name__}") from e
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ProbeError(f"Bad Server List Ping reply from {host}:{port}: {e}") from e
+
+
+# --- Query ---
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.replies: asyncio.Queue = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.replies.put_nowait(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self.replies.put_nowait(exc)
+
+
+async def _query_request(transport, protocol: _QueryProtocol, packet_type: int, session: int, payload: bytes = b""):
+    transport.sendto(_QUERY_MAGIC + struct.pack(">Bi", packet_type, session) + payload)
+    while True:
+        reply = await protocol.replies.get()
+        if isinstance(reply, Exception):
+            raise reply
+        if len(reply) >= 5 and struct.unpack(">Bi", reply[:5]) == (packet_type, session):
+            return reply[5:]
+
+
+def _parse_full_stat(data: bytes) -> Tuple[dict, List[str]]:
+    if not data.startswith(_QUERY_KV_HEADER):
+        raise ProbeError("Bad Query reply")
+    section, _, players = data[len(_QUERY_KV_HEADER):].partition(_QUERY_PLAYERS_HEADER)
+    fields = section.split(b"\x00")
+    values = {}
+    for key, value in zip(fields[0::2], fields[1::2]):
+        if not key:
+            break
+        values[key.decode("latin-1")] = value.decode("utf-8", errors="replace")
+    names = [name.decode("utf-8", errors="replace") for name in players.split(b"\x00") if name]
+    return values, names
+
+
+async def _query(host: str, port: int) -> Tuple[dict, List[str], float]:
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _QueryProtocol, remote_addr=(host, port)
+    )
+    try:
+        session = random.getrandbits(32) & 0x0F0F0F0F
+        started = time.perf_counter()
+        reply = await _query_request(transport, protocol, _QUERY_HANDSHAKE, session)
+        latency = time.perf_counter() - started
+        challenge = int(reply.rstrip(b"\x00"))
+        reply = await _query_request(
+            transport, protocol, _QUERY_STAT, session, struct.pack(">i", challenge) + b"\x00" * 4
+        )
+        values, names = _parse_full_stat(reply)
+        return values, names, latency
+    finally:
+        transport.close()
+
+
+async def query_server(host: str, port: int, timeout: float = 5.0) -> ServerStatus:
+    """Ask a server for its full status over the Query protocol.
+
+    Latency is the handshake round trip. Raises ProbeError if the server
+    can't be reached or Query is disabled (it then simply never answers).
+    """
+    try:
+        values, names, latency = await asyncio.wait_for(_query(host, port), timeout)
+        return ServerStatus(
+            players_online=int(values.get("numplayers", len(names))),
+            max_players=int(values.get("maxplayers", 0)),
+            motd=_plain_text(values.get("hostname", "")),
+            version=values.get("version", ""),
+            latency_ms=latency * 1000,
+            protocol="query",
+            player_names=names,
+        )
+    except ProbeError:
+        raise
+    except (asyncio.TimeoutError, OSError) as e:
+        raise ProbeError(f"Query to {host}:{port} failed: {str(e) or type(e).__name__}") from e
+    except ValueError as e:
+        raise ProbeError(f"Bad Query reply from {host}:{port}: {e}") from e
@@ -1,22 +1,386 @@
-from mcrcon import MCRcon
+import asyncio
+import itertools
+import logging
+import struct
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
-from app.settings import RCON_HOST, RCON_PASSWORD, RCON_PORT
+from app.metrics import (
+    RCON_COMMAND_DURATION,
+    RCON_CONNECTIONS,
+    RCON_FAILURES,
+    rcon_verb,
+    record_rcon_command,
+)
+from app.settings import (
+    RCON_HOST,
+    RCON_KEEPALIVE_SECONDS,
+    RCON_PASSWORD,
+    RCON_POOL_SIZE,
+    RCON_PORT,
+    RCON_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Packet types (https://minecraft.wiki/w/RCON)
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+# Any unknown type is answered with "Unknown request <hex>" under the same id.
+# The server handles a connection's packets in order, so this reply marks the
+# end of a (possibly multi-packet) response to the command sent before it.
+SERVERDATA_SENTINEL = 100
+
+_HEADER = struct.Struct("<iii")
+_MAX_PAYLOAD = 1446
+
+
+class RconError(Exception):
+    """Raised when an RCON command can not be delivered or answered."""
+
+
+class RconAuthError(RconError):
+    """Raised when the server rejects the RCON password."""
+
+
+class RconNotSentError(RconError):
+    """Raised when a command was never written because its connection had closed."""
+
+
+def _encode_packet(request_id: int, packet_type: int, payload: str) -> bytes:
+    body = payload.encode("utf-8")
+    if len(body) > _MAX_PAYLOAD:
+        raise RconError(f"Command too long ({len(body)} > {_MAX_PAYLOAD} bytes)")
+    length = _HEADER.size - 4 + len(body) + 2
+    return _HEADER.pack(length, request_id, packet_type) + body + b"\x00\x00"
+
+
+class RconConnection:
+    """A single authenticated RCON connection that supports pipelining.
+
+    Every command gets its own request id and is followed by a sentinel packet,
+    so several commands can be in flight at once and each caller gets exactly
+    the fragments that belong to its command.
+    """
+
+    def __init__(self, host: str, port: int, password: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Tuple[asyncio.Future, List[str]]] = {}
+        self._sentinels: Dict[int, int] = {}
+        self._closed = True
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        try:
+            await asyncio.wait_for(self._authenticate(), self.timeout)
+        except BaseException:
+            self._writer.close()
+            raise
+        self._closed = False
+        RCON_CONNECTIONS.inc()
+        self._reader_task = asyncio.create_task(self._read_loop())
+        logger.debug("RCON connected to %s:%s", self.host, self.port)
+
+    async def _authenticate(self) -> None:
+        request_id = self._next_id()
+        self._writer.write(_encode_packet(request_id, SERVERDATA_AUTH, self.password))
+        await self._writer.drain()
+        response_id, _, _ = await self._read_packet()
+        if response_id == -1:
+            raise RconAuthError("RCON authentication failed")
+        if response_id != request_id:
+            raise RconError(f"Unexpected auth response id {response_id}")
+
+    async def _read_packet(self) -> Tuple[int, int, str]:
+        (length,) = struct.unpack("<i", await self._reader.readexactly(4))
+        data = await self._reader.readexactly(length)
+        request_id, packet_type = struct.unpack("<ii", data[:8])
+        payload = data[8:-2].decode("utf-8", errors="replace")
+        return request_id, packet_type, payload
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                request_id, _, payload = await self._read_packet()
+                if request_id in self._sentinels:
+                    command_id = self._sentinels.pop(request_id)
+                    future, fragments = self._pending.pop(command_id, (None, None))
+                    if future is not None and not future.done():
+                        future.set_result("".join(fragments))
+                elif request_id in self._pending:
+                    self._pending[request_id][1].append(payload)
+                else:
+                    logger.debug("Dropping RCON packet with unknown id %s", request_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(RconError(f"RCON connection lost: {e}"))
+
+    def _next_id(self) -> int:
+        # Request ids are signed 32-bit; -1 is reserved for auth failures.
+        return next(self._ids) % 0x7FFFFFFF
+
+    def _fail(self, error: Exception) -> None:
+        self._closed = True
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._sentinels.clear()
+        if self._writer is not None:
+            self._writer.close()
+
+    async def command(self, command: Optional[str]) -> str:
+        """Run a command and wait for its reply.
+
+        Passing ``None`` sends only the sentinel, which is a cheap no-op.
+        """
+        if self._closed:
+            raise RconNotSentError("RCON connection is closed")
+
+        sentinel_id = self._next_id()
+        command_id = sentinel_id if command is None else self._next_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = (future, [])
+        self._sentinels[sentinel_id] = command_id
+
+        packets = _encode_packet(sentinel_id, SERVERDATA_SENTINEL, "")
+        if command is not None:
+            packets = (
+                _encode_packet(command_id, SERVERDATA_EXECCOMMAND, command) + packets
+            )
+
+        try:
+            self._writer.write(packets)
+            await self._writer.drain()
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            # A reply that never arrives means the stream can no longer be trusted.
+            self._fail(RconError(f"RCON command timed out: {command}"))
+            raise RconError(f"RCON command timed out: {command}")
+        except (ConnectionError, OSError) as e:
+            self._fail(RconError(f"RCON connection lost: {e}"))
+            raise RconError(f"RCON connection lost: {e}") from e
+        finally:
+            self._pending.pop(command_id, None)
+            self._sentinels.pop(sentinel_id, None)
+
+    async def ping(self) -> None:
+        """Send a no-op sentinel so idle connections are kept open."""
+        await self.command(None)
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._fail(RconError("RCON connection closed"))
+        if self._writer is not None:
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+
+
+class RconPool:
+    """A small pool of authenticated RCON connections shared by all callers.
+
+    Connections are opened lazily, reused across commands, pinged while idle
+    and replaced transparently when they drop.
+    """
+
+    def __init__(
+        self,
+        host: str = RCON_HOST,
+        port: int = RCON_PORT,
+        password: str = RCON_PASSWORD,
+        size: int = RCON_POOL_SIZE,
+        timeout: float = RCON_TIMEOUT,
+        keepalive: float = RCON_KEEPALIVE_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.keepalive = keepalive
+
+        self._connections: List[RconConnection] = []
+        self._lock = asyncio.Lock()
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    async def _acquire(self) -> RconConnection:
+        async with self._lock:
+            self._connections = [c for c in self._connections if not c.closed]
+            idle = [c for c in self._connections if c.in_flight == 0]
+            if idle:
+                return idle[0]
+            if len(self._connections) < self.size:
+                connection = RconConnection(
+                    self.host, self.port, self.password, self.timeout
+                )
+                await connection.connect()
+                self._connections.append(connection)
+                self._ensure_keepalive()
+                return connection
+            # Every connection is busy: pipeline onto the least loaded one.
+            return min(self._connections, key=lambda c: c.in_flight)
+
+    async def command(self, command: str) -> str:
+        """Run a command and return its full response text.
+
+        A command is retried once on a fresh connection only when it never
+        reached the server: no connection could be opened, or the one it got
+        had already dropped. Once written it is never resent, since the server
+        may have run it even if the reply was lost or late.
+        """
+        logger.debug("Sending RCON command: %s", command)
+        started = time.perf_counter()
+        for attempt in range(2):
+            connection = None
+            try:
+                connection = await self._acquire()
+                response = await connection.command(command)
+                elapsed = time.perf_counter() - started
+                RCON_COMMAND_DURATION.observe(elapsed, verb=rcon_verb(command))
+                record_rcon_command(elapsed)
+                return response
+            except RconAuthError:
+                RCON_FAILURES.inc(reason="auth")
+                raise
+            except (RconError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+                unsent = connection is None or isinstance(e, RconNotSentError)
+                if attempt or not unsent:
+                    RCON_FAILURES.inc(reason="failed")
+                    raise RconError(str(e) or type(e).__name__) from e
+                RCON_FAILURES.inc(reason="retried")
+                logger.debug("RCON command %r not sent (%s), reconnecting", command, e)
+
+    async def commands(self, commands: List[str]) -> List[str]:
+        """Run several commands concurrently, preserving their order."""
+        return list(await asyncio.gather(*(self.command(c) for c in commands)))
+
+    async def pipeline(self, commands: List[str]) -> List[Union[str, RconError]]:
+        """Send a batch of commands back to back over a single connection.
+
+        Results are in command order. A command that fails yields its
+        RconError instead of a reply, so one bad entry does not abort the
+        batch. Commands not yet written when the connection dropped are sent
+        once more on a fresh one; those already written are not, as the
+        server may have run them.
+        """
+        results: List[Union[str, RconError]] = [RconError("not sent")] * len(commands)
+        pending = list(range(len(commands)))
+        for attempt in range(2):
+            started = time.perf_counter()
+            try:
+                connection = await self._acquire()
+            except RconAuthError:
+                RCON_FAILURES.inc(reason="auth")
+                raise
+            except (RconError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+                RCON_FAILURES.inc(reason="failed")
+                raise RconError(str(e) or type(e).__name__) from e
+
+            replies = await asyncio.gather(
+                *(connection.command(commands[i]) for i in pending),
+                return_exceptions=True,
+            )
+            elapsed = time.perf_counter() - started
+            unsent = []
+            for i, reply in zip(pending, replies):
+                if isinstance(reply, str):
+                    results[i] = reply
+                    RCON_COMMAND_DURATION.observe(elapsed, verb=rcon_verb(commands[i]))
+                    record_rcon_command(elapsed)
+                    continue
+                results[i] = RconError(str(reply) or type(reply).__name__)
+                if isinstance(reply, RconNotSentError) and not attempt:
+                    unsent.append(i)
+                else:
+                    RCON_FAILURES.inc(reason="failed")
+            if not unsent:
+                break
+            RCON_FAILURES.inc(len(unsent), reason="retried")
+            logger.debug("RCON connection dropped mid-batch, sending %d unsent commands again", len(unsent))
+            pending = unsent
+        return results
+
+    def _ensure_keepalive(self) -> None:
+        if self.keepalive and (
+            self._keepalive_task is None or self._keepalive_task.done()
+        ):
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    async def _keepalive_loop(self) -> None:
+        while self._connections:
+            await asyncio.sleep(self.keepalive)
+            for connection in list(self._connections):
+                if connection.closed or connection.in_flight:
+                    continue
+                try:
+                    await connection.ping()
+                except RconError as e:
+                    logger.debug("RCON keepalive failed: %s", e)
+            self._connections = [c for c in self._connections if not c.closed]
+
+    async def close(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            await connection.close()
+
+
+_pools: Dict[Tuple[str, int, str], RconPool] = {}
+
+
+def get_rcon_pool(
+    host: str = None, port: int = None, password: str = None
+) -> RconPool:
+    """Return the shared pool for a server, creating it on first use."""
+    key = (host or RCON_HOST, port or RCON_PORT, password or RCON_PASSWORD)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = RconPool(host=key[0], port=key[1], password=key[2])
+    return pool
+
+
+async def close_rcon_pools() -> None:
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
 
 
 class RconClient:
     def __init__(self, host: str = None, password: str = None, port: int = None):
-        self.rcon = MCRcon(host or RCON_HOST, password or RCON_PASSWORD, port or RCON_PORT)        
+        self.pool = get_rcon_pool(host, port, password)
 
-    def send(self, command: str):
+    async def send(self, command: str):
         """Send a command to the RCON server."""
-        response = None
-        
         try:
-            self.rcon.connect()
-            response = self.rcon.command(command)
+            return await self.pool.command(command)
         except Exception as e:
             return f"Error: {e}"
-        finally:
-            self.rcon.disconnect()
-
-        return response
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from app.metrics import POLL_DURATION, POLL_RUNS
+from app.minecraft.cache import poll_all_servers
+from app.settings import (
+    POLL_ACTIVE_INTERVAL_SECONDS,
+    POLL_IDLE_INTERVAL_SECONDS,
+    POLL_JITTER_FRACTION,
+    POLL_OFFLINE_MAX_INTERVAL_SECONDS,
+    TIMEZONE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PollScheduler:
+    """Fixed-rate scheduler for the status poller.
+
+    Runs are scheduled relative to the previous scheduled start, so the
+    period does not drift by the poll duration. The interval adapts to the
+    last result: short while players are online, the idle interval while the
+    server is empty, and exponential backoff while it is unreachable. With
+    several servers, one run polls all of them and counts as online when any
+    of them is.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[], Awaitable[dict]],
+        active_interval: float = POLL_ACTIVE_INTERVAL_SECONDS,
+        idle_interval: float = POLL_IDLE_INTERVAL_SECONDS,
+        offline_max_interval: float = POLL_OFFLINE_MAX_INTERVAL_SECONDS,
+        jitter: float = POLL_JITTER_FRACTION,
+    ):
+        self.poll = poll
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.offline_max_interval = offline_max_interval
+        self.jitter = jitter
+
+        self.interval = idle_interval
+        self.runs = 0
+        self.overruns = 0
+        self.consecutive_failures = 0
+        self.last_started: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.last_server_statuses: dict = {}
+        self.next_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _next_interval(self, status: dict) -> float:
+        if status.get("status") != "Online":
+            self.consecutive_failures += 1
+            return min(
+                self.idle_interval * 2 ** (self.consecutive_failures - 1),
+                self.offline_max_interval,
+            )
+        self.consecutive_failures = 0
+        if status.get("players_online"):
+            return self.active_interval
+        return self.idle_interval
+
+    async def _run_once(self) -> dict:
+        self.last_started = datetime.now(ZoneInfo(TIMEZONE))
+        started = time.monotonic()
+        try:
+            status = await self.poll() or {}
+        except Exception:
+            logger.exception("Status poll failed")
+            status = {"status": "Error"}
+        self.last_duration = time.monotonic() - started
+        self.last_status = status.get("status")
+        self.last_server_statuses = status.get("servers", {})
+        self.runs += 1
+        POLL_DURATION.observe(self.last_duration)
+        POLL_RUNS.inc(status=self.last_status)
+        return status
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        scheduled = loop.time()
+        while True:
+            status = await self._run_once()
+            self.interval = self._next_interval(status)
+
+            period = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            scheduled += period
+            now = loop.time()
+            if scheduled < now:
+                self.overruns += 1
+                logger.warning(
+                    "Status poll overran its %.1fs period (took %.1fs)",
+                    period,
+                    self.last_duration,
+                )
+                scheduled = now
+
+            self.next_run = datetime.fromtimestamp(
+                time.time() + scheduled - now, ZoneInfo(TIMEZONE)
+            )
+            logger.debug(
+                "Next status poll in %.1fs (%s)", scheduled - now, self.last_status
+            )
+            await asyncio.sleep(scheduled - now)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            logger.info("Starting status poll scheduler.")
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "next_run": self.next_run,
+            "last_started": self.last_started,
+            "last_duration_seconds": self.last_duration,
+            "last_status": self.last_status,
+            "servers": self.last_server_statuses,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+poll_scheduler = PollScheduler(poll_all_servers)
@@ -0,0 +1,91 @@
+"""Parsing of the game server's console log (logs/latest.log).
+
+Only the lines the dashboard cares about become events: players joining,
+leaving, dying and chatting. Vanilla, Paper/Spigot and Forge line prefixes
+are recognized. This module has no app dependencies, so it can also be used
+from worker processes.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Iterable, Iterator, Optional, Tuple
+
+# [12:34:56] [Server thread/INFO]: ...                       (vanilla)
+# [12:34:56 INFO]: ...                                       (Paper, Spigot)
+# [18Oct2026 12:34:56.789] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: ...  (Forge)
+_LINE = re.compile(
+    r"^\[(?:\d{2}[A-Za-z]{3}\d{4} )?(?P<clock>\d{2}:\d{2}:\d{2})(?:\.\d+)?(?: INFO)?\]"
+    r"(?: \[Server thread/INFO\])?(?: \[[^\]]*/\])?: (?P<message>.*)$"
+)
+_NAME = r"(?P<player>[A-Za-z0-9_]{1,16})"
+_JOIN = re.compile(rf"^{_NAME}(?: \(formerly known as [A-Za-z0-9_]+\))? joined the game$")
+_LEAVE = re.compile(rf"^{_NAME} left the game$")
+_CHAT = re.compile(rf"^(?:\[Not Secure\] )?<{_NAME}> (?P<text>.*)$")
+# First words of the vanilla death messages (https://minecraft.wiki/w/Death_messages)
+_DEATH = re.compile(
+    rf"^{_NAME} (?P<text>(?:was|were|drowned|died|blew up|burned|fell|froze|hit the ground"
+    r"|starved|suffocated|tried to swim|walked into|went up|went off|withered|experienced"
+    r"|discovered|left the confines|didn't want|got finished)\b.*)$"
+)
+
+JOIN = "join"
+LEAVE = "leave"
+DEATH = "death"
+CHAT = "chat"
+
+
+@dataclass(frozen=True)
+class LogEvent:
+    kind: str  # JOIN, LEAVE, DEATH or CHAT
+    player: str
+    clock: time  # wall-clock time of the line; the log doesn't record the date
+    text: str = ""  # chat message or death message
+
+
+def split_line(line: str) -> Optional[Tuple[time, str]]:
+    """Clock time and message of a server thread log line, or None for any other line."""
+    match = _LINE.match(line.rstrip("\r\n"))
+    if match is None:
+        return None
+    return time.fromisoformat(match["clock"]), match["message"]
+
+
+def parse_message(clock: time, message: str) -> Optional[LogEvent]:
+    """The event a log message records, or None."""
+    # Chat first: a message can contain anything, including "joined the game"
+    if message.startswith(("<", "[Not Secure] <")):
+        chat = _CHAT.match(message)
+        return LogEvent(CHAT, chat["player"], clock, chat["text"]) if chat else None
+    for kind, pattern in ((JOIN, _JOIN), (LEAVE, _LEAVE)):
+        found = pattern.match(message)
+        if found:
+            return LogEvent(kind, found["player"], clock)
+    death = _DEATH.match(message)
+    if death:
+        return LogEvent(DEATH, death["player"], clock, message)
+    return None
+
+
+def parse_line(line: str) -> Optional[LogEvent]:
+    """The event a log line records, or None for any other line."""
+    split = split_line(line)
+    return parse_message(*split) if split else None
+
+
+def parse_lines(lines: Iterable[str]) -> Iterator[LogEvent]:
+    for line in lines:
+        event = parse_line(line)
+        if event is not None:
+            yield event
+
+
+def recent_event_time(clock: time, now: datetime) -> datetime:
+    """Date a clock time from a live log: today, unless that is still ahead of now.
+
+    A line from just before midnight read just after it belongs to yesterday.
+    """
+    moment = datetime.combine(now.date(), clock, now.tzinfo)
+    if moment > now + timedelta(minutes=5):
+        moment -= timedelta(days=1)
+    return moment
@@ -0,0 +1,69 @@
+"""Registry of the Minecraft servers shown on the dashboard.
+
+Built once from settings.MINECRAFT_SERVERS; see there for the format.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app import settings
+
+DEFAULT_KEY = "default"
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    key: str
+    name: str
+    ip: str
+    port: int
+    version: str
+    motd: str
+    max_players: int
+    rcon_host: str
+    rcon_port: int
+    rcon_password: str
+    query_port: Optional[int]
+    log_path: Optional[str]
+    world_path: Optional[str]
+
+
+def _load() -> Dict[str, ServerConfig]:
+    entries = settings.MINECRAFT_SERVERS or {DEFAULT_KEY: {}}
+    defaults = {
+        "name": settings.SERVER_NAME,
+        "ip": settings.SERVER_IP,
+        "port": settings.SERVER_PORT,
+        "version": settings.SERVER_VERSION,
+        "motd": settings.SERVER_MOTD,
+        "max_players": settings.SERVER_MAX_PLAYERS,
+        "rcon_host": settings.RCON_HOST,
+        "rcon_port": settings.RCON_PORT,
+        "rcon_password": settings.RCON_PASSWORD,
+        "query_port": settings.SERVER_QUERY_PORT,
+        "log_path": settings.SERVER_LOG_PATH,
+        "world_path": settings.SERVER_WORLD_PATH,
+    }
+    servers = {}
+    for key, entry in entries.items():
+        unknown = set(entry) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown settings for server {key!r}: {sorted(unknown)}")
+        servers[key] = ServerConfig(key=key, **{**defaults, **entry})
+    return servers
+
+
+SERVERS: Dict[str, ServerConfig] = _load()
+DEFAULT_SERVER: str = next(iter(SERVERS))
+
+
+def get_server(key: Optional[str] = None) -> ServerConfig:
+    """Look up a registered server; None means the default one.
+
+    Raises KeyError for an unknown key.
+    """
+    return SERVERS[key or DEFAULT_SERVER]
+
+
+def all_servers() -> List[ServerConfig]:
+    return list(SERVERS.values())
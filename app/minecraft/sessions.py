@@ -0,0 +1,215 @@
+"""Play sessions, kept up to date by diffing consecutive polls.
+
+A player appearing in a poll opens a session; a poll without them, or the
+server going offline, closes it. The log tailer feeds in joins and leaves
+the same way, as they happen. Every update costs a few statements no
+matter how many players are online.
+
+Sessions are cut into pieces of at most MAX_SESSION_LENGTH, so a session
+overlapping a range must have started at most that long before it: the
+queries below scan that stretch of the `(started_at, ended_at)` index and
+nothing older.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from tortoise.expressions import Q, Subquery
+from tortoise.transactions import in_transaction
+
+from app.models import GamePlayer, PlaySession
+from app.settings import TIMEZONE
+from app.utils import as_utc
+
+logger = logging.getLogger(__name__)
+
+MAX_SESSION_LENGTH = timedelta(days=1)
+# An open session passes MAX_SESSION_LENGTH by up to one poll before it is split
+_LOOKBACK = MAX_SESSION_LENGTH + timedelta(hours=1)
+
+# Open session id per GamePlayer id, per server
+_open_sessions: Dict[str, Dict[int, int]] = {}
+# Polls and the log tailer both update a server's sessions; one at a time
+_session_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+# Closes sessions left over from the previous run; every server's first poll waits for it
+_closing_stale: Optional[asyncio.Task] = None
+
+
+async def _close_stale_sessions() -> None:
+    """Close sessions left open by a previous run.
+
+    Their `ended_at` is the last poll that saw the player, which is as close
+    to the real end as we can know.
+    """
+    closed = await PlaySession.filter(is_open=True).update(is_open=False)
+    if closed:
+        logger.info("Closed %d play sessions left open by the previous run", closed)
+
+
+def split_session(
+    started_at: datetime, ended_at: datetime
+) -> Iterator[Tuple[datetime, datetime]]:
+    """Cut a stretch of being online into sessions of at most MAX_SESSION_LENGTH."""
+    while ended_at - started_at > MAX_SESSION_LENGTH:
+        yield started_at, started_at + MAX_SESSION_LENGTH
+        started_at += MAX_SESSION_LENGTH
+    yield started_at, ended_at
+
+
+async def update_sessions(
+    server: str, players: Dict[str, GamePlayer], timestamp: datetime
+) -> None:
+    """Open, extend and close sessions for one poll's set of online players on a server."""
+    await apply_presence_changes(server, [(timestamp, players)])
+
+
+async def apply_presence_changes(
+    server: str, changes: List[Tuple[datetime, Dict[str, GamePlayer]]]
+) -> None:
+    """Apply successive sets of online players on a server, each at its own time.
+
+    All or nothing: when one fails, no change is stored and the open
+    sessions are left as they were, so the same changes can be applied again.
+    """
+    global _closing_stale
+
+    if _closing_stale is None:
+        _closing_stale = asyncio.create_task(_close_stale_sessions())
+    try:
+        await _closing_stale
+    except Exception:
+        _closing_stale = None  # retried on the next poll
+        raise
+
+    async with _session_locks[server]:
+        open_sessions = dict(_open_sessions.get(server, {}))
+        async with in_transaction():
+            for timestamp, players in changes:
+                open_sessions = await _apply_online(open_sessions, players, timestamp)
+        _open_sessions[server] = open_sessions
+
+
+async def _apply_online(
+    open_sessions: Dict[int, int], players: Dict[str, GamePlayer], timestamp: datetime
+) -> Dict[int, int]:
+    """Store one set of online players; returns the open session id per player id."""
+    if open_sessions:
+        await _split_long_sessions(open_sessions, timestamp)
+    online = {player.id for player in players.values()}
+    left = [sid for pid, sid in open_sessions.items() if pid not in online]
+    joined = [pid for pid in online if pid not in open_sessions]
+
+    if open_sessions:
+        await PlaySession.filter(id__in=list(open_sessions.values())).update(
+            ended_at=timestamp
+        )
+    if left:
+        await PlaySession.filter(id__in=left).update(is_open=False)
+        logger.debug("Closed %d play sessions", len(left))
+    if joined:
+        await PlaySession.bulk_create(
+            [
+                PlaySession(player_id=pid, started_at=timestamp, ended_at=timestamp)
+                for pid in joined
+            ]
+        )
+        logger.debug("Opened %d play sessions", len(joined))
+
+    open_sessions = {pid: sid for pid, sid in open_sessions.items() if pid in online}
+    if joined:
+        # bulk_create does not return primary keys on SQLite
+        for session in await PlaySession.filter(player_id__in=joined, is_open=True):
+            open_sessions[session.player_id] = session.id
+    return open_sessions
+
+
+async def _split_long_sessions(open_sessions: Dict[int, int], timestamp: datetime) -> None:
+    """Close open sessions that reached MAX_SESSION_LENGTH and go on in new ones.
+
+    Updates `open_sessions` to the sessions that are open now.
+    """
+    for session in await PlaySession.filter(
+        id__in=list(open_sessions.values()),
+        started_at__lt=timestamp - MAX_SESSION_LENGTH,
+    ):
+        *done, (started_at, _) = split_session(session.started_at, timestamp)
+        session.ended_at, session.is_open = done[0][1], False
+        await session.save(update_fields=["ended_at", "is_open"])
+        await PlaySession.bulk_create(
+            [
+                PlaySession(player_id=session.player_id, started_at=start, ended_at=end, is_open=False)
+                for start, end in done[1:]
+            ]
+        )
+        current = await PlaySession.create(
+            player_id=session.player_id, started_at=started_at, ended_at=started_at
+        )
+        open_sessions[session.player_id] = current.id
+
+
+def _overlapping(since: datetime, until: datetime):
+    # An open session lasts until now, even if `ended_at` is a poll behind
+    return PlaySession.filter(
+        Q(ended_at__gte=since) | Q(is_open=True),
+        started_at__gte=since - _LOOKBACK,
+        started_at__lte=until,
+    )
+
+
+async def players_between(
+    since: datetime, until: datetime, server: Optional[str] = None
+) -> List[GamePlayer]:
+    """Players who were online at some point in a range, by last seen.
+
+    With a server key, only that server's players.
+    """
+    query = GamePlayer.filter(
+        id__in=Subquery(_overlapping(since, until).values("player_id"))
+    )
+    if server is not None:
+        query = query.filter(server=server)
+    return await query.order_by("last_seen")
+
+
+async def players_online_at(moment: datetime, server: Optional[str] = None) -> List[GamePlayer]:
+    """Players who were online at a given moment."""
+    return await players_between(moment, moment, server)
+
+
+async def playtime_per_day(
+    since: date, until: date, player_id: Optional[int] = None
+) -> Dict[int, Dict[date, timedelta]]:
+    """Total time online per player and day, for days since..until inclusive.
+
+    Days are in the dashboard's time zone; sessions spanning midnight are
+    split between the days.
+    """
+    tz = ZoneInfo(TIMEZONE)
+    start = datetime.combine(since, datetime.min.time(), tz)
+    end = datetime.combine(until + timedelta(days=1), datetime.min.time(), tz)
+
+    query = _overlapping(start, end)
+    if player_id is not None:
+        query = query.filter(player_id=player_id)
+    rows = await query.values_list("player_id", "started_at", "ended_at", "is_open")
+
+    now = datetime.now(tz)
+    totals: Dict[int, Dict[date, timedelta]] = defaultdict(lambda: defaultdict(timedelta))
+    for pid, started_at, ended_at, is_open in rows:
+        current = max(as_utc(started_at).astimezone(tz), start)
+        ended_at = as_utc(ended_at).astimezone(tz)
+        if is_open:
+            ended_at = max(ended_at, now)
+        ended_at = min(ended_at, end)
+        while current < ended_at:
+            midnight = datetime.combine(
+                current.astimezone(tz).date() + timedelta(days=1), datetime.min.time(), tz
+            )
+            chunk_end = min(midnight, ended_at)
+            totals[pid][current.astimezone(tz).date()] += chunk_end - current
+            current = chunk_end
+    return {pid: dict(days) for pid, days in totals.items()}
@@ -0,0 +1,287 @@
+"""Position history: every polled position, stored compactly per player.
+
+Positions are buffered in memory per player and written as PlayerTrailBlock
+rows, one per run of samples in a single dimension. A block is closed when
+the player leaves, changes dimension, pauses longer than
+TRAIL_SESSION_GAP_SECONDS, reaches TRAIL_BLOCK_SAMPLES or has been open for
+TRAIL_FLUSH_SECONDS.
+
+Block format: a zlib-compressed little-endian int32 array of shape (4, n).
+Row 0 holds seconds since `started_at`, rows 1-3 hold x, y and z in
+1/COORD_SCALE blocks. Every row is delta-encoded, so a player walking around
+compresses to a few bytes per sample.
+"""
+
+import asyncio
+import logging
+import math
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models import GamePlayer, PlayerTrailBlock
+from app.settings import (
+    TRAIL_BLOCK_SAMPLES,
+    TRAIL_FLUSH_SECONDS,
+    TRAIL_HEATMAP_MAX_CELLS,
+    TRAIL_SESSION_GAP_SECONDS,
+)
+from app.utils import as_utc
+
+logger = logging.getLogger(__name__)
+
+COORD_SCALE = 10  # positions are kept to 0.1 block
+_DTYPE = np.dtype("<i4")
+
+
+def encode_block(times: Sequence[float], points: Sequence[Sequence[float]]) -> bytes:
+    """Pack samples (epoch seconds, (x, y, z)) into the block format."""
+    columns = np.empty((4, len(times)), dtype=np.int64)
+    columns[0] = np.rint(np.asarray(times, dtype=np.float64) - times[0])
+    columns[1:] = np.rint(np.asarray(points, dtype=np.float64).T * COORD_SCALE)
+    deltas = np.diff(columns, axis=1, prepend=0)
+    return zlib.compress(deltas.astype(_DTYPE).tobytes())
+
+
+def decode_block(data: bytes, started_at: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Unpack a block into epoch times (n,) and positions (n, 3)."""
+    deltas = np.frombuffer(zlib.decompress(data), dtype=_DTYPE).reshape(4, -1)
+    columns = np.cumsum(deltas, axis=1, dtype=np.int64)
+    times = columns[0] + started_at
+    points = columns[1:].T / COORD_SCALE
+    return times, points
+
+
+class _OpenTrail:
+    """Samples of one player not yet written to the database."""
+
+    __slots__ = ("player_id", "dimension", "times", "points")
+
+    def __init__(self, player_id: int, dimension: str):
+        self.player_id = player_id
+        self.dimension = dimension
+        self.times: List[float] = []
+        self.points: List[Tuple[float, float, float]] = []
+
+    def to_block(self) -> PlayerTrailBlock:
+        return PlayerTrailBlock(
+            player_id=self.player_id,
+            dimension=self.dimension,
+            started_at=datetime.fromtimestamp(self.times[0], timezone.utc),
+            ended_at=datetime.fromtimestamp(self.times[-1], timezone.utc),
+            samples=len(self.times),
+            data=encode_block(self.times, self.points),
+        )
+
+
+# Open trail per GamePlayer id, per server
+_open_trails: Dict[str, Dict[int, _OpenTrail]] = {}
+
+
+async def record_positions(
+    server: str,
+    players: Dict[str, GamePlayer],
+    positions: Dict[str, Tuple[float, float, float]],
+    dimensions: Dict[str, str],
+    timestamp: datetime,
+) -> None:
+    """Append one server poll's positions and write out every trail that closed.
+
+    Players of that server missing from `players` have left, so their trails
+    are closed too. All finished blocks are written with a single bulk insert.
+    """
+    now = timestamp.timestamp()
+    finished = []
+    online = set()
+    open_trails = _open_trails.setdefault(server, {})
+
+    for name, player in players.items():
+        online.add(player.id)
+        if name not in positions:
+            continue
+        dimension = dimensions.get(name) or player.last_seen_dimension or "unknown"
+
+        trail = open_trails.get(player.id)
+        if trail is not None and (
+            trail.dimension != dimension
+            or now - trail.times[-1] > TRAIL_SESSION_GAP_SECONDS
+        ):
+            finished.append(open_trails.pop(player.id))
+            trail = None
+        if trail is None:
+            trail = open_trails[player.id] = _OpenTrail(player.id, dimension)
+
+        trail.times.append(now)
+        trail.points.append(positions[name])
+        if (
+            len(trail.times) >= TRAIL_BLOCK_SAMPLES
+            or now - trail.times[0] >= TRAIL_FLUSH_SECONDS
+        ):
+            finished.append(open_trails.pop(player.id))
+
+    for player_id in [p for p in open_trails if p not in online]:
+        finished.append(open_trails.pop(player_id))
+
+    await _write(finished)
+
+
+async def flush_trails() -> None:
+    """Write out every open trail, e.g. on shutdown."""
+    finished = [trail for trails in _open_trails.values() for trail in trails.values()]
+    _open_trails.clear()
+    await _write(finished)
+
+
+async def _write(trails: List[_OpenTrail]) -> None:
+    if not trails:
+        return
+    # A player deleted by an admin while their trail was open would fail the
+    # whole insert on the foreign key; drop their trail instead
+    existing = set(
+        await GamePlayer.filter(id__in={trail.player_id for trail in trails}).values_list(
+            "id", flat=True
+        )
+    )
+    dropped = len(trails)
+    trails = [trail for trail in trails if trail.player_id in existing]
+    dropped -= len(trails)
+    if dropped:
+        logger.info("Dropped %d trail blocks of deleted players", dropped)
+    if trails:
+        await PlayerTrailBlock.bulk_create([trail.to_block() for trail in trails])
+        logger.debug("Wrote %d trail blocks", len(trails))
+
+
+async def load_trail(
+    dimension: str,
+    since: datetime,
+    until: datetime,
+    player_id: Optional[int] = None,
+    server: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return times (n,) and positions (n, 3) in a dimension and time range.
+
+    With a player the samples are in time order; without one they are the
+    samples of every player (of one server, if given), in no particular
+    order. Samples still buffered in memory are included.
+    """
+    query = PlayerTrailBlock.filter(
+        dimension=dimension, ended_at__gte=since, started_at__lte=until
+    )
+    if player_id is not None:
+        query = query.filter(player_id=player_id)
+    if server is not None:
+        query = query.filter(player__server=server)
+    rows = await query.order_by("started_at").values_list("started_at", "data")
+
+    pending = [
+        (trail.times[:], trail.points[:])
+        for key, trails in _open_trails.items()
+        if server is None or key == server
+        for trail in trails.values()
+        if trail.dimension == dimension
+        and (player_id is None or trail.player_id == player_id)
+    ]
+    return await asyncio.to_thread(
+        _decode_range, rows, pending, as_utc(since).timestamp(), as_utc(until).timestamp()
+    )
+
+
+def _decode_range(rows, pending, since: float, until: float):
+    times, points = [np.empty(0)], [np.empty((0, 3))]
+    for started_at, data in rows:
+        block_times, block_points = decode_block(data, as_utc(started_at).timestamp())
+        times.append(block_times)
+        points.append(block_points)
+    for pending_times, pending_points in pending:
+        times.append(np.asarray(pending_times, dtype=np.float64))
+        points.append(np.asarray(pending_points, dtype=np.float64))
+
+    times, points = np.concatenate(times), np.concatenate(points)
+    mask = (times >= since) & (times <= until)
+    return times[mask], points[mask]
+
+
+def heatmap(points: np.ndarray, bin_size: float) -> dict:
+    """Count samples per (x, z) cell.
+
+    The bin size is grown when the area would need more than
+    TRAIL_HEATMAP_MAX_CELLS cells. Only non-empty cells are returned, as
+    [x, z, count] with x and z the cell's lower corner.
+    """
+    if not len(points):
+        return {"bin_size": bin_size, "samples": 0, "cells": []}
+
+    x, z = points[:, 0], points[:, 2]
+    while True:
+        x0 = math.floor(x.min() / bin_size) * bin_size
+        z0 = math.floor(z.min() / bin_size) * bin_size
+        ix = ((x - x0) // bin_size).astype(np.int64)
+        iz = ((z - z0) // bin_size).astype(np.int64)
+        width, height = int(ix.max()) + 1, int(iz.max()) + 1
+        if width * height <= TRAIL_HEATMAP_MAX_CELLS:
+            break
+        bin_size *= math.ceil(math.sqrt(width * height / TRAIL_HEATMAP_MAX_CELLS))
+
+    counts = np.bincount(iz * width + ix, minlength=width * height)
+    cells = np.flatnonzero(counts)
+    return {
+        "bin_size": bin_size,
+        "samples": int(len(points)),
+        "cells": np.column_stack(
+            (x0 + (cells % width) * bin_size, z0 + (cells // width) * bin_size, counts[cells])
+        ).tolist(),
+    }
+
+
+def _simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Ramer-Douglas-Peucker on the (x, z) plane; returns indices to keep."""
+    if len(points) < 3:
+        return np.arange(len(points))
+
+    xz = points[:, (0, 2)]
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = xz[end] - xz[start]
+        offsets = xz[start + 1 : end] - xz[start]
+        length = np.hypot(*segment)
+        if length:
+            distances = (
+                np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0])
+                / length
+            )
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return np.flatnonzero(keep)
+
+
+def simplify_trail(times: np.ndarray, points: np.ndarray, tolerance: float) -> dict:
+    """Split a time-ordered trail at pauses and simplify each segment.
+
+    Each segment is a list of [epoch seconds, x, y, z].
+    """
+    breaks = np.flatnonzero(np.diff(times) > TRAIL_SESSION_GAP_SECONDS) + 1
+    segments = []
+    for segment_times, segment_points in zip(
+        np.split(times, breaks), np.split(points, breaks)
+    ):
+        if not len(segment_times):
+            continue
+        kept = _simplify(segment_points, tolerance)
+        segments.append(
+            np.column_stack((segment_times[kept], segment_points[kept])).tolist()
+        )
+    return {"samples": int(len(times)), "segments": segments}
@@ -1,18 +1,32 @@
+import asyncio
 import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Form, Request
-from fastapi.responses import JSONResponse
+import anyio
+from fastapi import APIRouter, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from app.minecraft.broadcast import get_status_broadcaster
+from app.minecraft.dispatch import Priority
 from app.minecraft.mc_utils import get_coordinates, set_home_from_current_position, teleport_home, teleport_to_coords
-from app.models import GamePlayer
+from app.minecraft.servers import SERVERS, get_server
+from app.minecraft.trails import heatmap, load_trail, simplify_trail
+from app.models import GamePlayer, User
+from app.settings import TIMEZONE
 from app.user.auth import admin_required, login_required
+from app.user.cache import user_cache
 from app.utils import render_template
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
+SSE_KEEPALIVE_SECONDS = 15
+TRAIL_DEFAULT_RANGE = timedelta(days=1)
+
 
 @router.get("/teleport", name="minecraft_teleport_form")
 @login_required
@@ -48,7 +62,8 @@ async def set_player_home(request: Request):
         return JSONResponse({"success": False, "message": f'Greška! Nema povezanog igrača za korisnika "{user.username}"!'})
 
     try:
-        result = await set_home_from_current_position(game_player.name)
+        result = await set_home_from_current_position(game_player.name, game_player.server)
+        user_cache.invalidate_game_player(game_player.id)
         response = {"success": True, "message": result}
     except Exception as e:
         response = {"success": False, "message": str(e)}
@@ -59,15 +74,15 @@ async def set_player_home(request: Request):
 @login_required
 async def teleport_player_home(request: Request):
     user = request.state.user
-    logger.debug(f"Teleporting {user.username} to home")
+    logger.debug("Teleporting %s to home", user.username)
     # Check if the user has a linked GamePlayer
     game_player = await GamePlayer.get_or_none(linked_users__id=user.id)
     if not game_player:
         return JSONResponse({"success": False, "message": f'Greška! Nema povezanog igrača za korisnika "{user.username}"!'})
     
     try:
-        result = await teleport_home(game_player.name)
-        logger.debug(f"Teleport result: \"{result}\"")
+        result = await teleport_home(game_player.name, game_player.server)
+        logger.debug('Teleport result: "%s"', result)
         if "No entity was found" in result:
             return JSONResponse({"success": False, "message": f'Greška! Da li je "{game_player.name}" online?'})
         response = {"success": True, "message": result}
@@ -100,7 +115,7 @@ async def admin_teleport_player(
     y: float = Form(...),
     z: float = Form(...),
 ):
-    result = await teleport_to_coords(playername, x, y, z)
+    result = await teleport_to_coords(playername, x, y, z, priority=Priority.ADMIN)
     return render_template("minecraft/teleport.html", request, {"message": result})
 
 
@@ -112,3 +127,118 @@ async def gameplayer_detail(request: Request, player_id: int):
         pass  # redirect to your own profile
         # return RedirectResponse(request.url_for("admin_gameplayer_list"), status_code=302)
     return render_template("admin/gameplayer_detail.html", request, {"player": player})
+
+
+def _trail_range(since: Optional[datetime], until: Optional[datetime]):
+    tz = ZoneInfo(TIMEZONE)
+    until = until or datetime.now(tz)
+    since = since or until - TRAIL_DEFAULT_RANGE
+    # Query parameters without an offset are in the dashboard's time zone
+    return tuple(v if v.tzinfo else v.replace(tzinfo=tz) for v in (since, until))
+
+
+@router.get("/trail/{player_id}", name="minecraft_player_trail")
+@login_required
+async def player_trail(
+    request: Request,
+    player_id: int,
+    dimension: str = "minecraft:overworld",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    mode: str = "trail",
+    bin_size: float = 16.0,
+    tolerance: float = 2.0,
+):
+    """A player's simplified movement trail, or a heatmap with mode=heatmap."""
+    if not await GamePlayer.exists(id=player_id):
+        return JSONResponse({"error": "Nepoznat igrač"}, status_code=404)
+
+    since, until = _trail_range(since, until)
+    times, points = await load_trail(dimension, since, until, player_id=player_id)
+    if mode == "heatmap":
+        result = await asyncio.to_thread(heatmap, points, max(bin_size, 1.0))
+    else:
+        result = await asyncio.to_thread(simplify_trail, times, points, max(tolerance, 0.0))
+    return JSONResponse({"player_id": player_id, "dimension": dimension, **result})
+
+
+@router.get("/heatmap", name="minecraft_heatmap")
+@login_required
+async def server_heatmap(
+    request: Request,
+    dimension: str = "minecraft:overworld",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bin_size: float = 16.0,
+    server: Optional[str] = None,
+):
+    """Where all players of a server spent their time, binned on the (x, z) plane."""
+    if server is not None and server not in SERVERS:
+        return JSONResponse({"error": "Nepoznat server"}, status_code=404)
+    since, until = _trail_range(since, until)
+    server = get_server(server).key
+    _, points = await load_trail(dimension, since, until, server=server)
+    result = await asyncio.to_thread(heatmap, points, max(bin_size, 1.0))
+    return JSONResponse({"server": server, "dimension": dimension, **result})
+
+
+@router.get("/status/stream", name="minecraft_status_stream")
+@login_required
+async def status_stream(request: Request, server: Optional[str] = None):
+    """Server-Sent Events stream of one server's live status and join/leave deltas."""
+    if server is not None and server not in SERVERS:
+        return JSONResponse({"error": "Nepoznat server"}, status_code=404)
+    broadcaster = get_status_broadcaster(get_server(server).key)
+
+    async def events():
+        async with broadcaster.subscribe() as queue:
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(
+                        queue.get(), timeout=SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: status\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/status/ws", name="minecraft_status_ws")
+async def status_websocket(websocket: WebSocket):
+    """WebSocket variant of the status stream, for logged-in users."""
+    user_id = websocket.session.get("user_id")
+    user = await User.get_or_none(id=user_id) if user_id else None
+    server = websocket.query_params.get("server")
+    if not user or not user.is_approved or (server is not None and server not in SERVERS):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    broadcaster = get_status_broadcaster(get_server(server).key)
+
+    async def send() -> None:
+        try:
+            async with broadcaster.subscribe() as queue:
+                while True:
+                    await websocket.send_text(await queue.get())
+        except WebSocketDisconnect:
+            tasks.cancel_scope.cancel()
+
+    async def receive() -> None:
+        # Clients send nothing, but reading notices a disconnect right away
+        # instead of at the next status change
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        tasks.cancel_scope.cancel()
+
+    # Starlette runs on anyio, whose task group cancels the other side
+    # cleanly when either one ends
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(send)
+        tasks.start_soon(receive)
@@ -1,9 +1,11 @@
 import logging
+from datetime import timedelta
 from zoneinfo import ZoneInfo
 
-from passlib.hash import bcrypt
 from tortoise import fields, models
 
+from app.passwords import hash_password, verify_password
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,18 +19,26 @@ class User(models.Model):
     is_approved = fields.BooleanField(default=False)
     created_at = fields.DatetimeField(auto_now_add=True)
 
+    # In-game name given at registration, used to auto-link the GamePlayer
+    game_name = fields.CharField(max_length=32, null=True)
+
     # Optional link to one in-game character
     game_player: fields.ForeignKeyNullableRelation["GamePlayer"] = (
         fields.ForeignKeyField(
-            "models.GamePlayer", null=True, related_name="linked_users"
+            "models.GamePlayer", null=True, related_name="linked_users", db_index=True
         )
     )
 
-    def verify_password(self, raw_password: str) -> bool:
-        return bcrypt.verify(raw_password, self.password_hash)
+    async def verify_password(self, raw_password: str) -> bool:
+        matches, new_hash = await verify_password(raw_password, self.password_hash)
+        if new_hash:
+            logger.info("Upgrading password hash for %s", self.username)
+            self.password_hash = new_hash
+            await self.save(update_fields=["password_hash"])
+        return matches
 
     async def set_password(self, raw_password: str) -> None:
-        self.password_hash = bcrypt.hash(raw_password)
+        self.password_hash = await hash_password(raw_password)
         await self.save()
 
     def __str__(self):
@@ -40,7 +50,9 @@ class User(models.Model):
 
 class GamePlayer(models.Model):
     id = fields.IntField(pk=True)
-    name = fields.CharField(max_length=32, unique=True)
+    # Key of the server in settings.MINECRAFT_SERVERS this character plays on
+    server = fields.CharField(max_length=32, default="default")
+    name = fields.CharField(max_length=32)
 
     # Home coordinates and dimension
     home_x = fields.FloatField(null=True)
@@ -48,13 +60,19 @@ class GamePlayer(models.Model):
     home_z = fields.FloatField(null=True)
     home_dimension = fields.CharField(max_length=64, null=True)
 
+    # First time the poller, log tailer or log backfill saw them online
+    first_seen = fields.DatetimeField(null=True)
+
     # Last seen data
-    last_seen = fields.DatetimeField(null=True)
+    last_seen = fields.DatetimeField(null=True, db_index=True)
     last_seen_x = fields.FloatField(null=True)
     last_seen_y = fields.FloatField(null=True)
     last_seen_z = fields.FloatField(null=True)
     last_seen_dimension = fields.CharField(max_length=64, null=True)
 
+    class Meta:
+        unique_together = (("server", "name"),)
+
     @staticmethod
     def _friendly_dimension_name(dim: str) -> str:
         mapping = {
@@ -79,7 +97,7 @@ class GamePlayer(models.Model):
             and self.home_y is not None
             and self.home_z is not None
         )
-        logger.debug(f"Player {self.name} has home: {has_home}")
+        logger.debug("Player %s has home: %s", self.name, has_home)
         return has_home
 
     def home_coords(self):
@@ -113,16 +131,177 @@ class GamePlayer(models.Model):
         return default
 
 
+class PlaySession(models.Model):
+    """One stretch of a player being online, as seen by the poller.
+
+    While the session is open, `ended_at` is moved to every poll that still
+    sees the player, so it is always the last time they were known online.
+    Longer stretches are split into sessions of at most
+    app.minecraft.sessions.MAX_SESSION_LENGTH.
+    """
+
+    id = fields.IntField(pk=True)
+    player: fields.ForeignKeyRelation[GamePlayer] = fields.ForeignKeyField(
+        "models.GamePlayer", related_name="play_sessions"
+    )
+    started_at = fields.DatetimeField()
+    ended_at = fields.DatetimeField()
+    is_open = fields.BooleanField(default=True)
+
+    class Meta:
+        indexes = (("player_id", "started_at"), ("started_at", "ended_at"))
+
+    @property
+    def duration(self) -> timedelta:
+        return self.ended_at - self.started_at
+
+    def __str__(self):
+        return f"Session {self.started_at} - {self.ended_at}{' (online)' if self.is_open else ''}"
+
+    def __repr__(self):
+        return f"<PlaySession: player {self.player_id} {self.started_at}>"
+
+
+class ChatMessage(models.Model):
+    """One chat line from a server log.
+
+    Searchable through the chatmessage_fts table; see app.minecraft.chat.
+    """
+
+    id = fields.IntField(pk=True)
+    player: fields.ForeignKeyRelation[GamePlayer] = fields.ForeignKeyField(
+        "models.GamePlayer", related_name="chat_messages"
+    )
+    sent_at = fields.DatetimeField(db_index=True)
+    text = fields.TextField()
+
+    class Meta:
+        # Also what makes replaying a log's chat a no-op
+        unique_together = (("player", "sent_at", "text"),)
+
+    def __str__(self):
+        return f"[{self.sent_at}] {self.text}"
+
+    def __repr__(self):
+        return f"<ChatMessage: player {self.player_id} {self.sent_at}>"
+
+
+class PlayerTrailBlock(models.Model):
+    """A run of one player's polled positions in one dimension.
+
+    `data` holds the samples delta-encoded and compressed; see
+    app.minecraft.trails for the format.
+    """
+
+    id = fields.IntField(pk=True)
+    player: fields.ForeignKeyRelation[GamePlayer] = fields.ForeignKeyField(
+        "models.GamePlayer", related_name="trail_blocks"
+    )
+    dimension = fields.CharField(max_length=64)
+    started_at = fields.DatetimeField()
+    ended_at = fields.DatetimeField(db_index=True)
+    samples = fields.IntField()
+    data = fields.BinaryField()
+
+    class Meta:
+        indexes = (("player_id", "dimension", "ended_at"),)
+
+    def __str__(self):
+        return f"{self.samples} positions in {self.dimension} ({self.started_at} - {self.ended_at})"
+
+    def __repr__(self):
+        return f"<PlayerTrailBlock: player {self.player_id} {self.started_at} ({self.samples})>"
+
+
+class LogCursor(models.Model):
+    """How far the log tailer has read a server's latest.log.
+
+    The inode tells whether the file is still the one the offset refers to.
+    """
+
+    id = fields.IntField(pk=True)
+    server = fields.CharField(max_length=32, unique=True)
+    inode = fields.BigIntField()
+    offset = fields.BigIntField()
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.server} log at byte {self.offset}"
+
+    def __repr__(self):
+        return f"<LogCursor: {self.server} {self.inode}:{self.offset}>"
+
+
+class ImportedLog(models.Model):
+    """A rotated server log whose play sessions were backfilled."""
+
+    id = fields.IntField(pk=True)
+    server = fields.CharField(max_length=32)
+    name = fields.CharField(max_length=255)
+    sessions = fields.IntField()
+    # Sessions and chat from then on were left to the poller and log tailer
+    cutoff = fields.DatetimeField(null=True)
+    imported_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (("server", "name"),)
+
+    def __str__(self):
+        return f"{self.name} ({self.sessions} sessions)"
+
+    def __repr__(self):
+        return f"<ImportedLog: {self.server} {self.name}>"
+
+
 class ServerSnapshot(models.Model):
     id = fields.IntField(pk=True)
-    timestamp = fields.DatetimeField(auto_now_add=True)
+    server = fields.CharField(max_length=32, default="default")
+    timestamp = fields.DatetimeField(auto_now_add=True, db_index=True)
     status = fields.CharField(max_length=10)
     players_online = fields.IntField()
     max_players = fields.IntField()
     player_names = fields.JSONField(null=True)
 
+    class Meta:
+        indexes = (("server", "timestamp"),)
+
     def __str__(self):
         return f"Snapshot at {self.timestamp} - {self.status} ({self.players_online}/{self.max_players})"
 
     def __repr__(self):
         return f"<ServerSnapshot: {self.timestamp} ({self.players_online}/{self.max_players})>"
+
+
+class ServerStatsRollup(models.Model):
+    """Aggregated server status over one minute, hour or day.
+
+    Each poll's result counts for the time until the next poll, so the
+    averages don't depend on how often the server was polled.
+    """
+
+    id = fields.IntField(pk=True)
+    server = fields.CharField(max_length=32, default="default")
+    resolution = fields.CharField(max_length=8)
+    bucket_start = fields.DatetimeField()
+    seconds = fields.IntField(default=0)
+    online_seconds = fields.IntField(default=0)
+    players_min = fields.IntField(null=True)
+    players_max = fields.IntField(null=True)
+    player_seconds = fields.IntField(default=0)
+
+    class Meta:
+        unique_together = (("server", "resolution", "bucket_start"),)
+
+    @property
+    def players_avg(self) -> float:
+        return self.player_seconds / self.seconds if self.seconds else 0.0
+
+    @property
+    def uptime(self) -> float:
+        return self.online_seconds / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.resolution} rollup at {self.bucket_start} ({self.players_avg:.1f} avg, {self.uptime:.0%} up)"
+
+    def __repr__(self):
+        return f"<ServerStatsRollup: {self.resolution} {self.bucket_start}>"
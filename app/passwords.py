@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.hash import bcrypt
+
+from app.settings import PASSWORD_BCRYPT_ROUNDS, PASSWORD_HASH_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Hashes with fewer rounds than configured are reported by needs_update()
+_hasher = bcrypt.using(
+    rounds=PASSWORD_BCRYPT_ROUNDS, min_desired_rounds=PASSWORD_BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop; extra requests queue here instead of piling onto the CPU.
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_MAX_CONCURRENCY, thread_name_prefix="bcrypt"
+)
+
+
+async def hash_password(raw_password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _hasher.hash, raw_password)
+
+
+def _verify(raw_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    if not _hasher.verify(raw_password, password_hash):
+        return False, None
+    if _hasher.needs_update(password_hash):
+        return True, _hasher.hash(raw_password)
+    return True, None
+
+
+async def verify_password(
+    raw_password: str, password_hash: str
+) -> Tuple[bool, Optional[str]]:
+    """Check a password against its hash.
+
+    Returns (matches, new_hash); new_hash is set when the stored hash uses an
+    outdated cost and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _executor, _verify, raw_password, password_hash
+        )
+    except ValueError as e:
+        logger.warning("Invalid password hash: %s", e)
+        return False, None
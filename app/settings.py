@@ -1,3 +1,4 @@
+from datetime import timedelta
 
 SERVER_IP = "your_server_ip"
 SERVER_VERSION = "your_server_version"
@@ -5,19 +6,130 @@ SERVER_MOTD = "your_server_motd"
 SERVER_PORT = 25565
 SERVER_NAME = "your_server_name"
 SERVER_MAX_PLAYERS = 20
+# UDP port of the Query protocol (enable-query in server.properties), which
+# lists every online player; None uses Server List Ping on SERVER_PORT only.
+# Status probes connect to RCON_HOST; SERVER_IP is only the address shown to
+# players and is never connected to.
+SERVER_QUERY_PORT = None
+# The server's logs/latest.log, when the dashboard can read it. Joins, leaves,
+# deaths and chat are then picked up from the log as they happen instead of
+# at the next poll. Its timestamps are taken to be in TIMEZONE.
+SERVER_LOG_PATH = None
+# The server's world folder, when the dashboard can read it. Offline players'
+# positions, spawn points, health and XP are then read from its playerdata
+# files (and names from usercache.json next to it), without RCON.
+SERVER_WORLD_PATH = None
+
+# Minecraft servers on this dashboard, keyed by a short id that is stored
+# with their players and history. None means the single server described by
+# the SERVER_* and RCON_* settings, under the id "default". Keys left out of
+# an entry fall back to those settings, e.g.:
+#
+# MINECRAFT_SERVERS = {
+#     "survival": {"name": "Survival", "ip": "mc.example.com", "rcon_port": 25575},
+#     "creative": {
+#         "name": "Creative",
+#         "ip": "mc.example.com:25566",
+#         "port": 25566,
+#         "rcon_port": 25576,
+#     },
+# }
+#
+# "ip" is only displayed: status probes go to "rcon_host" on "port" (and
+# "query_port"), so a server whose game port isn't SERVER_PORT needs "port"
+# even when "ip" already shows it.
+# The first server is the default one, e.g. for the admin list pages.
+# Players and history from before servers were configurable belong to
+# "default", so keep that key for the server they came from.
+MINECRAFT_SERVERS = None
 
 SECRET_KEY = "your-super-secret-key"
+
+# Logged-in users (with their GamePlayer) are cached in memory per session id
+USER_CACHE_SIZE = 256
+USER_CACHE_TTL_SECONDS = 60
+
+# Whitelist and banlist read over RCON are served from memory and refreshed
+# in the background once older than this
+SERVER_LIST_CACHE_TTL_SECONDS = 5 * 60
+# Most players one bulk whitelist/ban/kick request may list
+BULK_MAX_ENTRIES = 500
+
+# bcrypt cost factor; older hashes with a lower cost are upgraded at login
+PASSWORD_BCRYPT_ROUNDS = 12
+# Password hashes computed in parallel, off the event loop; the rest queue
+PASSWORD_HASH_MAX_CONCURRENCY = 2
+
 RCON_HOST = "127.0.0.1"
 RCON_PORT = 25575
 RCON_PASSWORD = "your_rcon_password"
+RCON_POOL_SIZE = 2  # authenticated connections kept open to the server
+RCON_TIMEOUT = 10.0  # seconds to wait for a connect or a command reply
+RCON_KEEPALIVE_SECONDS = 30  # idle connections are pinged this often
+
+# Every RCON command goes through one priority queue (admin > user > poll).
+# It sends at most RCON_COMMANDS_PER_SECOND on average (bursts of up to
+# RCON_BURST) with at most RCON_MAX_IN_FLIGHT awaiting a reply. Callers give
+# up after their class's timeout, queueing included.
+RCON_COMMANDS_PER_SECOND = 20
+RCON_BURST = 10
+RCON_MAX_IN_FLIGHT = 4
+RCON_PRIORITY_TIMEOUTS = {"admin": 15, "user": 20, "poll": 60}
+
+# Status poller: seconds between polls while players are online, while the
+# server is empty, and the backoff cap while it is unreachable. Each period
+# is randomized by +/- POLL_JITTER_FRACTION.
+POLL_ACTIVE_INTERVAL_SECONDS = 30
+POLL_IDLE_INTERVAL_SECONDS = 120
+POLL_OFFLINE_MAX_INTERVAL_SECONDS = 30 * 60
+POLL_JITTER_FRACTION = 0.1
+
+# Fetch every online player's position with `execute as @a` instead of
+# two RCON commands per player.
+POLL_BULK_POSITIONS = True
+
+# Learn whether a server is up, and who is online, from an unauthenticated
+# status probe (Query, else Server List Ping) instead of RCON `list`. RCON is
+# then only used for positions, or for `list` when the probe can't name
+# everyone. False polls with RCON alone.
+POLL_STATUS_PROBE = True
+POLL_PROBE_TIMEOUT = 5.0
+
+# Log tailing (servers with a log path): seconds between checks for new lines,
+# and the most read from the file at once. With the log tailed, the poll
+# intervals above only bound how fresh positions are, so they can be raised.
+LOG_TAIL_INTERVAL_SECONDS = 1.0
+LOG_TAIL_READ_BYTES = 1 << 20
+# `manage.py backfill-logs` loads this many parsed log files per transaction
+BACKFILL_BATCH_FILES = 200
+# Messages per page of the admin chat search
+CHAT_SEARCH_PAGE_SIZE = 50
 
 STATIC = {
     "URL": "/static",
     "DIR": "app/static",
 }
 
+# Applied by the SQLite backend as PRAGMAs on every new connection. WAL lets
+# page reads proceed while the poller writes; NORMAL sync is safe under WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms to wait for a lock instead of failing
+    "cache_size": -16000,  # negative means KiB, so ~16 MB
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
 TORTOISE_ORM = {
-    "connections": {"default": "sqlite://db.sqlite3"},
+    "connections": {
+        "default": {
+            # Stock SQLite backend with per-request query accounting
+            "engine": "app.db_client",
+            "credentials": {"file_path": "db.sqlite3", **SQLITE_PRAGMAS},
+        }
+    },
     "apps": {
         "models": {
             "models": ["app.models", "aerich.models"],
@@ -28,6 +140,39 @@ TORTOISE_ORM = {
 
 TIMEZONE = "UTC"
 
+# Requests slower than this are logged with a DB/RCON/render breakdown
+# (None disables the log); the same breakdown can be sent as a
+# Server-Timing header, visible in the browser's dev tools.
+SLOW_REQUEST_THRESHOLD_MS = 500
+SERVER_TIMING_HEADER = False
+
+# Log lines below ERROR are capped per message: at most this many
+# (count, seconds), so a per-player message in the poll loop can't flood logs.
+# The production profile (MC_DASH_ENV=production) logs at INFO and adds a
+# JSON log file; MC_DASH_LOG_LEVEL overrides the level.
+LOG_RATE_LIMIT = (20, 60)
+
+# Server history: a raw snapshot is written when the status or player set
+# changes, and at least this often otherwise.
+SNAPSHOT_HEARTBEAT_SECONDS = 15 * 60
+# How long each resolution is kept; None keeps it forever.
+SNAPSHOT_RETENTION = {
+    "raw": timedelta(days=14),
+    "minute": timedelta(days=2),
+    "hour": timedelta(days=180),
+    "day": None,
+    "trail": timedelta(days=90),
+}
+
+# Position trails: every polled position is kept, in compressed blocks of up
+# to TRAIL_BLOCK_SAMPLES per player, written at least every TRAIL_FLUSH_SECONDS.
+TRAIL_BLOCK_SAMPLES = 720
+TRAIL_FLUSH_SECONDS = 15 * 60
+# A longer pause between two positions starts a new trail segment
+TRAIL_SESSION_GAP_SECONDS = 10 * 60
+# Heatmaps use bigger cells rather than return more than this many
+TRAIL_HEATMAP_MAX_CELLS = 256 * 256
+
 try:
     from .settings_local import *  # noqa: F403
 except ImportError:
@@ -3,9 +3,10 @@ from functools import wraps
 
 from fastapi import HTTPException, Request
 from fastapi.responses import RedirectResponse
-from passlib.hash import bcrypt
 
 from app.models import User
+from app.passwords import hash_password
+from app.user.cache import user_cache
 
 
 # Utility to inject user into template response
@@ -27,15 +28,13 @@ def login_required(func):
             login_url = request.url_for("user_login")
             return RedirectResponse(login_url, status_code=302)
 
-        user = await User.get_or_none(id=user_id)
+        user = await user_cache.get(user_id)
 
         if not user:
             raise HTTPException(status_code=403, detail="Niste ulogovani.")
         
         if not user.is_approved:
             raise HTTPException(status_code=403, detail="Korisnik nije odobren.")
-        
-        await user.fetch_related("game_player")
 
         request.state.user = user
         result = await func(request, *args, **kwargs)
@@ -53,13 +52,11 @@ def admin_required(func):
             login_url = request.url_for("user_login")
             return RedirectResponse(login_url, status_code=302)
 
-        user = await User.get_or_none(id=user_id)
+        user = await user_cache.get(user_id)
 
         if not user or not user.is_admin or not user.is_approved:
             raise HTTPException(status_code=403, detail="Admin access required")
 
-        await user.fetch_related("game_player")
-
         request.state.user = user
         result = await func(request, *args, **kwargs)
         return _inject_user_context(result, request, user)
@@ -75,7 +72,7 @@ async def authenticate_user(username: str, password: str):
     Authenticate and return a user only if credentials match and user is approved.
     """
     user = await User.get_or_none(username=username)
-    if user and user.is_approved and bcrypt.verify(password, user.password_hash):
+    if user and user.is_approved and await user.verify_password(password):
         return user
     return None
 
@@ -84,7 +81,7 @@ async def create_user(username: str, email: str, password: str):
     """
     Create a new user with hashed password and default approval = False.
     """
-    hash_pw = bcrypt.hash(password)
+    hash_pw = await hash_password(password)
     return await User.create(
         username=username,
         email=email,
@@ -103,5 +100,5 @@ async def get_user_from_session(request: Request):
     """
     user_id = request.session.get("user_id")
     if user_id:
-        return await User.get_or_none(id=user_id)
+        return await user_cache.get(user_id)
     return None
@@ -0,0 +1,63 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.metrics import CACHE_LOOKUPS
+from app.models import User
+from app.settings import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """Bounded TTL/LRU cache of session users with their linked GamePlayer.
+
+    Views that change a user (or the player linked to one) must call
+    `invalidate` / `invalidate_game_player`; the TTL only bounds how stale
+    poller-driven fields such as `last_seen` can get.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+
+    async def get(self, user_id: int) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="user", result="hit")
+            return entry[1]
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache="user", result="miss")
+        user = await User.filter(id=user_id).select_related("game_player").first()
+        if user is None:
+            self._entries.pop(user_id, None)
+            return None
+
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop one user, or everyone when no id is given."""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def invalidate_game_player(self, game_player_id: int) -> None:
+        """Drop every cached user linked to the given GamePlayer."""
+        for user_id, (_, user) in list(self._entries.items()):
+            if user.game_player_id == game_player_id:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
@@ -2,7 +2,10 @@ from fastapi import APIRouter, Form, Request, status
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
+from app.minecraft.playerdata import get_player_data
+from app.minecraft.servers import SERVERS
 from app.user.auth import create_user, login_required
+from app.user.cache import user_cache
 from app.models import GamePlayer, User
 from app.utils import flash, render_template
 
@@ -44,7 +47,7 @@ async def login_user(
     request: Request, username: str = Form(...), password: str = Form(...)
 ):
     user = await User.get_or_none(username=username)
-    if not user or not user.verify_password(password):
+    if not user or not await user.verify_password(password):
         return render_template(
             "user/login.html", request, {"error": "Invalid credentials"}
         )
@@ -68,10 +71,14 @@ async def logout(request: Request):
 @router.get("/profile", name="user_profile")
 @login_required
 async def profile_view(request: Request):
-    await request.state.user.fetch_related("game_player")
     game_players = await GamePlayer.all().order_by("name")
+    game_player = request.state.user.game_player
+    saved = None
+    if game_player is not None and game_player.server in SERVERS:
+        saved = await get_player_data(game_player.name, game_player.server)
     return render_template("user/profile.html", request, {
-        "game_players": game_players
+        "game_players": game_players,
+        "saved": saved,
     })
 
 @router.post("/profile", name="user_profile_update")
@@ -89,6 +96,7 @@ async def update_profile(request: Request):
         user.game_player = None
 
     await user.save()
+    user_cache.invalidate(user.id)
     return RedirectResponse(url=request.url_for("user_profile"), status_code=302)
 
 @router.post("/change-password", name="user_change_password")
@@ -106,5 +114,6 @@ async def change_password(request: Request, password: str = Form(...), confirm_p
     #     return RedirectResponse(request.url_for("user_profile"), status_code=302)
 
     await user.set_password(password)
+    user_cache.invalidate(user.id)
     flash(request, "Lozinka uspešno promenjena!", "success")
     return RedirectResponse(request.url_for("user_profile"), status_code=302)
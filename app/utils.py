@@ -1,10 +1,14 @@
 import json
+import time
+from datetime import datetime, timezone
 
 from fastapi import Request
 from fastapi.templating import Jinja2Templates
 from starlette import status
 from starlette.responses import RedirectResponse, Response
 
+from app.metrics import record_render
+
 templates = Jinja2Templates(directory="app/templates")
 templates.env.filters["escapejs"] = lambda v: json.dumps(str(v))[1:-1]
 
@@ -14,7 +18,10 @@ def render_template(template_name: str, request: Request, context: dict) -> Resp
     context["user"] = user
     context["request"] = request
     context["flash"] = get_flashed_message(request)
-    return templates.TemplateResponse(template_name, context)
+    started = time.perf_counter()
+    response = templates.TemplateResponse(template_name, context)
+    record_render(time.perf_counter() - started)
+    return response
 
 
 def redirect_back(
@@ -32,3 +39,13 @@ def flash(request: Request, message: str, category: str = "info"):
 def get_flashed_message(request: Request):
     """Retrieve and remove flash message from session."""
     return request.session.pop("_flash", None)
+
+
+def as_utc(value: datetime) -> datetime:
+    """A stored datetime as an aware UTC one.
+
+    Tortoise hands back naive datetimes in UTC when use_tz is off.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
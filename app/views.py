@@ -1,48 +1,150 @@
+import hashlib
 import logging
+import time
+import uuid
 
 from datetime import datetime, timezone
+from typing import Dict, Optional
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 from fastapi.templating import Jinja2Templates
 
-import app.settings
 from app.user.auth import login_required
-from app.minecraft.cache import get_server_status
+from app.metrics import CACHE_LOOKUPS, record_render
+from app.minecraft.cache import get_server_status, get_status_generation
+from app.minecraft.servers import SERVERS, all_servers, get_server
+from app.minecraft.sessions import players_between
 from app.models import GamePlayer, ServerSnapshot
 from app.utils import render_template
+from app.utils import templates as shared_templates
 
 logger = logging.getLogger(__name__)
 router = APIRouter()  # main app router
 templates = Jinja2Templates(directory="app/templates")  # main app templates
 
+# Changes on every restart, so cached pages from an older deploy are not reused
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+# Homepage data and rendered player lists per server, valid for one status generation
+_homepage_caches: Dict[str, dict] = {}
+
+
+class LivePlayerPlaceholder:
+    """Stands in for a GamePlayer in the row template filled by live updates."""
+
+    name = "__PLAYER__"
+
+    def last_seen_coords(self, rich=True):
+        return "__COORDS__"
+
+
+async def _get_homepage_data(status: dict, key: tuple) -> dict:
+    """Query a server's shared homepage data once per status generation."""
+    server, _, start_of_day = key
+    homepage_cache = _homepage_caches.setdefault(server, {"key": None})
+    if homepage_cache["key"] == key:
+        CACHE_LOOKUPS.inc(cache="homepage", result="hit")
+        return homepage_cache["data"]
+    CACHE_LOOKUPS.inc(cache="homepage", result="miss")
+
+    # Query players seen today
+    players_today = await players_between(start_of_day, datetime.now(timezone.utc), server)
+
+    online_usernames = status.get("player_names", [])
+    online_players = (
+        await GamePlayer.filter(server=server, name__in=online_usernames)
+        if online_usernames
+        else []
+    )
+
+    snapshots = await ServerSnapshot.filter(server=server).order_by("-timestamp").limit(1)
+
+    homepage_cache.update(
+        key=key,
+        data={
+            "players_today": players_today,
+            "online_players": online_players,
+            "snapshots": snapshots,
+        },
+        fragments={},
+    )
+    return homepage_cache["data"]
+
+
+def _render_player_lists(request: Request, user, server: str, data: dict) -> dict:
+    """Render the player lists once per generation for admins and non-admins."""
+    fragment_key = (bool(user and user.is_admin), str(request.base_url))
+    fragments = _homepage_caches[server]["fragments"]
+    if fragment_key not in fragments:
+        started = time.perf_counter()
+        module = shared_templates.get_template("_home_players.html").module
+        fragments[fragment_key] = {
+            "online_players_html": module.online_players_list(
+                data["online_players"], user, request
+            ),
+            "players_today_html": module.players_today_list(
+                data["players_today"], user, request
+            ),
+        }
+        record_render(time.perf_counter() - started)
+    return fragments[fragment_key]
+
+
+def _homepage_etag(key: tuple, user) -> str:
+    """ETag covering the shared data and the per-user parts of the page."""
+    game_player = user.game_player
+    raw = ":".join(
+        str(part)
+        for part in (
+            _BOOT_ID,
+            *key,
+            user.id,
+            user.username,
+            user.is_admin,
+            game_player.home_coords() if game_player else "",
+        )
+    )
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
 
 @router.get("/", name="homepage")
 @login_required
-async def homepage(request: Request):
+async def homepage(request: Request, server: Optional[str] = None):
     logger.debug("Homepage accessed")
 
-    # Get live server status from in-memory cache
-    status = get_server_status()
+    # Unknown server keys fall back to the default server
+    config = get_server(server if server in SERVERS else None)
 
-    # Static server info (config-based)
-    server_info = {
-        "ip": app.settings.SERVER_IP,
-        "version": app.settings.SERVER_VERSION,
-        "motd": app.settings.SERVER_MOTD,
-    }
+    # Get live server status from in-memory cache
+    status = get_server_status(config.key)
+    user = request.state.user
 
     now = datetime.now(timezone.utc)
     start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    key = (config.key, get_status_generation(), start_of_day)
 
-    # Query players seen today
-    players_today = await GamePlayer.filter(last_seen__gte=start_of_day).order_by(
-        "last_seen"
-    )
+    # Unchanged since the browser's copy: skip queries and rendering entirely.
+    # Pages carrying a flash message are always rendered so it gets consumed.
+    etag = _homepage_etag(key, user)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if (
+        "_flash" not in request.session
+        and request.headers.get("if-none-match") == etag
+    ):
+        CACHE_LOOKUPS.inc(cache="homepage", result="not_modified")
+        return Response(status_code=304, headers=headers)
 
-    online_usernames = status.get("player_names", [])
-    online_players = await GamePlayer.filter(name__in=online_usernames) if online_usernames else []
+    # Server info as last reported by the status probe, else from settings
+    server_info = {
+        "key": config.key,
+        "name": config.name,
+        "ip": config.ip,
+        "version": status.get("version") or config.version,
+        "motd": status.get("motd") or config.motd,
+        "latency_ms": status.get("latency_ms"),
+    }
 
-    snapshots = await ServerSnapshot.all().order_by("-timestamp").limit(1)
+    data = await _get_homepage_data(status, key)
 
     context = {
         "server_status": status["status"],
@@ -50,13 +152,16 @@ async def homepage(request: Request):
         "max_players": status["max_players"],
         "online_names": status["player_names"],
         "server_info": server_info,
-        "snapshots": snapshots,
-        "players_today": players_today,
-        "online_players": online_players,
+        "servers": all_servers(),
+        **data,
+        **_render_player_lists(request, user, config.key, data),
+        "live_player_placeholder": LivePlayerPlaceholder(),
     }
 
-    return render_template(
+    response = render_template(
         "home.html",
         request,
         context,
     )
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,206 @@
+"""Poll-path benchmark against the fake Minecraft server.
+
+Runs poll_and_cache, the mc_utils helpers, the status probes and the admin
+list commands against bench.fake_server with an in-memory database, and
+reports per cycle wall time, RCON round trips, DB statements and event-loop
+lag. The poller probes with Server List Ping, or Query with --query.
+
+    python -m bench.bench_poll --players 1 10 50 100 250 500 --cycles 5
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import logging
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from tortoise import Tortoise
+
+from app.admin.utils import parse_banlist_response, parse_whitelist_response
+from app.minecraft import rcon, servers
+from app.minecraft.dispatch import close_command_schedulers, rcon_command
+from app.minecraft.cache import poll_and_cache
+from app.minecraft.mc_utils import get_coordinates
+from app.minecraft.probe import ping_server, query_server
+from bench.fake_server import FakeMinecraftServer
+
+PASSWORD = "bench"
+
+
+class ServerThread:
+    """Runs the fake server on its own event loop, so it is not measured."""
+
+    def __init__(self, server: FakeMinecraftServer):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        self.port, self.status_port, self.query_port = self.call(
+            self.server.start(status_port=0, query_port=0)
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self.call(self.server.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def run(self, func: Callable, *args):
+        async def wrapper():
+            return func(*args)
+
+        return self.call(wrapper())
+
+
+class LoopLagMonitor:
+    """Measures how late a short periodic timer fires on the benchmark loop."""
+
+    def __init__(self, period: float = 0.001):
+        self.period = period
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.period
+            await asyncio.sleep(self.period)
+            self.max_lag = max(self.max_lag, loop.time() - expected)
+
+    @contextmanager
+    def measure(self):
+        self.max_lag = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            yield self
+        finally:
+            self._task.cancel()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str):
+        self.count += 1
+
+    async def install(self):
+        connection = Tortoise.get_connection("default")
+        await connection.create_connection(with_db=True)
+        await connection._connection.set_trace_callback(self)
+
+
+async def _measure(server_thread: ServerThread, statements: StatementCounter, lag: LoopLagMonitor, coro_factory):
+    stats = server_thread.server.stats
+    server_thread.run(stats.reset)
+    statements.count = 0
+    with lag.measure():
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        await coro_factory()
+        elapsed = time.perf_counter() - started
+    return {
+        "wall_ms": elapsed * 1000,
+        "rcon": stats.commands,
+        "db": statements.count,
+        "lag_ms": lag.max_lag * 1000,
+    }
+
+
+def _summarize(label: str, samples: List[Dict[str, float]]) -> str:
+    def med(key):
+        return statistics.median(s[key] for s in samples)
+
+    return (
+        f"{label:<28} {med('wall_ms'):>10.1f} {med('rcon'):>8.0f} "
+        f"{med('db'):>8.0f} {max(s['lag_ms'] for s in samples):>10.1f}"
+    )
+
+
+async def run(args) -> None:
+    server = FakeMinecraftServer(
+        players=0,
+        max_players=max(args.players),
+        password=PASSWORD,
+        latency=args.latency_ms / 1000,
+        tick=0,
+        churn=args.churn,
+        seed=1,
+    )
+    with ServerThread(server) as server_thread:
+        # Point the default server's RCON pool at the fake server
+        servers.SERVERS[servers.DEFAULT_SERVER] = dataclasses.replace(
+            servers.get_server(),
+            port=server_thread.status_port,
+            query_port=server_thread.query_port if args.query else None,
+            rcon_host="127.0.0.1",
+            rcon_port=server_thread.port,
+            rcon_password=PASSWORD,
+        )
+
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+        await Tortoise.generate_schemas()
+        statements = StatementCounter()
+        await statements.install()
+        lag = LoopLagMonitor()
+
+        print(f"{'case':<28} {'wall ms':>10} {'rcon':>8} {'db stmts':>8} {'max lag ms':>10}")
+        for count in args.players:
+            server_thread.run(server.set_player_count, count)
+            server_thread.run(server.step)
+            await poll_and_cache()  # warm up connections and create players
+
+            samples = []
+            for _ in range(args.cycles):
+                server_thread.run(server.step)
+                samples.append(await _measure(server_thread, statements, lag, poll_and_cache))
+            print(_summarize(f"poll_and_cache n={count}", samples))
+
+        name = next(iter(server.online), None)
+        helpers = {
+            "list": lambda: rcon_command("list"),
+            "server list ping": lambda: ping_server("127.0.0.1", server_thread.status_port),
+            "query": lambda: query_server("127.0.0.1", server_thread.query_port),
+            "banlist + parse": _banlist,
+            "whitelist list + parse": _whitelist,
+        }
+        if name:
+            helpers["get_coordinates"] = lambda: get_coordinates(name)
+        for label, factory in helpers.items():
+            samples = [await _measure(server_thread, statements, lag, factory) for _ in range(args.cycles)]
+            print(_summarize(label, samples))
+
+        await close_command_schedulers()
+        await rcon.close_rcon_pools()
+        await Tortoise.close_connections()
+
+
+async def _banlist():
+    parse_banlist_response(await rcon_command("banlist"))
+
+
+async def _whitelist():
+    try:
+        parse_whitelist_response(await rcon_command("whitelist list"))
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="simulated server reply delay")
+    parser.add_argument("--query", action="store_true", help="probe with Query instead of Server List Ping")
+    parser.add_argument("--churn", type=float, default=0.0, help="join/leave probability per step")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,446 @@
+"""Local stand-in for a Minecraft server, for benchmarks and manual testing.
+
+Speaks RCON (TCP) and, optionally, Server List Ping and Query (UDP), and
+simulates a number of players that move around, change dimension, join and
+leave.
+
+    python -m bench.fake_server --players 20 --port 25575 --password secret
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ["minecraft:overworld", "minecraft:the_nether", "minecraft:the_end"]
+MAX_FRAGMENT = 4096
+
+
+@dataclass
+class FakePlayer:
+    name: str
+    x: float
+    y: float
+    z: float
+    dimension: str = "minecraft:overworld"
+
+
+@dataclass
+class FakeServerStats:
+    connections: int = 0
+    auth_failures: int = 0
+    commands: int = 0
+    packets_in: int = 0
+    status_pings: int = 0
+    queries: int = 0
+    by_verb: Dict[str, int] = field(default_factory=dict)
+
+    def reset(self):
+        self.__init__()
+
+
+class FakeMinecraftServer:
+    def __init__(
+        self,
+        players: int = 10,
+        max_players: int = 500,
+        password: str = "secret",
+        latency: float = 0.0,
+        tick: float = 1.0,
+        churn: float = 0.0,
+        dimension_change: float = 0.01,
+        fragment_size: int = MAX_FRAGMENT,
+        seed: Optional[int] = None,
+    ):
+        self.max_players = max_players
+        self.password = password
+        self.latency = latency
+        self.tick = tick
+        self.churn = churn
+        self.dimension_change = dimension_change
+        self.fragment_size = fragment_size
+        self.random = random.Random(seed)
+        self.stats = FakeServerStats()
+
+        self.online: Dict[str, FakePlayer] = {}
+        self.offline: List[str] = []
+        self.whitelist: List[str] = []
+        self.bans: Dict[str, str] = {}
+        self._next_player = 1
+        self._servers: List[asyncio.AbstractServer] = []
+        self._transports: List[asyncio.DatagramTransport] = []
+        self._query_challenge = random.randint(1, 2**31 - 1)
+        self._tick_task: Optional[asyncio.Task] = None
+        self.set_player_count(players)
+
+    # --- Simulation ---
+
+    def _new_player(self) -> FakePlayer:
+        if self.offline:
+            name = self.offline.pop()
+        else:
+            name = f"Player{self._next_player:03d}"
+            self._next_player += 1
+        r = self.random
+        return FakePlayer(name, r.uniform(-2000, 2000), r.uniform(-60, 200), r.uniform(-2000, 2000))
+
+    def set_player_count(self, count: int) -> None:
+        while len(self.online) > count:
+            name, _ = self.online.popitem()
+            self.offline.append(name)
+        while len(self.online) < count:
+            player = self._new_player()
+            self.online[player.name] = player
+
+    def step(self) -> None:
+        r = self.random
+        for player in self.online.values():
+            player.x += r.uniform(-8, 8)
+            player.z += r.uniform(-8, 8)
+            player.y = min(max(player.y + r.uniform(-2, 2), -64), 320)
+            if r.random() < self.dimension_change:
+                player.dimension = r.choice(DIMENSIONS)
+
+        for name in list(self.online):
+            if r.random() < self.churn:
+                del self.online[name]
+                self.offline.append(name)
+        for _ in range(len(self.offline)):
+            if r.random() < self.churn and len(self.online) < self.max_players:
+                player = self._new_player()
+                self.online[player.name] = player
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self.step()
+
+    # --- Commands ---
+
+    def _entity_data(self, player: FakePlayer, path: str) -> str:
+        if path == "Pos":
+            value = f"[{player.x}d, {player.y}d, {player.z}d]"
+        elif path == "Dimension":
+            value = f'"{player.dimension}"'
+        else:
+            return f"Found no elements matching {path}"
+        return f"{player.name} has the following entity data: {value}"
+
+    def execute(self, command: str) -> str:
+        command = command.lstrip("/").strip()
+        verb = command.split(" ", 1)[0]
+        self.stats.commands += 1
+        self.stats.by_verb[verb] = self.stats.by_verb.get(verb, 0) + 1
+
+        if command == "list":
+            names = ", ".join(self.online)
+            return f"There are {len(self.online)} of a max of {self.max_players} players online: {names}"
+
+        match = re.fullmatch(r"execute as @a run data get entity @s (\w+)", command)
+        if match:
+            return "".join(self._entity_data(p, match.group(1)) for p in self.online.values())
+
+        match = re.fullmatch(r"data get entity (\w+) (\w+)", command)
+        if match:
+            player = self.online.get(match.group(1))
+            if player is None:
+                return "No entity was found"
+            return self._entity_data(player, match.group(2))
+
+        match = re.fullmatch(r"execute in (\S+) run tp (\w+) (\S+) (\S+) (\S+)", command)
+        if match:
+            player = self.online.get(match.group(2))
+            if player is None:
+                return "No entity was found"
+            player.dimension = match.group(1)
+            player.x, player.y, player.z = (float(v) for v in match.group(3, 4, 5))
+            return f"Teleported {player.name} to {player.x}, {player.y}, {player.z}"
+
+        match = re.fullmatch(r"tp (\w+) (\w+)", command)
+        if match:
+            source, target = self.online.get(match.group(1)), self.online.get(match.group(2))
+            if source is None or target is None:
+                return "No entity was found"
+            source.x, source.y, source.z, source.dimension = target.x, target.y, target.z, target.dimension
+            return f"Teleported {source.name} to {target.name}"
+
+        if command == "whitelist list":
+            if not self.whitelist:
+                return "There are no whitelisted players"
+            return f"There are {len(self.whitelist)} whitelisted player(s): {', '.join(self.whitelist)}"
+
+        match = re.fullmatch(r"whitelist (add|remove) (\w+)", command)
+        if match:
+            action, name = match.groups()
+            if action == "add":
+                if name in self.whitelist:
+                    return "Player is already whitelisted"
+                self.whitelist.append(name)
+                return f"Added {name} to the whitelist"
+            if name not in self.whitelist:
+                return "Player is not whitelisted"
+            self.whitelist.remove(name)
+            return f"Removed {name} from the whitelist"
+
+        if command == "banlist":
+            if not self.bans:
+                return "There are no bans"
+            entries = "\n".join(f"{target} was banned by Server: {reason}" for target, reason in self.bans.items())
+            return f"There are {len(self.bans)} ban(s):\n{entries}"
+
+        match = re.fullmatch(r"(ban|ban-ip|pardon|pardon-ip|kick) (\S+)(?: (.*))?", command)
+        if match:
+            action, target, reason = match.groups()
+            reason = reason or "Banned by an operator."
+            if action in ("ban", "ban-ip"):
+                if target in self.bans:
+                    return "Nothing changed. The player is already banned"
+                self.bans[target] = reason
+                self.online.pop(target, None)
+                if action == "ban-ip":
+                    return f"Banned IP {target}: {reason}"
+                return f"Banned {target}: {reason}"
+            if action in ("pardon", "pardon-ip"):
+                if self.bans.pop(target, None) is None:
+                    return "Nothing changed. The player isn't banned"
+                if action == "pardon-ip":
+                    return f"Unbanned IP {target}"
+                return f"Unbanned {target}"
+            if self.online.pop(target, None) is None:
+                return "No player was found"
+            self.offline.append(target)
+            return f"Kicked {target}: Kicked by an operator"
+
+        return f"Unknown or incomplete command, see below for error{command}<--[HERE]"
+
+    # --- RCON protocol ---
+
+    async def _handle_rcon(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        authenticated = False
+
+        def send(request_id: int, packet_type: int, body: str) -> None:
+            data = body.encode("utf-8")
+            writer.write(struct.pack("<iii", len(data) + 10, request_id, packet_type) + data + b"\x00\x00")
+
+        try:
+            while True:
+                (length,) = struct.unpack("<i", await reader.readexactly(4))
+                packet = await reader.readexactly(length)
+                request_id, packet_type = struct.unpack("<ii", packet[:8])
+                body = packet[8:-2].decode("utf-8", errors="replace")
+                self.stats.packets_in += 1
+
+                if packet_type == 3:
+                    authenticated = body == self.password
+                    if not authenticated:
+                        self.stats.auth_failures += 1
+                    send(request_id if authenticated else -1, 2, "")
+                elif not authenticated:
+                    send(-1, 2, "")
+                elif packet_type == 2:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    data = self.execute(body).encode("utf-8")
+                    chunks = [data[i : i + self.fragment_size] for i in range(0, len(data), self.fragment_size)] or [b""]
+                    for chunk in chunks:
+                        send(request_id, 0, chunk.decode("utf-8", errors="ignore"))
+                else:
+                    send(request_id, 0, f"Unknown request {packet_type:x}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- Server List Ping ---
+
+    @staticmethod
+    async def _read_varint(reader: asyncio.StreamReader) -> int:
+        value = 0
+        for shift in range(0, 35, 7):
+            byte = (await reader.readexactly(1))[0]
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value
+        raise ValueError("VarInt too long")
+
+    @staticmethod
+    def _varint(value: int) -> bytes:
+        out = bytearray()
+        value &= 0xFFFFFFFF
+        while True:
+            byte = value & 0x7F
+            value >>= 7
+            out.append(byte | (0x80 if value else 0))
+            if not value:
+                return bytes(out)
+
+    def status_json(self) -> dict:
+        return {
+            "version": {"name": "1.21.4", "protocol": 769},
+            "players": {
+                "max": self.max_players,
+                "online": len(self.online),
+                "sample": [
+                    {"name": name, "id": f"00000000-0000-0000-0000-{i:012d}"}
+                    for i, name in enumerate(list(self.online)[:12])
+                ],
+            },
+            "description": {"text": "A fake Minecraft server"},
+        }
+
+    async def _handle_status(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                length = await self._read_varint(reader)
+                packet = await reader.readexactly(length)
+                packet_id = packet[0]
+                if packet_id == 0x00 and len(packet) > 1:
+                    continue  # handshake
+                if packet_id == 0x00:
+                    self.stats.status_pings += 1
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    body = json.dumps(self.status_json()).encode("utf-8")
+                    payload = b"\x00" + self._varint(len(body)) + body
+                elif packet_id == 0x01:
+                    payload = packet
+                else:
+                    break
+                writer.write(self._varint(len(payload)) + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- Query ---
+
+    def query_reply(self, packet: bytes) -> Optional[bytes]:
+        if len(packet) < 7 or packet[:2] != b"\xfe\xfd":
+            return None
+        packet_type, session = packet[2], packet[3:7]
+        if packet_type == 9:
+            return b"\x09" + session + str(self._query_challenge).encode() + b"\x00"
+        if packet_type == 0 and int.from_bytes(packet[7:11], "big", signed=True) == self._query_challenge:
+            self.stats.queries += 1
+            values = {
+                "hostname": "A fake Minecraft server",
+                "gametype": "SMP",
+                "game_id": "MINECRAFT",
+                "version": "1.21.4",
+                "plugins": "",
+                "map": "world",
+                "numplayers": str(len(self.online)),
+                "maxplayers": str(self.max_players),
+                "hostport": "25565",
+                "hostip": "127.0.0.1",
+            }
+            body = b"".join(k.encode() + b"\x00" + v.encode() + b"\x00" for k, v in values.items())
+            names = b"".join(name.encode() + b"\x00" for name in self.online)
+            return (
+                b"\x00" + session + b"splitnum\x00\x80\x00" + body + b"\x00"
+                + b"\x01player_\x00\x00" + names + b"\x00"
+            )
+        return None
+
+    class _QueryEndpoint(asyncio.DatagramProtocol):
+        def __init__(self, server: "FakeMinecraftServer"):
+            self.server = server
+            self.transport = None
+
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            reply = self.server.query_reply(data)
+            if reply is not None:
+                self.transport.sendto(reply, addr)
+
+    # --- Lifecycle ---
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        rcon_port: int = 0,
+        status_port: Optional[int] = None,
+        query_port: Optional[int] = None,
+    ):
+        """Start listening; returns (rcon_port, status_port or None, query_port or None)."""
+        rcon = await asyncio.start_server(self._handle_rcon, host, rcon_port)
+        self._servers.append(rcon)
+        ports = [rcon.sockets[0].getsockname()[1], None, None]
+        if status_port is not None:
+            status = await asyncio.start_server(self._handle_status, host, status_port)
+            self._servers.append(status)
+            ports[1] = status.sockets[0].getsockname()[1]
+        if query_port is not None:
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: self._QueryEndpoint(self), local_addr=(host, query_port)
+            )
+            self._transports.append(transport)
+            ports[2] = transport.get_extra_info("sockname")[1]
+        if self.tick:
+            self._tick_task = asyncio.create_task(self._tick_loop())
+        return tuple(ports)
+
+    async def stop(self) -> None:
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+
+async def _main(args) -> None:
+    server = FakeMinecraftServer(
+        players=args.players,
+        max_players=args.max_players,
+        password=args.password,
+        latency=args.latency_ms / 1000,
+        tick=args.tick,
+        churn=args.churn,
+        fragment_size=args.fragment_size,
+        seed=args.seed,
+    )
+    rcon_port, status_port, query_port = await server.start(
+        args.host, args.port, args.status_port, args.query_port
+    )
+    logger.info(
+        "Fake server: RCON on %s:%s, status on %s, query on %s",
+        args.host, rcon_port, status_port, query_port,
+    )
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25575, help="RCON port")
+    parser.add_argument("--status-port", type=int, default=None, help="Server List Ping port (off by default)")
+    parser.add_argument("--query-port", type=int, default=None, help="Query (UDP) port (off by default)")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--max-players", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before each command reply")
+    parser.add_argument("--tick", type=float, default=1.0, help="seconds between simulation steps")
+    parser.add_argument("--churn", type=float, default=0.0, help="per-tick join/leave probability")
+    parser.add_argument("--fragment-size", type=int, default=MAX_FRAGMENT)
+    parser.add_argument("--seed", type=int, default=None)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(asctime)s - %(message)s")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
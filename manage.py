@@ -5,7 +5,6 @@ import sys
 from zoneinfo import ZoneInfo
 
 import uvicorn
-from passlib.hash import bcrypt
 from tortoise import Tortoise
 
 from app import settings
@@ -14,8 +13,10 @@ from app.db import (
     setup_tortoise_if_needed,
     with_db,
 )
+from app.minecraft.backfill import backfill_logs
 from app.minecraft.cache import poll_and_cache
 from app.models import GamePlayer, ServerSnapshot, User
+from app.passwords import hash_password
 
 
 def aerich_run(*args):
@@ -105,12 +106,23 @@ async def show_recent_players():
         print(f"{p.name:20} | Last seen: {last_seen} | Coords: {coords}")
 
 
+@with_db
+async def backfill_from_logs(directory, server=None, jobs=None):
+    totals = await backfill_logs(directory, server=server, jobs=jobs)
+    print(
+        f"✅ Imported {totals['sessions']} play sessions and {totals['messages']} chat messages"
+        f" from {totals['files']} log files ({totals['lines']} lines) in {totals['seconds']}s."
+    )
+    if totals["failed"]:
+        print(f"⚠️  {totals['failed']} files failed and will be retried on the next run.")
+
+
 @with_db
 async def create_admin():
     username = input("Username: ")
     email = input("Email: ")
     password = getpass.getpass("Password: ")
-    hash_pw = bcrypt.hash(password)
+    hash_pw = await hash_password(password)
 
     existing_user = await User.get_or_none(username=username)
     if existing_user:
@@ -133,7 +145,7 @@ async def create_user():
     email = input("Email: ")
     password = getpass.getpass("Password: ")
     game_name = input("Game Name: ")
-    hash_pw = bcrypt.hash(password)
+    hash_pw = await hash_password(password)
 
     existing_user = await User.get_or_none(username=username)
     if existing_user:
@@ -202,8 +214,7 @@ async def reset_password(username):
         print("❌ User not found")
     else:
         new_password = getpass.getpass("New Password: ")
-        user.set_password(new_password)
-        await user.save()
+        await user.set_password(new_password)
         print(f"✅ Password for '{username}' reset.")
 
 
@@ -299,6 +310,22 @@ if __name__ == "__main__":
     elif cmd == "recentplayers":
         asyncio.run(show_recent_players())
 
+    elif cmd == "backfill-logs":
+        options = {}
+        for flag in ("--server", "--jobs"):
+            if flag in args:
+                idx = args.index(flag)
+                if idx + 1 >= len(args):
+                    print(f"⚠️  {flag} requires a value.")
+                    sys.exit(1)
+                options[flag[2:]] = args.pop(idx + 1)
+                args.pop(idx)
+        if not args:
+            print("Usage: manage.py backfill-logs <logs dir> [--server KEY] [--jobs N]")
+        else:
+            jobs = int(options["jobs"]) if "jobs" in options else None
+            asyncio.run(backfill_from_logs(args[0], server=options.get("server"), jobs=jobs))
+
     else:
         print("""Usage: manage.py [command]
 
@@ -319,6 +346,8 @@ Commands:
 
     fetchstatus         Poll and save server status
     recentplayers       Show recently seen Game Players
+    backfill-logs <dir> Import play sessions and chat from rotated server logs
+                        (--server KEY, --jobs N worker processes)
     shell [--initdb]    Async IPython shell
     runserver           Run FastAPI app
 """)
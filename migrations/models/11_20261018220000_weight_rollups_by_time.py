@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "samples" TO "seconds";
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "online_samples" TO "online_seconds";
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "players_sum" TO "player_seconds";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "seconds" TO "samples";
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "online_seconds" TO "online_samples";
+        ALTER TABLE "serverstatsrollup" RENAME COLUMN "player_seconds" TO "players_sum";"""
@@ -0,0 +1,30 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Cut sessions longer than a day (MAX_SESSION_LENGTH) into day-long pieces
+    return """
+        INSERT INTO "playsession" ("player_id", "started_at", "ended_at", "is_open")
+        WITH RECURSIVE "piece" ("player_id", "started", "ended", "is_open") AS (
+            SELECT "player_id", julianday("started_at") + 1, julianday("ended_at"), "is_open"
+            FROM "playsession" WHERE julianday("ended_at") - julianday("started_at") > 1
+            UNION ALL
+            SELECT "player_id", "started" + 1, "ended", "is_open" FROM "piece"
+            WHERE "ended" - "started" > 1
+        )
+        SELECT "player_id",
+            strftime('%Y-%m-%d %H:%M:%f+00:00', "started"),
+            strftime('%Y-%m-%d %H:%M:%f+00:00', min("started" + 1, "ended")),
+            CASE WHEN "ended" - "started" > 1 THEN 0 ELSE "is_open" END
+        FROM "piece";
+        UPDATE "playsession"
+        SET "ended_at" = strftime('%Y-%m-%d %H:%M:%f+00:00', julianday("started_at") + 1), "is_open" = 0
+        WHERE julianday("ended_at") - julianday("started_at") > 1;
+        DROP INDEX IF EXISTS "idx_playsession_ended_a_ca4686";
+        CREATE INDEX IF NOT EXISTS "idx_playsession_started_540619" ON "playsession" ("started_at", "ended_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_playsession_started_540619";
+        CREATE INDEX IF NOT EXISTS "idx_playsession_ended_a_ca4686" ON "playsession" ("ended_at");"""
@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "chatmessage" WHERE "id" NOT IN (
+            SELECT MIN("id") FROM "chatmessage" GROUP BY "player_id", "sent_at", "text"
+        );
+        DROP INDEX IF EXISTS "idx_chatmessage_player__0cf82e";
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_chatmessage_player__488ea6" ON "chatmessage" ("player_id", "sent_at", "text");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_chatmessage_player__488ea6";
+        CREATE INDEX IF NOT EXISTS "idx_chatmessage_player__0cf82e" ON "chatmessage" ("player_id", "sent_at");"""
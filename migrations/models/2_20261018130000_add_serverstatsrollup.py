@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "serverstatsrollup" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "resolution" VARCHAR(8) NOT NULL,
+    "bucket_start" TIMESTAMP NOT NULL,
+    "samples" INT NOT NULL DEFAULT 0,
+    "online_samples" INT NOT NULL DEFAULT 0,
+    "players_min" INT,
+    "players_max" INT,
+    "players_sum" INT NOT NULL DEFAULT 0,
+    CONSTRAINT "uid_serverstats_resolut_a99fe4" UNIQUE ("resolution", "bucket_start")
+) /* Aggregated server status over one minute, hour or day. */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "serverstatsrollup";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_gameplayer_last_se_bb7e16" ON "gameplayer" ("last_seen");
+        CREATE INDEX IF NOT EXISTS "idx_serversnaps_timesta_2c8d5c" ON "serversnapshot" ("timestamp");
+        CREATE INDEX IF NOT EXISTS "idx_user_game_pl_c3c2df" ON "user" ("game_player_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_gameplayer_last_se_bb7e16";
+        DROP INDEX IF EXISTS "idx_serversnaps_timesta_2c8d5c";
+        DROP INDEX IF EXISTS "idx_user_game_pl_c3c2df";"""
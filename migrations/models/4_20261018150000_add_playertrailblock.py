@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "playertrailblock" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "dimension" VARCHAR(64) NOT NULL,
+    "started_at" TIMESTAMP NOT NULL,
+    "ended_at" TIMESTAMP NOT NULL,
+    "samples" INT NOT NULL,
+    "data" BLOB NOT NULL,
+    "player_id" INT NOT NULL REFERENCES "gameplayer" ("id") ON DELETE CASCADE
+) /* A run of one player's polled positions in one dimension. */;
+        CREATE INDEX IF NOT EXISTS "idx_playertrail_ended_a_3ff695" ON "playertrailblock" ("ended_at");
+        CREATE INDEX IF NOT EXISTS "idx_playertrail_player__52cc43" ON "playertrailblock" ("player_id", "dimension", "ended_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "playertrailblock";"""
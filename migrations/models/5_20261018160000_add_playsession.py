@@ -0,0 +1,19 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "playsession" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "started_at" TIMESTAMP NOT NULL,
+    "ended_at" TIMESTAMP NOT NULL,
+    "is_open" INT NOT NULL DEFAULT 1,
+    "player_id" INT NOT NULL REFERENCES "gameplayer" ("id") ON DELETE CASCADE
+) /* One stretch of a player being online, as seen by the poller. */;
+        CREATE INDEX IF NOT EXISTS "idx_playsession_ended_a_ca4686" ON "playsession" ("ended_at");
+        CREATE INDEX IF NOT EXISTS "idx_playsession_player__8fd2b5" ON "playsession" ("player_id", "started_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "playsession";"""
@@ -0,0 +1,100 @@
+from tortoise import BaseDBAsyncClient
+
+
+# SQLite can't drop the UNIQUE on gameplayer.name or change the rollup's
+# unique key in place, so both tables are rebuilt. Foreign keys are off while
+# gameplayer is swapped out, so rows referencing it are kept as they are; the
+# script runs outside any open transaction (executescript commits first).
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        PRAGMA foreign_keys = OFF;
+        BEGIN;
+        CREATE TABLE "_gameplayer_new" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "server" VARCHAR(32) NOT NULL DEFAULT 'default',
+    "name" VARCHAR(32) NOT NULL,
+    "home_x" REAL,
+    "home_y" REAL,
+    "home_z" REAL,
+    "home_dimension" VARCHAR(64),
+    "last_seen" TIMESTAMP,
+    "last_seen_x" REAL,
+    "last_seen_y" REAL,
+    "last_seen_z" REAL,
+    "last_seen_dimension" VARCHAR(64),
+    CONSTRAINT "uid_gameplayer_server_96a5a5" UNIQUE ("server", "name")
+);
+        INSERT INTO "_gameplayer_new" ("id", "name", "home_x", "home_y", "home_z", "home_dimension", "last_seen", "last_seen_x", "last_seen_y", "last_seen_z", "last_seen_dimension")
+            SELECT "id", "name", "home_x", "home_y", "home_z", "home_dimension", "last_seen", "last_seen_x", "last_seen_y", "last_seen_z", "last_seen_dimension" FROM "gameplayer";
+        DROP TABLE "gameplayer";
+        ALTER TABLE "_gameplayer_new" RENAME TO "gameplayer";
+        CREATE INDEX IF NOT EXISTS "idx_gameplayer_last_se_bb7e16" ON "gameplayer" ("last_seen");
+        CREATE TABLE "_serverstatsrollup_new" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "server" VARCHAR(32) NOT NULL DEFAULT 'default',
+    "resolution" VARCHAR(8) NOT NULL,
+    "bucket_start" TIMESTAMP NOT NULL,
+    "samples" INT NOT NULL DEFAULT 0,
+    "online_samples" INT NOT NULL DEFAULT 0,
+    "players_min" INT,
+    "players_max" INT,
+    "players_sum" INT NOT NULL DEFAULT 0,
+    CONSTRAINT "uid_serverstats_server_6b2841" UNIQUE ("server", "resolution", "bucket_start")
+) /* Aggregated server status over one minute, hour or day. */;
+        INSERT INTO "_serverstatsrollup_new" ("id", "resolution", "bucket_start", "samples", "online_samples", "players_min", "players_max", "players_sum")
+            SELECT "id", "resolution", "bucket_start", "samples", "online_samples", "players_min", "players_max", "players_sum" FROM "serverstatsrollup";
+        DROP TABLE "serverstatsrollup";
+        ALTER TABLE "_serverstatsrollup_new" RENAME TO "serverstatsrollup";
+        ALTER TABLE "serversnapshot" ADD "server" VARCHAR(32) NOT NULL DEFAULT 'default';
+        CREATE INDEX IF NOT EXISTS "idx_serversnaps_server_a7743d" ON "serversnapshot" ("server", "timestamp");
+        COMMIT;
+        PRAGMA foreign_keys = ON;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        PRAGMA foreign_keys = OFF;
+        BEGIN;
+        DELETE FROM "playsession" WHERE "player_id" IN (SELECT "id" FROM "gameplayer" WHERE "server" != 'default');
+        DELETE FROM "playertrailblock" WHERE "player_id" IN (SELECT "id" FROM "gameplayer" WHERE "server" != 'default');
+        UPDATE "user" SET "game_player_id" = NULL WHERE "game_player_id" IN (SELECT "id" FROM "gameplayer" WHERE "server" != 'default');
+        DELETE FROM "gameplayer" WHERE "server" != 'default';
+        CREATE TABLE "_gameplayer_old" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(32) NOT NULL UNIQUE,
+    "home_x" REAL,
+    "home_y" REAL,
+    "home_z" REAL,
+    "home_dimension" VARCHAR(64),
+    "last_seen" TIMESTAMP,
+    "last_seen_x" REAL,
+    "last_seen_y" REAL,
+    "last_seen_z" REAL,
+    "last_seen_dimension" VARCHAR(64)
+);
+        INSERT INTO "_gameplayer_old" ("id", "name", "home_x", "home_y", "home_z", "home_dimension", "last_seen", "last_seen_x", "last_seen_y", "last_seen_z", "last_seen_dimension")
+            SELECT "id", "name", "home_x", "home_y", "home_z", "home_dimension", "last_seen", "last_seen_x", "last_seen_y", "last_seen_z", "last_seen_dimension" FROM "gameplayer";
+        DROP TABLE "gameplayer";
+        ALTER TABLE "_gameplayer_old" RENAME TO "gameplayer";
+        CREATE INDEX IF NOT EXISTS "idx_gameplayer_last_se_bb7e16" ON "gameplayer" ("last_seen");
+        DELETE FROM "serverstatsrollup" WHERE "server" != 'default';
+        CREATE TABLE "_serverstatsrollup_old" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "resolution" VARCHAR(8) NOT NULL,
+    "bucket_start" TIMESTAMP NOT NULL,
+    "samples" INT NOT NULL DEFAULT 0,
+    "online_samples" INT NOT NULL DEFAULT 0,
+    "players_min" INT,
+    "players_max" INT,
+    "players_sum" INT NOT NULL DEFAULT 0,
+    CONSTRAINT "uid_serverstats_resolut_a99fe4" UNIQUE ("resolution", "bucket_start")
+) /* Aggregated server status over one minute, hour or day. */;
+        INSERT INTO "_serverstatsrollup_old" ("id", "resolution", "bucket_start", "samples", "online_samples", "players_min", "players_max", "players_sum")
+            SELECT "id", "resolution", "bucket_start", "samples", "online_samples", "players_min", "players_max", "players_sum" FROM "serverstatsrollup";
+        DROP TABLE "serverstatsrollup";
+        ALTER TABLE "_serverstatsrollup_old" RENAME TO "serverstatsrollup";
+        DROP INDEX IF EXISTS "idx_serversnaps_server_a7743d";
+        DELETE FROM "serversnapshot" WHERE "server" != 'default';
+        ALTER TABLE "serversnapshot" DROP COLUMN "server";
+        COMMIT;
+        PRAGMA foreign_keys = ON;"""
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "logcursor" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "server" VARCHAR(32) NOT NULL UNIQUE,
+    "inode" BIGINT NOT NULL,
+    "offset" BIGINT NOT NULL,
+    "updated_at" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) /* How far the log tailer has read a server's latest.log. */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "logcursor";"""
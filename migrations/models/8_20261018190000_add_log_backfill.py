@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "gameplayer" ADD "first_seen" TIMESTAMP;
+        UPDATE "gameplayer" SET "first_seen" = (
+            SELECT MIN("started_at") FROM "playsession" WHERE "playsession"."player_id" = "gameplayer"."id"
+        );
+        CREATE TABLE IF NOT EXISTS "importedlog" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "server" VARCHAR(32) NOT NULL,
+    "name" VARCHAR(255) NOT NULL,
+    "sessions" INT NOT NULL,
+    "imported_at" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "uid_importedlog_server_0d19d9" UNIQUE ("server", "name")
+) /* A rotated server log whose play sessions were backfilled. */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "gameplayer" DROP COLUMN "first_seen";
+        DROP TABLE IF EXISTS "importedlog";"""
@@ -0,0 +1,33 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "chatmessage" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "sent_at" TIMESTAMP NOT NULL,
+    "text" TEXT NOT NULL,
+    "player_id" INT NOT NULL REFERENCES "gameplayer" ("id") ON DELETE CASCADE
+) /* One chat line from a server log. */;
+        CREATE INDEX IF NOT EXISTS "idx_chatmessage_sent_at_a071ec" ON "chatmessage" ("sent_at");
+        CREATE INDEX IF NOT EXISTS "idx_chatmessage_player__0cf82e" ON "chatmessage" ("player_id", "sent_at");
+        CREATE VIRTUAL TABLE IF NOT EXISTS "chatmessage_fts" USING fts5(
+    "text", content="chatmessage", content_rowid="id",
+    tokenize="unicode61 remove_diacritics 2"
+);
+        CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_insert" AFTER INSERT ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("rowid", "text") VALUES (new."id", new."text");
+END;
+        CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_delete" AFTER DELETE ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("chatmessage_fts", "rowid", "text") VALUES ('delete', old."id", old."text");
+END;
+        CREATE TRIGGER IF NOT EXISTS "chatmessage_fts_update" AFTER UPDATE OF "text" ON "chatmessage" BEGIN
+    INSERT INTO "chatmessage_fts" ("chatmessage_fts", "rowid", "text") VALUES ('delete', old."id", old."text");
+    INSERT INTO "chatmessage_fts" ("rowid", "text") VALUES (new."id", new."text");
+END;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "chatmessage_fts";
+        DROP TABLE IF EXISTS "chatmessage";"""
@@ -0,0 +1,11 @@
+import pytest
+from tortoise import Tortoise
+
+
+@pytest.fixture
+async def db():
+    """A fresh in-memory database with every app model."""
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    yield Tortoise.get_connection("default")
+    await Tortoise.close_connections()
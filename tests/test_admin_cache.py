@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.admin import cache
+from app.admin.cache import ServerListCache, banlist_cache, record_list_change, whitelist_cache
+
+
+@pytest.fixture(autouse=True)
+def cached_lists():
+    whitelist_cache.value = ["Steve"]
+    whitelist_cache.fetched_at = 0.0
+    banlist_cache.value = {
+        "users": [{"identifier": "Griefer", "banned_by": "Rcon", "message": "x"}],
+        "uuids": [],
+        "ips": [{"identifier": "10.0.0.1", "banned_by": "Rcon", "message": "x"}],
+    }
+    banlist_cache.fetched_at = 0.0
+    yield
+    for list_cache in (whitelist_cache, banlist_cache):
+        list_cache.value = list_cache.fetched_at = None
+
+
+def _identifiers(kind):
+    return [entry["identifier"] for entry in banlist_cache.value[kind]]
+
+
+@pytest.mark.parametrize("reply, users, ips", [
+    ("Banned Alex: Banned by an operator.", ["Griefer", "Alex"], ["10.0.0.1"]),
+    ("Banned IP 10.0.0.2: Banned by an operator.", ["Griefer"], ["10.0.0.1", "10.0.0.2"]),
+    ("Unbanned griefer", [], ["10.0.0.1"]),
+    ("Unbanned IP 10.0.0.1", ["Griefer"], []),
+])
+def test_ban_replies(reply, users, ips):
+    record_list_change(banlist_cache, reply)
+    assert (_identifiers("users"), _identifiers("ips")) == (users, ips)
+    assert banlist_cache.fetched_at == 0.0
+
+
+@pytest.mark.parametrize("reply, players", [
+    ("Added Alex to the whitelist", ["Steve", "Alex"]),
+    ("Added steve to the whitelist", ["Steve"]),
+    ("Removed steve from the whitelist", []),
+])
+def test_whitelist_replies(reply, players):
+    record_list_change(whitelist_cache, reply)
+    assert whitelist_cache.value == players
+
+
+def test_nothing_changed_leaves_the_cache_alone():
+    record_list_change(banlist_cache, "Nothing changed. The player is already banned")
+    assert banlist_cache.fetched_at == 0.0
+
+
+def test_unknown_reply_marks_the_cache_stale():
+    record_list_change(whitelist_cache, "That player does not exist")
+    assert whitelist_cache.value == ["Steve"]
+    assert whitelist_cache.stale and whitelist_cache.fetched_at is None
+
+
+async def test_read_started_before_an_update_is_dropped(monkeypatch):
+    replies = asyncio.Queue()
+    sent = asyncio.Event()
+
+    async def rcon_command(command, priority):
+        sent.set()
+        return await replies.get()
+
+    monkeypatch.setattr(cache, "rcon_command", rcon_command)
+    players = ServerListCache("players", "whitelist list", lambda reply: reply.split(","))
+    players.value = ["Steve"]
+
+    # A refresh is in flight when Alex is added
+    refresh = asyncio.create_task(players.refresh())
+    await sent.wait()
+    players.update(lambda value: value.append("Alex"))
+    replies.put_nowait("Steve")
+    await refresh
+    assert players.value == ["Steve", "Alex"]
+    assert players.stale
+
+    replies.put_nowait("Steve,Alex")
+    assert await players.refresh() == ["Steve", "Alex"]
+    assert not players.stale
@@ -0,0 +1,135 @@
+import gzip
+from datetime import datetime, timezone
+
+from app.minecraft.backfill import backfill_logs, log_files, parse_log_file
+from app.models import GamePlayer, ImportedLog, PlaySession, ServerSnapshot
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def _write_log(directory, name, lines):
+    with gzip.open(directory / name, "wt", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+
+
+async def _backfill(directory):
+    return await backfill_logs(str(directory), jobs=1, progress=lambda message: None)
+
+
+async def _sessions():
+    return [
+        (session.started_at, session.ended_at)
+        for session in await PlaySession.all().order_by("started_at")
+    ]
+
+
+def test_parse_log_file(tmp_path):
+    _write_log(tmp_path, "2026-10-09-1.log.gz", [
+        "[22:00:00] [Server thread/INFO]: Starting minecraft server version 1.21",
+        "[22:10:00] [Server thread/INFO]: Alex left the game",
+        "[23:00:00] [Server thread/INFO]: Steve joined the game",
+        "[23:30:00] [Server thread/INFO]: <Steve> laku noć",
+        "[00:15:00] [Server thread/INFO]: Steve left the game",
+        "[00:20:00] [Server thread/INFO]: Notch joined the game",
+        "[00:30:00] [Server thread/INFO]: Stopping server",
+    ])
+    parsed = parse_log_file(str(tmp_path / "2026-10-09-1.log.gz"), "UTC")
+    assert parsed.lines == 7
+    assert sorted(parsed.sessions) == [
+        # Online since the start of the file
+        ("Alex", _utc(2026, 10, 9, 22, 0), _utc(2026, 10, 9, 22, 10)),
+        # Online until the end of the file
+        ("Notch", _utc(2026, 10, 10, 0, 20), _utc(2026, 10, 10, 0, 30)),
+        # Across midnight
+        ("Steve", _utc(2026, 10, 9, 23, 0), _utc(2026, 10, 10, 0, 15)),
+    ]
+    assert parsed.chat == [("Steve", _utc(2026, 10, 9, 23, 30), "laku noć")]
+
+
+def test_log_files_oldest_first(tmp_path):
+    for name in ("2026-10-10-1.log.gz", "2026-10-09-10.log.gz", "2026-10-09-2.log.gz", "latest.log"):
+        (tmp_path / name).write_bytes(b"")
+    assert [path.rsplit("/", 1)[1] for path in log_files(str(tmp_path))] == [
+        "2026-10-09-2.log.gz",
+        "2026-10-09-10.log.gz",
+        "2026-10-10-1.log.gz",
+    ]
+
+
+async def test_backfill_stops_where_recording_started(db, tmp_path):
+    steve = await GamePlayer.create(server="default", name="Steve")
+    await ServerSnapshot.create(
+        server="default", timestamp=_utc(2026, 10, 10, 12, 0), status="Online",
+        players_online=1, max_players=20, player_names=["Steve"],
+    )
+    await PlaySession.create(
+        player=steve, started_at=_utc(2026, 10, 10, 12, 0), ended_at=_utc(2026, 10, 10, 13, 0),
+        is_open=False,
+    )
+    _write_log(tmp_path, "2026-10-10-1.log.gz", [
+        "[09:00:00] [Server thread/INFO]: Steve joined the game",
+        "[09:30:00] [Server thread/INFO]: Steve left the game",
+        "[11:50:00] [Server thread/INFO]: Steve joined the game",
+        "[13:00:00] [Server thread/INFO]: Steve left the game",
+    ])
+    totals = await _backfill(tmp_path)
+    assert totals["sessions"] == 2
+    assert await _sessions() == [
+        (_utc(2026, 10, 10, 9, 0), _utc(2026, 10, 10, 9, 30)),
+        (_utc(2026, 10, 10, 11, 50), _utc(2026, 10, 10, 12, 0)),
+        (_utc(2026, 10, 10, 12, 0), _utc(2026, 10, 10, 13, 0)),
+    ]
+
+
+async def test_backfill_after_snapshots_are_pruned(db, tmp_path):
+    steve = await GamePlayer.create(server="default", name="Steve")
+    await ServerSnapshot.create(
+        server="default", timestamp=_utc(2026, 10, 10, 12, 0), status="Online",
+        players_online=1, max_players=20, player_names=["Steve"],
+    )
+    await PlaySession.create(
+        player=steve, started_at=_utc(2026, 10, 10, 12, 0), ended_at=_utc(2026, 10, 10, 13, 0),
+        is_open=False,
+    )
+    _write_log(tmp_path, "2026-10-09-1.log.gz", [
+        "[10:00:00] [Server thread/INFO]: Steve joined the game",
+        "[11:00:00] [Server thread/INFO]: Steve left the game",
+    ])
+    await _backfill(tmp_path)
+    assert await ImportedLog.filter(cutoff=_utc(2026, 10, 10, 12, 0)).count() == 1
+
+    # Retention deletes the first snapshot; a later one is all that is left
+    await ServerSnapshot.all().delete()
+    await ServerSnapshot.create(
+        server="default", timestamp=_utc(2026, 10, 25, 12, 0), status="Online",
+        players_online=0, max_players=20, player_names=[],
+    )
+    _write_log(tmp_path, "2026-10-10-1.log.gz", [
+        "[12:00:00] [Server thread/INFO]: Steve joined the game",
+        "[13:00:00] [Server thread/INFO]: Steve left the game",
+    ])
+    totals = await _backfill(tmp_path)
+    assert totals["sessions"] == 0
+    assert len(await _sessions()) == 2
+
+
+async def test_first_backfill_after_snapshots_are_pruned(db, tmp_path):
+    # Recording started long ago; only its play sessions are still there
+    steve = await GamePlayer.create(server="default", name="Steve")
+    await PlaySession.create(
+        player=steve, started_at=_utc(2026, 10, 10, 12, 0), ended_at=_utc(2026, 10, 10, 13, 0),
+        is_open=False,
+    )
+    await ServerSnapshot.create(
+        server="default", timestamp=_utc(2026, 10, 25, 12, 0), status="Online",
+        players_online=0, max_players=20, player_names=[],
+    )
+    _write_log(tmp_path, "2026-10-10-1.log.gz", [
+        "[12:00:00] [Server thread/INFO]: Steve joined the game",
+        "[13:00:00] [Server thread/INFO]: Steve left the game",
+    ])
+    totals = await _backfill(tmp_path)
+    assert totals["sessions"] == 0
+    assert len(await _sessions()) == 1
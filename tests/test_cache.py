@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.minecraft import cache, history, sessions
+from app.minecraft.probe import ServerStatus
+from app.minecraft.rcon import RconError
+from app.minecraft.serverlog import CHAT, JOIN, LEAVE, LogEvent
+from app.models import ChatMessage, PlaySession
+from app.settings import TIMEZONE
+
+NAMES = [f"player{i}" for i in range(20)]
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(sessions, "_closing_stale", None)
+    sessions._open_sessions.clear()
+    sessions._session_locks.clear()
+    history._last_samples.clear()
+    history._open_rollups.clear()
+    history._last_polls.clear()
+    cache._server_status_caches["default"] = cache._unknown_status("default")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A server whose ping names 12 of 20 players and whose RCON can be broken."""
+    state = {"rcon_up": True}
+
+    async def probe_server(config):
+        return ServerStatus(20, 50, "motd", "1.21", 5.0, "ping", NAMES[:12])
+
+    async def rcon_command(command, priority, server=None):
+        if not state["rcon_up"]:
+            raise RconError("RCON connection lost")
+        return f"There are 20 of a max of 50 players online: {', '.join(NAMES)}"
+
+    async def get_online_positions(names, server):
+        return {}, {}
+
+    monkeypatch.setattr(cache, "POLL_STATUS_PROBE", True)
+    monkeypatch.setattr(cache, "probe_server", probe_server)
+    monkeypatch.setattr(cache, "rcon_command", rcon_command)
+    monkeypatch.setattr(cache, "get_online_positions", get_online_positions)
+    return state
+
+
+async def test_partial_sample_is_not_taken_as_the_roster(db, server):
+    await cache.poll_and_cache("default")
+    assert await PlaySession.filter(is_open=True).count() == 20
+
+    server["rcon_up"] = False
+    status = await cache.poll_and_cache("default")
+    assert status["status"] == "Online"
+    assert status["players_online"] == 20
+    assert status["player_names"] == NAMES
+    assert await PlaySession.filter(is_open=True).count() == 20
+
+    server["rcon_up"] = True
+    await cache.poll_and_cache("default")
+    assert await PlaySession.all().count() == 20
+
+
+async def test_log_events_replay_after_a_failure(db, monkeypatch):
+    now = datetime.now(ZoneInfo(TIMEZONE)).replace(microsecond=0)
+    joined, chatted, left = (now - timedelta(minutes=m) for m in (30, 20, 10))
+    events = [
+        LogEvent(JOIN, "Steve", joined.time()),
+        LogEvent(JOIN, "Alex", joined.time()),
+        LogEvent(CHAT, "Steve", chatted.time(), "gg"),
+        LogEvent(LEAVE, "Steve", left.time()),
+    ]
+    failures = [RuntimeError("database is locked")]
+
+    async def record_presence_change(status_data):
+        if failures:
+            raise failures.pop()
+
+    monkeypatch.setattr(cache, "record_presence_change", record_presence_change)
+    with pytest.raises(RuntimeError):
+        await cache.apply_log_events("default", events)
+    assert cache.get_server_status("default")["player_names"] == []
+
+    await cache.apply_log_events("default", events)
+    assert cache.get_server_status("default")["player_names"] == ["Alex"]
+    assert await ChatMessage.all().count() == 1
+    steve = await PlaySession.get(player__name="Steve")
+    assert (steve.started_at, steve.ended_at, steve.is_open) == (joined, left, False)
+    alex = await PlaySession.get(player__name="Alex")
+    assert (alex.started_at, alex.is_open) == (joined, True)
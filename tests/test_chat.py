@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.minecraft.chat import ensure_chat_index, fts_query, search_chat
+from app.models import ChatMessage, GamePlayer
+
+BELGRADE = ZoneInfo("Europe/Belgrade")
+
+
+def test_fts_query_requires_every_word():
+    assert fts_query("diamond pickaxe") == '"diamond" "pickaxe"'
+
+
+def test_fts_query_keeps_phrases_and_prefixes():
+    assert fts_query('"nether portal" cree*') == '"nether portal" "cree"*'
+
+
+def test_fts_query_takes_syntax_literally():
+    assert fts_query('a OR b NEAR(c) -d "e') == '"a" "OR" "b" "NEAR(c)" "-d" "e"'
+
+
+def test_fts_query_empty():
+    assert fts_query("") is None
+    assert fts_query('  * "" ') is None
+
+
+async def _messages(texts_at):
+    await ensure_chat_index()
+    player = await GamePlayer.create(server="default", name="Steve")
+    for text, sent_at in texts_at:
+        await ChatMessage.create(player=player, sent_at=sent_at, text=text)
+
+
+async def test_search_matches_words_and_diacritics(db):
+    noon = datetime(2026, 10, 18, 12, 0, tzinfo=BELGRADE)
+    await _messages([("Ćao svima", noon), ("ima li dijamanata", noon)])
+    assert [hit.text for hit in await search_chat("cao")] == ["Ćao svima"]
+    assert [hit.text for hit in await search_chat("dijam*")] == ["ima li dijamanata"]
+
+
+async def test_search_date_bounds_outside_utc(db):
+    # Stored in UTC; bounds in another zone must still compare by instant
+    noon = datetime(2026, 10, 18, 12, 0, tzinfo=BELGRADE)
+    await _messages([("at noon", noon)])
+    half_past_eleven = noon - timedelta(minutes=30)
+    assert [hit.text for hit in await search_chat(since=half_past_eleven)] == ["at noon"]
+    assert await search_chat(until=half_past_eleven) == []
+    assert await search_chat(since=noon + timedelta(minutes=30)) == []
+
+
+async def test_search_pages_newest_first(db):
+    start = datetime(2026, 10, 18, 12, 0, tzinfo=BELGRADE)
+    await _messages([(f"message {i}", start + timedelta(minutes=i)) for i in range(5)])
+    first = await search_chat(limit=2)
+    second = await search_chat(limit=2, before=first[-1].id)
+    rest = await search_chat(limit=2, before=second[-1].id)
+    assert [hit.text for hit in first + second + rest] == [
+        f"message {i}" for i in reversed(range(5))
+    ]
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+from app.minecraft.dispatch import CommandScheduler, Priority, is_read_only
+from app.minecraft.rcon import RconError
+
+
+class FakePool:
+    """Records commands as they are sent; each waits until released."""
+
+    def __init__(self):
+        self.sent = []
+        self.times = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def command(self, command: str) -> str:
+        self.sent.append(command)
+        self.times.append(time.monotonic())
+        await self.release.wait()
+        return f"reply to {command}"
+
+    async def pipeline(self, commands):
+        return [await self.command(command) for command in commands]
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+def _scheduler(pool, **kwargs) -> CommandScheduler:
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("burst", 100)
+    kwargs.setdefault("max_in_flight", 1)
+    return CommandScheduler(pool, "test", **kwargs)
+
+
+def test_is_read_only():
+    assert is_read_only("list")
+    assert is_read_only("/whitelist list")
+    assert is_read_only("data get entity Steve Pos")
+    assert not is_read_only("whitelist add Steve")
+    assert not is_read_only("kick Steve")
+
+
+async def test_admin_commands_jump_the_queue(pool):
+    scheduler = _scheduler(pool)
+    pool.release.clear()
+    busy = asyncio.create_task(scheduler.command("say busy", Priority.POLL))
+    await asyncio.sleep(0.01)
+    queued = [
+        asyncio.create_task(scheduler.command("data get entity Steve Pos", Priority.POLL)),
+        asyncio.create_task(scheduler.command("say hi", Priority.USER)),
+        asyncio.create_task(scheduler.command("kick Steve", Priority.ADMIN)),
+    ]
+    await asyncio.sleep(0.01)
+    assert scheduler.queue_depth() == {"admin": 1, "user": 1, "poll": 1}
+    pool.release.set()
+    await asyncio.gather(busy, *queued)
+    assert pool.sent == ["say busy", "kick Steve", "say hi", "data get entity Steve Pos"]
+    await scheduler.close()
+
+
+async def test_token_bucket_paces_after_the_burst(pool):
+    scheduler = _scheduler(pool, rate=20, burst=2, max_in_flight=10)
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.command(f"say {i}") for i in range(5)))
+    offsets = [moment - started for moment in pool.times]
+    assert offsets[1] < 0.04
+    # Three more at 20 per second
+    assert offsets[4] >= 0.14
+    await scheduler.close()
+
+
+async def test_identical_reads_share_one_reply(pool):
+    scheduler = _scheduler(pool)
+    pool.release.clear()
+    waiting = [asyncio.create_task(scheduler.command("list", Priority.POLL)) for _ in range(3)]
+    writes = [asyncio.create_task(scheduler.command("say hi")) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    pool.release.set()
+    assert await asyncio.gather(*waiting) == ["reply to list"] * 3
+    await asyncio.gather(*writes)
+    # Admin writes still go out ahead of the poll's read
+    assert pool.sent == ["say hi", "say hi", "list"]
+    assert scheduler.coalesced == 2
+    await scheduler.close()
+
+
+async def test_abandoned_commands_are_not_sent(pool):
+    scheduler = _scheduler(pool)
+    pool.release.clear()
+    busy = asyncio.create_task(scheduler.command("say busy"))
+    await asyncio.sleep(0.01)
+    with pytest.raises(RconError):
+        await scheduler.command("say late", Priority.POLL, timeout=0.01)
+    pool.release.set()
+    await busy
+    await scheduler.command("say next")
+    assert pool.sent == ["say busy", "say next"]
+    assert (scheduler.timeouts_hit, scheduler.dropped) == (1, 1)
+    await scheduler.close()
+
+
+async def test_admin_command_is_not_stuck_behind_a_bulk_batch(pool):
+    scheduler = _scheduler(pool, rate=200, burst=5, max_in_flight=4)
+    batch = asyncio.create_task(scheduler.pipeline([f"kick player{i}" for i in range(200)]))
+    await asyncio.sleep(0.05)
+    assert await scheduler.command("kick Steve", timeout=0.2) == "reply to kick Steve"
+    assert not batch.done()
+    replies = await batch
+    assert replies == [f"reply to kick player{i}" for i in range(200)]
+    await scheduler.close()
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.minecraft import history
+from app.minecraft.history import bucket_start, record_status
+from app.models import ServerSnapshot, ServerStatsRollup
+
+NOON = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def fresh_history():
+    history._last_samples.clear()
+    history._open_rollups.clear()
+    history._last_polls.clear()
+
+
+async def _poll(at: datetime, status: str = "Online", players: int = 0):
+    await record_status({
+        "server": "default",
+        "timestamp": at,
+        "status": status,
+        "players_online": players,
+        "max_players": 20,
+        "player_names": [f"player{i}" for i in range(players)],
+    })
+
+
+async def _rollup(resolution: str, start: datetime) -> ServerStatsRollup:
+    return await ServerStatsRollup.get(
+        server="default", resolution=resolution, bucket_start=start
+    )
+
+
+def test_bucket_start():
+    moment = datetime(2026, 10, 18, 12, 34, 56, 789, tzinfo=timezone.utc)
+    assert bucket_start(moment, "minute") == datetime(2026, 10, 18, 12, 34, tzinfo=timezone.utc)
+    assert bucket_start(moment, "hour") == NOON
+    assert bucket_start(moment, "day") == datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+async def test_rollups_weigh_polls_by_time_not_count(db):
+    # Polled every 30 s while two players are online, then backing off while down
+    for i in range(4):
+        await _poll(NOON + timedelta(seconds=30 * i), players=2)
+    await _poll(NOON + timedelta(minutes=2), status="Offline")
+    await _poll(NOON + timedelta(minutes=32), status="Offline")
+    await _poll(NOON + timedelta(minutes=60), players=0)
+
+    hour = await _rollup("hour", NOON)
+    assert hour.seconds == 3600
+    assert hour.online_seconds == 120
+    assert hour.uptime == pytest.approx(120 / 3600)
+    assert hour.players_avg == pytest.approx(2 * 120 / 3600)
+    assert (hour.players_min, hour.players_max) == (0, 2)
+
+
+async def test_rollups_split_time_across_buckets(db):
+    await _poll(NOON - timedelta(seconds=20), players=1)
+    await _poll(NOON + timedelta(seconds=40), players=1)
+
+    before = await _rollup("minute", NOON - timedelta(minutes=1))
+    after = await _rollup("minute", NOON)
+    assert (before.seconds, before.player_seconds) == (20, 20)
+    assert (after.seconds, after.player_seconds) == (40, 40)
+    assert (await _rollup("hour", NOON - timedelta(hours=1))).seconds == 20
+    # The next poll, 30 minutes into a downtime, fills every minute it covered
+    await _poll(NOON + timedelta(minutes=1), status="Offline")
+    await _poll(NOON + timedelta(minutes=31), status="Offline")
+    assert await ServerStatsRollup.filter(
+        resolution="minute", seconds=60, online_seconds=0
+    ).count() == 30
+
+
+async def test_long_gap_is_not_credited(db):
+    await _poll(NOON, players=1)
+    await _poll(NOON + timedelta(days=3), players=1)
+    assert sum(
+        rollup.seconds for rollup in await ServerStatsRollup.filter(resolution="day")
+    ) == history.MAX_POLL_GAP.total_seconds()
+
+
+async def test_raw_samples_only_on_change(db):
+    for i in range(3):
+        await _poll(NOON + timedelta(seconds=30 * i), players=1)
+    await _poll(NOON + timedelta(seconds=90), players=2)
+    assert await ServerSnapshot.all().count() == 2
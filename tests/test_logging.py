@@ -0,0 +1,54 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from app.configure_logging import JsonFormatter, LocalQueueHandler, RateLimitFilter
+
+
+def _record(msg, args=(), lineno=10, level=logging.INFO):
+    return logging.LogRecord("app.test", level, "app/test.py", lineno, msg, args, None)
+
+
+def test_exc_info_reaches_the_json_file():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, target)
+    logger = logging.getLogger("app.test_json")
+    logger.propagate = False
+    logger.addHandler(LocalQueueHandler(log_queue))
+    listener.start()
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Dividing %s failed", "one")
+    finally:
+        listener.stop()
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Dividing one failed"
+    assert "ZeroDivisionError" in entry["exc_info"]
+
+
+def test_rate_limit_groups_by_call_site():
+    limit = RateLimitFilter(burst=2, period=60)
+    assert [limit.filter(_record("Polled %s", (i,))) for i in range(3)] == [True, True, False]
+    # Same message from another line has its own window
+    assert limit.filter(_record("Polled %s", (0,), lineno=20))
+    assert limit.filter(_record("Failed", level=logging.ERROR))
+
+
+def test_rate_limit_forgets_idle_windows(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.configure_logging.time.monotonic", lambda: now[0])
+    limit = RateLimitFilter(burst=1, period=60)
+    for i in range(100):
+        limit.filter(_record(f"Player {i} joined"))
+    assert len(limit._windows) == 100
+    now[0] += 61
+    limit.filter(_record("Player 100 joined"))
+    assert len(limit._windows) == 1
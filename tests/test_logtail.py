@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from app.minecraft import logtail
+from app.minecraft.logtail import LogTailer
+from app.models import LogCursor
+
+
+def _append(path, text):
+    with open(path, "ab") as f:
+        f.write(text.encode())
+
+
+def _joined(name):
+    return f"[12:00:00] [Server thread/INFO]: {name} joined the game\n"
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / "latest.log"
+    path.write_bytes(b"[11:00:00] [Server thread/INFO]: Alex joined the game\n")
+    return path
+
+
+def test_starts_at_the_end_without_a_cursor(log):
+    tailer = LogTailer("default", str(log), read_bytes=8)
+    assert tailer._read() == []
+    _append(log, "new line\n")
+    assert tailer._read() == [b"new line"]
+
+
+def test_keeps_partial_lines(log):
+    tailer = LogTailer("default", str(log), read_bytes=8)
+    tailer._read()
+    _append(log, "first\nsec")
+    assert tailer._read() == [b"first"]
+    assert tailer.offset == os.path.getsize(log) - 3
+    _append(log, "ond\n")
+    assert tailer._read() == [b"second"]
+
+
+def test_finishes_a_rotated_log_before_the_new_one(log):
+    tailer = LogTailer("default", str(log))
+    tailer._read()
+    _append(log, "last of old\nno newline")
+    os.rename(log, log.with_name("2026-10-18-1.log"))
+    log.write_bytes(b"first of new\n")
+    assert tailer._read() == [b"last of old", b"no newline", b"first of new"]
+    assert tailer.rotations == 1
+
+
+def test_rereads_a_truncated_log(log):
+    tailer = LogTailer("default", str(log))
+    tailer._read()
+    log.write_bytes(b"after\n")
+    assert tailer._read() == [b"after"]
+    assert tailer.truncations == 1
+
+
+def test_resumes_from_the_applied_position(log):
+    tailer = LogTailer("default", str(log))
+    offset = os.path.getsize(log)
+    _append(log, "missed while down\n")
+    tailer._applied = (os.stat(log).st_ino, offset)
+    assert tailer._read() == [b"missed while down"]
+
+    # A different file at that path was all written while we were down
+    rotated = LogTailer("default", str(log))
+    rotated._applied = (os.stat(log).st_ino + 1, offset)
+    assert len(rotated._read()) == 2
+
+
+async def test_failed_apply_is_replayed(db, log, monkeypatch):
+    applied = []
+
+    async def apply_log_events(server, events):
+        if not applied:
+            applied.append(None)
+            raise RuntimeError("database is locked")
+        applied.extend(event.player for event in events)
+
+    monkeypatch.setattr(logtail, "apply_log_events", apply_log_events)
+    tailer = LogTailer("default", str(log))
+    await tailer._tick()
+    _append(log, _joined("Steve"))
+
+    with pytest.raises(RuntimeError):
+        await tailer._tick()
+    assert (await LogCursor.get(server="default")).offset < os.path.getsize(log)
+
+    _append(log, _joined("Notch"))
+    await tailer._tick()
+    assert applied == [None, "Steve", "Notch"]
+    cursor = await LogCursor.get(server="default")
+    assert (cursor.inode, cursor.offset) == (os.stat(log).st_ino, os.path.getsize(log))
+    assert tailer.rewinds == 1
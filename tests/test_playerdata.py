@@ -0,0 +1,136 @@
+import gzip
+import json
+import struct
+
+import pytest
+
+from app.minecraft.playerdata import (
+    NBTError,
+    PlayerDataReader,
+    offline_uuid,
+    parse_player_file,
+    read_root_tags,
+)
+
+STEVE = "11111111-1111-1111-1111-111111111111"
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack(">H", len(data)) + data
+
+
+def _tag(tag_type: int, name: str, payload: bytes) -> bytes:
+    return bytes([tag_type]) + _string(name) + payload
+
+
+def _compound(*children: bytes) -> bytes:
+    return b"".join(children) + b"\x00"
+
+
+_ITEM = _compound(
+    _tag(8, "id", _string("minecraft:stone")),
+    _tag(1, "Count", b"\x40"),
+    _tag(10, "tag", _compound(_tag(12, "L", struct.pack(">i2q", 2, 1, 2)))),
+)
+
+
+def _player(respawn: bool = True) -> bytes:
+    """A gzipped player.dat with the decoded tags among ones that are skipped."""
+    tags = [
+        _tag(9, "Inventory", struct.pack(">bi", 10, 3) + _ITEM * 3),
+        _tag(11, "UUID", struct.pack(">i4i", 4, 1, 2, 3, 4)),
+        _tag(9, "Pos", struct.pack(">bi3d", 6, 3, 1.5, 64.0, -20.25)),
+        _tag(8, "Dimension", _string("minecraft:the_nether")),
+        _tag(5, "Health", struct.pack(">f", 17.5)),
+        _tag(3, "XpLevel", struct.pack(">i", 30)),
+        _tag(5, "XpP", struct.pack(">f", 0.25)),
+        _tag(3, "XpTotal", struct.pack(">i", 1400)),
+        _tag(9, "Empty", struct.pack(">bi", 0, 0)),
+    ]
+    if respawn:
+        tags.append(_tag(10, "respawn", _compound(
+            _tag(11, "pos", struct.pack(">i3i", 3, 10, 70, -5)),
+            _tag(8, "dimension", _string("minecraft:overworld")),
+            _tag(5, "yaw", struct.pack(">f", 0)),
+        )))
+    else:
+        tags += [
+            _tag(3, "SpawnX", struct.pack(">i", 1)),
+            _tag(3, "SpawnY", struct.pack(">i", 2)),
+            _tag(3, "SpawnZ", struct.pack(">i", 3)),
+            _tag(3, "SpawnDimension", struct.pack(">i", -1)),
+        ]
+    return gzip.compress(_tag(10, "", _compound(*tags)))
+
+
+@pytest.fixture
+def world(tmp_path):
+    (tmp_path / "world" / "playerdata").mkdir(parents=True)
+    return tmp_path / "world"
+
+
+def _save(world, player_uuid: str, data: bytes):
+    (world / "playerdata" / f"{player_uuid}.dat").write_bytes(data)
+
+
+def test_offline_uuid():
+    assert offline_uuid("Notch") == "b50ad385-829d-3141-a216-7e7d7539ba7f"
+
+
+def test_read_root_tags_skips_unwanted():
+    data = gzip.decompress(_player())
+    assert read_root_tags(data, frozenset(("Health", "Inventory"))) == {
+        "Health": 17.5,
+        "Inventory": [{"id": "minecraft:stone", "Count": 64, "tag": {"L": [1, 2]}}] * 3,
+    }
+    with pytest.raises(NBTError):
+        read_root_tags(data[:40])
+    with pytest.raises(NBTError):
+        read_root_tags(b"\x09" + data[1:])
+
+
+def test_parse_player_file(world):
+    _save(world, STEVE, _player())
+    player = parse_player_file(str(world / "playerdata" / f"{STEVE}.dat"))
+    assert player.uuid == STEVE
+    assert (player.x, player.y, player.z) == (1.5, 64.0, -20.25)
+    assert player.dimension == "minecraft:the_nether"
+    assert (player.spawn, player.spawn_dimension) == ((10, 70, -5), "minecraft:overworld")
+    assert (player.health, player.xp_level, player.xp_progress, player.xp_total) == (17.5, 30, 0.25, 1400)
+
+
+def test_parse_player_file_before_respawn_tag(world):
+    _save(world, STEVE, _player(respawn=False))
+    player = parse_player_file(str(world / "playerdata" / f"{STEVE}.dat"))
+    assert (player.spawn, player.spawn_dimension) == ((1, 2, 3), "minecraft:the_nether")
+
+
+def test_reader_finds_players_by_name(world):
+    alex = offline_uuid("Alex")
+    _save(world, STEVE, _player())
+    _save(world, alex, _player())
+    (world / "playerdata" / f"{STEVE}.dat_old").write_bytes(b"old")
+    (world.parent / "usercache.json").write_text(json.dumps([{"name": "Steve", "uuid": STEVE}]))
+
+    reader = PlayerDataReader(str(world))
+    assert reader.uuid_for("steve") == STEVE
+    assert reader.uuid_for("Alex") == alex
+    assert sorted(reader.scan()) == sorted([STEVE, alex])
+    assert reader.read(offline_uuid("Nobody")) is None
+
+
+def test_reader_parses_only_changed_files(world):
+    _save(world, STEVE, _player())
+    reader = PlayerDataReader(str(world))
+    reader.scan()
+    reader.scan()
+    assert reader.parsed == 1
+
+    # Caught mid-write: the last good copy is kept and the next scan retries
+    _save(world, STEVE, _player()[:30])
+    assert reader.scan()[STEVE].health == 17.5
+    assert reader.failures == 1
+    _save(world, STEVE, _player(respawn=False))
+    assert reader.scan()[STEVE].spawn == (1, 2, 3)
+    assert reader.parsed == 2
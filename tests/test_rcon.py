@@ -0,0 +1,111 @@
+import asyncio
+import struct
+
+import pytest
+
+from app.minecraft.rcon import (
+    SERVERDATA_EXECCOMMAND,
+    RconAuthError,
+    RconConnection,
+    RconError,
+    RconNotSentError,
+    RconPool,
+    _encode_packet,
+)
+from bench.fake_server import FakeMinecraftServer
+
+
+@pytest.fixture
+async def fake_server():
+    # Tiny fragments so every reply spans several packets
+    server = FakeMinecraftServer(players=30, tick=0, fragment_size=16, seed=1)
+    rcon_port, _, _ = await server.start()
+    yield server, rcon_port
+    await server.stop()
+
+
+async def _connect(port, password="secret") -> RconConnection:
+    connection = RconConnection("127.0.0.1", port, password, timeout=5)
+    await connection.connect()
+    return connection
+
+
+def test_encode_packet():
+    packet = _encode_packet(7, SERVERDATA_EXECCOMMAND, "list")
+    assert struct.unpack("<iii", packet[:12]) == (len(packet) - 4, 7, SERVERDATA_EXECCOMMAND)
+    assert packet[12:] == b"list\x00\x00"
+
+
+def test_encode_packet_rejects_long_commands():
+    _encode_packet(1, SERVERDATA_EXECCOMMAND, "x" * 1446)
+    with pytest.raises(RconError):
+        _encode_packet(1, SERVERDATA_EXECCOMMAND, "x" * 1447)
+
+
+async def test_fragmented_reply_is_reassembled(fake_server):
+    server, port = fake_server
+    connection = await _connect(port)
+    try:
+        assert await connection.command("list") == server.execute("list")
+    finally:
+        await connection.close()
+
+
+async def test_pipelined_commands_get_their_own_replies(fake_server):
+    server, port = fake_server
+    connection = await _connect(port)
+    names = list(server.online)[:5]
+    commands = ["list", "whitelist list"] + [f"data get entity {name} Pos" for name in names]
+    try:
+        replies = await asyncio.gather(*(connection.command(command) for command in commands))
+        assert replies == [server.execute(command) for command in commands]
+        assert connection.in_flight == 0
+        await connection.ping()
+    finally:
+        await connection.close()
+
+
+async def test_wrong_password(fake_server):
+    _, port = fake_server
+    with pytest.raises(RconAuthError):
+        await _connect(port, password="wrong")
+
+
+async def test_commands_fail_once_closed(fake_server):
+    _, port = fake_server
+    connection = await _connect(port)
+    await connection.close()
+    assert connection.closed
+    with pytest.raises(RconNotSentError):
+        await connection.command("kick Steve")
+
+
+async def test_late_reply_is_not_resent():
+    server = FakeMinecraftServer(players=0, tick=0, latency=0.3)
+    port, _, _ = await server.start()
+    pool = RconPool("127.0.0.1", port, "secret", size=1, timeout=0.1, keepalive=0)
+    try:
+        with pytest.raises(RconError):
+            await pool.command("whitelist add Steve")
+        await asyncio.sleep(0.4)
+        # The server ran it once; the pool did not send it again
+        assert server.stats.by_verb == {"whitelist": 1}
+        assert server.whitelist == ["Steve"]
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def test_pipeline_does_not_resend_written_commands():
+    server = FakeMinecraftServer(players=1, tick=0, latency=0.3)
+    port, _, _ = await server.start()
+    name = next(iter(server.online))
+    pool = RconPool("127.0.0.1", port, "secret", size=1, timeout=0.1, keepalive=0)
+    try:
+        (result,) = await pool.pipeline([f"kick {name}"])
+        assert isinstance(result, RconError)
+        await asyncio.sleep(0.4)
+        assert server.stats.by_verb == {"kick": 1}
+    finally:
+        await pool.close()
+        await server.stop()
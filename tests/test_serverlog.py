@@ -0,0 +1,73 @@
+from datetime import datetime, time, timezone
+
+import pytest
+
+from app.minecraft.serverlog import (
+    CHAT,
+    DEATH,
+    JOIN,
+    LEAVE,
+    LogEvent,
+    parse_line,
+    parse_lines,
+    recent_event_time,
+    split_line,
+)
+
+NOON = time(12, 34, 56)
+
+
+@pytest.mark.parametrize("line", [
+    "[12:34:56] [Server thread/INFO]: Steve joined the game\n",
+    "[12:34:56 INFO]: Steve joined the game\r\n",
+    "[18Oct2026 12:34:56.789] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: Steve joined the game",
+])
+def test_split_line_prefixes(line):
+    assert split_line(line) == (NOON, "Steve joined the game")
+
+
+def test_split_line_ignores_other_threads():
+    assert split_line("[12:34:56] [User Authenticator #1/INFO]: UUID of player Steve is 1234") is None
+    assert split_line("\tat net.minecraft.server.Main.main(Main.java:1)") is None
+
+
+@pytest.mark.parametrize("message, event", [
+    ("Steve joined the game", LogEvent(JOIN, "Steve", NOON)),
+    ("Steve (formerly known as Alex) joined the game", LogEvent(JOIN, "Steve", NOON)),
+    ("Steve left the game", LogEvent(LEAVE, "Steve", NOON)),
+    ("<Steve> ćao svima", LogEvent(CHAT, "Steve", NOON, "ćao svima")),
+    ("[Not Secure] <Steve> hi", LogEvent(CHAT, "Steve", NOON, "hi")),
+    ("<Steve> Alex joined the game", LogEvent(CHAT, "Steve", NOON, "Alex joined the game")),
+    ("Steve was slain by Zombie", LogEvent(DEATH, "Steve", NOON, "Steve was slain by Zombie")),
+    ("Steve fell from a high place", LogEvent(DEATH, "Steve", NOON, "Steve fell from a high place")),
+])
+def test_parse_line_events(message, event):
+    assert parse_line(f"[12:34:56] [Server thread/INFO]: {message}") == event
+
+
+@pytest.mark.parametrize("message", [
+    "Done (3.2s)! For help, type \"help\"",
+    "Steve lost connection: Disconnected",
+    "Steve has made the advancement [Stone Age]",
+    "[Steve: Set the time to 1000]",
+    "<Steve>",
+])
+def test_parse_line_ignores_other_messages(message):
+    assert parse_line(f"[12:34:56] [Server thread/INFO]: {message}") is None
+
+
+def test_parse_lines():
+    lines = [
+        "[12:00:00] [Server thread/INFO]: Steve joined the game",
+        "[12:00:01] [Server thread/INFO]: Steve[/127.0.0.1:5555] logged in",
+        "[12:10:00] [Server thread/INFO]: Steve left the game",
+    ]
+    assert [event.kind for event in parse_lines(lines)] == [JOIN, LEAVE]
+
+
+def test_recent_event_time():
+    now = datetime(2026, 10, 18, 0, 2, tzinfo=timezone.utc)
+    assert recent_event_time(time(0, 1), now) == datetime(2026, 10, 18, 0, 1, tzinfo=timezone.utc)
+    # A little clock skew is still today
+    assert recent_event_time(time(0, 5), now) == datetime(2026, 10, 18, 0, 5, tzinfo=timezone.utc)
+    assert recent_event_time(time(23, 59), now) == datetime(2026, 10, 17, 23, 59, tzinfo=timezone.utc)
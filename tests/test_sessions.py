@@ -0,0 +1,138 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.minecraft import sessions
+from app.minecraft.sessions import (
+    MAX_SESSION_LENGTH,
+    apply_presence_changes,
+    players_online_at,
+    playtime_per_day,
+    split_session,
+    update_sessions,
+)
+from app.models import GamePlayer, PlaySession
+from app.settings import TIMEZONE
+
+NOON = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions(monkeypatch):
+    monkeypatch.setattr(sessions, "_closing_stale", None)
+    sessions._open_sessions.clear()
+    sessions._session_locks.clear()
+
+
+async def _players(*names):
+    return {name: await GamePlayer.create(server="default", name=name) for name in names}
+
+
+async def _spans(player):
+    return [
+        (session.started_at, session.ended_at, session.is_open)
+        for session in await PlaySession.filter(player=player).order_by("started_at")
+    ]
+
+
+async def test_sessions_open_extend_and_close(db):
+    players = await _players("Steve", "Alex")
+    await update_sessions("default", players, NOON)
+    await update_sessions("default", players, NOON + timedelta(minutes=1))
+    await update_sessions("default", {"Alex": players["Alex"]}, NOON + timedelta(minutes=2))
+
+    assert await _spans(players["Steve"]) == [(NOON, NOON + timedelta(minutes=2), False)]
+    assert await _spans(players["Alex"]) == [(NOON, NOON + timedelta(minutes=2), True)]
+
+
+async def test_restart_closes_sessions_of_the_previous_run(db):
+    players = await _players("Steve")
+    await update_sessions("default", players, NOON)
+
+    # A new process starts with nothing in memory
+    sessions._open_sessions.clear()
+    sessions._closing_stale = None
+    later = NOON + timedelta(hours=1)
+    await update_sessions("default", players, later)
+    assert await _spans(players["Steve"]) == [(NOON, NOON, False), (later, later, True)]
+
+
+async def test_long_sessions_are_split(db):
+    players = await _players("Steve")
+    await update_sessions("default", players, NOON)
+    end = NOON + 2 * MAX_SESSION_LENGTH + timedelta(minutes=5)
+    await update_sessions("default", players, end)
+    await update_sessions("default", {}, end + timedelta(minutes=1))
+
+    first, second = NOON + MAX_SESSION_LENGTH, NOON + 2 * MAX_SESSION_LENGTH
+    assert await _spans(players["Steve"]) == [
+        (NOON, first, False),
+        (first, second, False),
+        (second, end + timedelta(minutes=1), False),
+    ]
+    assert list(split_session(NOON, first)) == [(NOON, first)]
+
+
+async def test_players_online_at(db):
+    players = await _players("Steve", "Alex")
+    await PlaySession.create(
+        player=players["Steve"], started_at=NOON - timedelta(hours=2),
+        ended_at=NOON - timedelta(hours=1), is_open=False,
+    )
+    # Open, last seen by a poll a little while ago
+    await PlaySession.create(
+        player=players["Alex"], started_at=NOON - timedelta(minutes=30),
+        ended_at=NOON - timedelta(minutes=1),
+    )
+    assert [p.name for p in await players_online_at(NOON - timedelta(minutes=90))] == ["Steve"]
+    assert [p.name for p in await players_online_at(NOON)] == ["Alex"]
+    assert await players_online_at(NOON - timedelta(hours=3)) == []
+
+
+async def test_playtime_per_day_splits_at_midnight(db):
+    tz = ZoneInfo(TIMEZONE)
+    players = await _players("Steve")
+    await PlaySession.create(
+        player=players["Steve"],
+        started_at=datetime(2026, 10, 17, 23, 0, tzinfo=tz),
+        ended_at=datetime(2026, 10, 18, 0, 30, tzinfo=tz),
+        is_open=False,
+    )
+    totals = await playtime_per_day(date(2026, 10, 17), date(2026, 10, 18))
+    assert totals == {
+        players["Steve"].id: {
+            date(2026, 10, 17): timedelta(hours=1),
+            date(2026, 10, 18): timedelta(minutes=30),
+        }
+    }
+    # Days outside the range are cut off
+    assert await playtime_per_day(date(2026, 10, 18), date(2026, 10, 18)) == {
+        players["Steve"].id: {date(2026, 10, 18): timedelta(minutes=30)}
+    }
+
+
+async def test_presence_changes_are_all_or_nothing(db, monkeypatch):
+    players = await _players("Steve", "Alex")
+    apply_online = sessions._apply_online
+    calls = []
+
+    async def failing_apply_online(open_sessions, online, timestamp):
+        calls.append(timestamp)
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+        return await apply_online(open_sessions, online, timestamp)
+
+    monkeypatch.setattr(sessions, "_apply_online", failing_apply_online)
+    changes = [
+        (NOON, {"Steve": players["Steve"]}),
+        (NOON + timedelta(minutes=5), players),
+    ]
+    with pytest.raises(RuntimeError):
+        await apply_presence_changes("default", changes)
+    assert await PlaySession.all().count() == 0
+    assert sessions._open_sessions.get("default", {}) == {}
+
+    await apply_presence_changes("default", changes)
+    assert await _spans(players["Steve"]) == [(NOON, NOON + timedelta(minutes=5), True)]
+    assert await _spans(players["Alex"]) == [(NOON + timedelta(minutes=5),) * 2 + (True,)]
@@ -0,0 +1,55 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.minecraft import views
+from app.minecraft.broadcast import get_status_broadcaster
+from app.minecraft.servers import DEFAULT_SERVER
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def approved_user(**kwargs):
+        return SimpleNamespace(is_approved=True)
+
+    monkeypatch.setattr(views.User, "get_or_none", approved_user)
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="test")
+    app.include_router(views.router)
+
+    @app.get("/login")
+    async def login(request: Request):
+        request.session["user_id"] = 1
+
+    with TestClient(app) as client:
+        client.get("/login")
+        yield client
+
+
+def _wait_for_subscribers(broadcaster, count):
+    deadline = time.monotonic() + 2
+    while broadcaster.subscriber_count != count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return broadcaster.subscriber_count
+
+
+def test_websocket_relays_status(client):
+    broadcaster = get_status_broadcaster(DEFAULT_SERVER)
+    with client.websocket_connect("/status/ws") as ws:
+        assert _wait_for_subscribers(broadcaster, 1) == 1
+        broadcaster.publish({"status": "Online"})
+        assert ws.receive_json()["status"] == "Online"
+
+
+def test_websocket_unsubscribes_on_disconnect(client):
+    broadcaster = get_status_broadcaster(DEFAULT_SERVER)
+    ws = client.websocket_connect("/status/ws").__enter__()
+    assert _wait_for_subscribers(broadcaster, 1) == 1
+    ws.close()
+    # Noticed without another status being published
+    assert _wait_for_subscribers(broadcaster, 0) == 0
+    ws.__exit__(None, None, None)
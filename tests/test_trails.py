@@ -0,0 +1,117 @@
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.minecraft import trails
+from app.minecraft.trails import (
+    decode_block,
+    encode_block,
+    heatmap,
+    load_trail,
+    record_positions,
+    simplify_trail,
+)
+from app.models import GamePlayer, PlayerTrailBlock
+
+NOON = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def no_open_trails():
+    trails._open_trails.clear()
+    yield
+    trails._open_trails.clear()
+
+
+def test_block_round_trip():
+    start = NOON.timestamp()
+    times = [start, start + 30, start + 61, start + 90]
+    points = [(0.0, 64.0, 0.0), (12.34, 64.0, -5.0), (-3000.05, 70.5, 29999.9), (1.0, -60.0, 2.0)]
+    decoded_times, decoded_points = decode_block(encode_block(times, points), start)
+    assert decoded_times.tolist() == times
+    # Kept to a tenth of a block
+    np.testing.assert_allclose(decoded_points, points, atol=0.05 + 1e-9)
+
+
+def test_block_rows_are_delta_encoded():
+    times = [NOON.timestamp() + 30 * i for i in range(4)]
+    points = [(100.0 + i, 64.0, -200.0) for i in range(4)]
+    deltas = np.frombuffer(zlib.decompress(encode_block(times, points)), dtype="<i4")
+    assert deltas.reshape(4, -1).tolist() == [
+        [0, 30, 30, 30],
+        [1000, 10, 10, 10],
+        [640, 0, 0, 0],
+        [-2000, 0, 0, 0],
+    ]
+
+
+def test_walking_compresses_well():
+    times = [NOON.timestamp() + 30 * i for i in range(500)]
+    points = [(i * 0.5, 64.0, -i * 0.25) for i in range(500)]
+    assert len(encode_block(times, points)) < 500
+
+
+async def test_record_positions_closes_blocks(db):
+    steve = await GamePlayer.create(server="default", name="Steve")
+    players = {"Steve": steve}
+    for i in range(3):
+        await record_positions(
+            "default", players, {"Steve": (i, 64, 0)}, {"Steve": "minecraft:overworld"},
+            NOON + timedelta(seconds=30 * i),
+        )
+    assert await PlayerTrailBlock.all().count() == 0
+
+    # A dimension change closes the overworld block, leaving closes the nether one
+    await record_positions(
+        "default", players, {"Steve": (8, 70, 8)}, {"Steve": "minecraft:the_nether"},
+        NOON + timedelta(seconds=90),
+    )
+    await record_positions("default", {}, {}, {}, NOON + timedelta(seconds=120))
+    blocks = await PlayerTrailBlock.all().order_by("started_at")
+    assert [(block.dimension, block.samples) for block in blocks] == [
+        ("minecraft:overworld", 3),
+        ("minecraft:the_nether", 1),
+    ]
+
+    times, points = await load_trail(
+        "minecraft:overworld", NOON, NOON + timedelta(hours=1), player_id=steve.id
+    )
+    assert times.tolist() == [NOON.timestamp() + 30 * i for i in range(3)]
+    assert points[:, 0].tolist() == [0, 1, 2]
+
+
+async def test_trail_of_a_deleted_player_is_dropped(db):
+    players = {
+        name: await GamePlayer.create(server="default", name=name) for name in ("Steve", "Alex")
+    }
+    overworld = {name: "minecraft:overworld" for name in players}
+    await record_positions(
+        "default", players, {name: (0, 64, 0) for name in players}, overworld, NOON
+    )
+    await players["Steve"].delete()
+
+    await record_positions("default", {}, {}, {}, NOON + timedelta(seconds=30))
+    blocks = await PlayerTrailBlock.all()
+    assert [block.player_id for block in blocks] == [players["Alex"].id]
+    assert trails._open_trails["default"] == {}
+
+
+def test_heatmap_counts_cells():
+    points = np.array([(0.5, 64, 0.5), (1.5, 64, 0.5), (17, 64, -1)])
+    assert heatmap(points, 16) == {
+        "bin_size": 16,
+        "samples": 3,
+        "cells": [[16, -16, 1], [0, 0, 2]],
+    }
+
+
+def test_simplify_trail_splits_at_pauses():
+    start = NOON.timestamp()
+    times = np.array([start + 30 * i for i in range(5)] + [start + 3600])
+    points = np.array([(i, 64, 0) for i in range(4)] + [(3, 64, 5), (50, 64, 50)], dtype=float)
+    simplified = simplify_trail(times, points, tolerance=0.5)
+    assert simplified["samples"] == 6
+    # The straight run keeps only its ends and the corner
+    assert [[x for _, x, _, _ in segment] for segment in simplified["segments"]] == [[0, 3, 3], [50]]